@@ -0,0 +1,219 @@
+"""Compare the quiz hot path served over WSGI (sync views) and ASGI (async views).
+
+Starts each server on a scratch copy of db.sqlite3, then runs simulated
+quiz-takers at several concurrency levels and prints requests/sec and
+latency percentiles per level as JSON.
+
+    python benchmarks/asgi_vs_wsgi.py --levels 1 8 32 64 --duration 15
+
+Needs gunicorn and uvicorn installed; the server commands can be changed
+with --wsgi-cmd / --asgi-cmd ({port} is substituted).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from http.cookies import SimpleCookie
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+WSGI_CMD = "gunicorn config.wsgi:application --workers 4 --threads 8 --bind 127.0.0.1:{port} --log-level warning"
+ASGI_CMD = "uvicorn config.asgi:application --workers 4 --port {port} --log-level warning"
+
+OPTION_RE = re.compile(r'name="option"\s+value="(\d+)"')
+LECTURE_RE = re.compile(r'"id":\s*(\d+)')
+
+
+class HttpClient:
+    """Tiny keep-alive HTTP/1.1 client with a cookie jar (no third-party deps)."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b'', headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}", "Connection: keep-alive"]
+        if self.cookies:
+            lines.append("Cookie: " + "; ".join(f"{k}={v}" for k, v in self.cookies.items()))
+        for key, value in (headers or {}).items():
+            lines.append(f"{key}: {value}")
+        lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            await self.close()
+            raise ConnectionError("connection closed by server")
+        status = int(status_line.split()[1])
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            key, _, value = line.partition(':')
+            key, value = key.lower(), value.strip()
+            if key == 'set-cookie':
+                cookie = SimpleCookie(value)
+                for name, morsel in cookie.items():
+                    self.cookies[name] = morsel.value
+            response_headers[key] = value
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            content = b''.join(chunks)
+        else:
+            content = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+        if response_headers.get('connection') == 'close':
+            await self.close()
+        return status, response_headers, content
+
+    async def post_form(self, path, data):
+        body = "&".join(f"{k}={v}" for k, v in data.items()).encode()
+        return await self.request('POST', path, body, {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-CSRFToken': self.cookies.get('csrftoken', ''),
+        })
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def quiz_taker(client, lecture_ids, deadline, latencies, errors):
+    async def timed(coro):
+        start = time.perf_counter()
+        try:
+            result = await coro
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            errors.append(1)
+            return None
+        latencies.append(time.perf_counter() - start)
+        return result
+
+    while time.monotonic() < deadline:
+        await timed(client.request('GET', f"/quiz/lecture/{random.choice(lecture_ids)}/"))
+        for _ in range(10):
+            if time.monotonic() >= deadline:
+                return
+            result = await timed(client.request('GET', '/quiz/run/'))
+            if result is None or result[0] != 200:
+                break
+            options = OPTION_RE.findall(result[2].decode())
+            if options:
+                await timed(client.post_form('/quiz/run/', {'action': 'answer', 'option': random.choice(options)}))
+            await timed(client.post_form('/quiz/run/', {'action': 'next'}))
+        await timed(client.request('GET', '/quiz/summary/'))
+        await timed(client.request('GET', '/api/lectures/'))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+async def run_level(port, concurrency, duration):
+    probe = HttpClient('127.0.0.1', port)
+    _, _, content = await probe.request('GET', '/api/lectures/')
+    await probe.close()
+    lecture_ids = LECTURE_RE.findall(content.decode()) or ['1']
+
+    latencies, errors = [], []
+    clients = [HttpClient('127.0.0.1', port) for _ in range(concurrency)]
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(*(quiz_taker(c, lecture_ids, deadline, latencies, errors) for c in clients))
+    elapsed = time.monotonic() - started
+    for client in clients:
+        await client.close()
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_sec': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not start on port {port}")
+
+
+def bench_server(name, command, levels, duration, db_path):
+    port = free_port()
+    env = dict(os.environ, QUIZ_DB_PATH=str(db_path), DJANGO_SETTINGS_MODULE='config.settings')
+    if name == 'wsgi':
+        env['QUIZ_ASYNC_VIEWS'] = '0'
+    server = subprocess.Popen(command.format(port=port).split(), cwd=BASE_DIR, env=env)
+    try:
+        wait_for_port(port)
+        return [asyncio.run(run_level(port, level, duration)) for level in levels]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32, 64])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument('--wsgi-cmd', default=WSGI_CMD)
+    parser.add_argument('--asgi-cmd', default=ASGI_CMD)
+    parser.add_argument('--only', choices=['wsgi', 'asgi'])
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, command in (('wsgi', args.wsgi_cmd), ('asgi', args.asgi_cmd)):
+            if args.only and args.only != name:
+                continue
+            db_path = Path(tmp) / f"{name}.sqlite3"
+            shutil.copy(BASE_DIR / 'db.sqlite3', db_path)
+            subprocess.run(
+                [sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+                cwd=BASE_DIR, env=dict(os.environ, QUIZ_DB_PATH=str(db_path)), check=True,
+            )
+            results[name] = bench_server(name, command, args.levels, args.duration, db_path)
+
+    json.dump(results, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,252 @@
+"""Load test the quiz with simulated concurrent quiz-takers.
+
+Builds a scratch copy of db.sqlite3 with a synthetic question bank
+(manage.py generate_question_bank --subjects S --lectures L --questions Q),
+starts the server on it and runs N simulated users per concurrency level.
+Each user starts a quiz (all, subject or lecture), answers and moves on
+--answers times, opens the summary, then browses stats_global and a
+lecture_detail page. Prints JSON with throughput, latency percentiles and
+SQL queries per request, overall and per endpoint, to compare runs.
+
+    python benchmarks/load_test.py --scale 5 10 200 --levels 1 16 64 --duration 20 -o before.json
+
+--target HOST:PORT runs against a server that is already running instead
+(start it with QUIZ_QUERY_COUNT_HEADER=1 to get the query counts).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from statistics import mean
+
+from asgi_vs_wsgi import HttpClient, free_port, percentile, wait_for_port
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+SERVER_CMD = "gunicorn config.wsgi:application --workers 4 --threads 8 --bind 127.0.0.1:{port} --log-level warning"
+
+OPTION_RE = re.compile(r'name="option"\s+value="(\d+)"')
+
+
+class Recorder:
+    """Latency and query count of every request, per endpoint."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, queries or None)]
+        self.errors = Counter()
+        self.quizzes = 0
+
+
+class QuizTaker:
+    def __init__(self, host, port, bank, answers, recorder, rng):
+        self.client = HttpClient(host, port)
+        self.bank, self.answers = bank, answers
+        self.recorder, self.rng = recorder, rng
+
+    async def _timed(self, endpoint, request):
+        start = time.perf_counter()
+        try:
+            status, headers, content = await request
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            self.recorder.errors[endpoint] += 1
+            await self.client.close()
+            return None
+        elapsed = time.perf_counter() - start
+        if status >= 400:
+            self.recorder.errors[endpoint] += 1
+            return None
+        queries = headers.get('x-query-count')
+        self.recorder.samples[endpoint].append((elapsed, int(queries) if queries is not None else None))
+        return status, headers, content
+
+    async def get(self, endpoint, path):
+        return await self._timed(endpoint, self.client.request('GET', path))
+
+    async def post(self, endpoint, path, data):
+        return await self._timed(endpoint, self.client.post_form(path, data))
+
+    def _start_path(self):
+        kind = self.rng.choices(('all', 'subject', 'lecture'), weights=(1, 2, 3))[0]
+        if kind == 'subject' and self.bank['subjects']:
+            return f"/quiz/subject/{self.rng.choice(self.bank['subjects'])}/"
+        if kind == 'lecture':
+            return f"/quiz/lecture/{self.rng.choice(self.bank['lectures'])}/"
+        return "/quiz/all/"
+
+    async def run(self, deadline):
+        while time.monotonic() < deadline:
+            await self.get('quiz_start', self._start_path())
+            for _ in range(self.answers):
+                if time.monotonic() >= deadline:
+                    return
+                result = await self.get('quiz_question', '/quiz/run/')
+                if result is None or result[0] != 200:
+                    break
+                options = OPTION_RE.findall(result[2].decode())
+                if not options:
+                    break
+                await self.post('quiz_answer', '/quiz/run/', {'action': 'answer', 'option': self.rng.choice(options)})
+                await self.post('quiz_next', '/quiz/run/', {'action': 'next'})
+            await self.get('quiz_summary', '/quiz/summary/')
+            self.recorder.quizzes += 1
+            await self.get('stats_global', '/stats/')
+            await self.get('lecture_detail', f"/lectures/{self.rng.choice(self.bank['lectures'])}/")
+        await self.client.close()
+
+
+def summarize(samples, errors, elapsed):
+    latencies = [seconds for seconds, _ in samples]
+    queries = [n for _, n in samples if n is not None]
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'requests_per_sec': round(len(samples) / elapsed, 1),
+        'mean_ms': round(mean(latencies) * 1000, 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p90_ms': round(percentile(latencies, 90) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(max(latencies) * 1000, 2) if latencies else 0.0,
+        'queries_per_request': round(mean(queries), 2) if queries else None,
+        'max_queries': max(queries) if queries else None,
+    }
+
+
+async def discover(host, port):
+    """Lecture and subject ids of the bank, read through the paginated API."""
+    client = HttpClient(host, port)
+    lectures, after = [], None
+    while True:
+        path = "/api/lectures/?fields=id,subject_id&size=200" + (f"&after={after}" if after else "")
+        status, _, content = await client.request('GET', path)
+        if status != 200:
+            raise RuntimeError(f"GET {path} returned {status}")
+        payload = json.loads(content)
+        lectures += payload['lectures']
+        after = payload['next_after']
+        if not after:
+            break
+    await client.close()
+    if not lectures:
+        raise RuntimeError("the database has no lectures")
+    return {
+        'lectures': [row['id'] for row in lectures],
+        'subjects': sorted({row['subject_id'] for row in lectures if row['subject_id']}),
+    }
+
+
+async def run_level(host, port, bank, concurrency, duration, answers, seed):
+    recorder = Recorder()
+    takers = [
+        QuizTaker(host, port, bank, answers, recorder, random.Random(seed * 1000 + i))
+        for i in range(concurrency)
+    ]
+    started = time.monotonic()
+    await asyncio.gather(*(taker.run(started + duration) for taker in takers))
+    elapsed = time.monotonic() - started
+
+    everything = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 2),
+        'quizzes_completed': recorder.quizzes,
+        'total': summarize(everything, sum(recorder.errors.values()), elapsed),
+        'endpoints': {
+            endpoint: summarize(recorder.samples[endpoint], recorder.errors[endpoint], elapsed)
+            for endpoint in sorted(set(recorder.samples) | set(recorder.errors))
+        },
+    }
+
+
+def run_levels(host, port, args):
+    bank = asyncio.run(discover(host, port))
+    levels = [asyncio.run(run_level(host, port, bank, c, args.duration, args.answers, args.seed)) for c in args.levels]
+    return {'lectures': len(bank['lectures']), 'subjects': len(bank['subjects'])}, levels
+
+
+def prepare_database(tmp, scale, seed):
+    db_path = Path(tmp) / 'load.sqlite3'
+    shutil.copy(BASE_DIR / 'db.sqlite3', db_path)
+    env = dict(os.environ, QUIZ_DB_PATH=str(db_path), DJANGO_SETTINGS_MODULE='config.settings')
+    subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=BASE_DIR, env=env, check=True)
+    subjects, lectures, questions = scale
+    subprocess.run(
+        [sys.executable, 'manage.py', 'generate_question_bank', '--subjects', str(subjects),
+         '--lectures', str(lectures), '--questions', str(questions), '--seed', str(seed)],
+        cwd=BASE_DIR, env=env, check=True, stdout=sys.stderr,
+    )
+    return db_path
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, nargs=3, default=[5, 10, 200], metavar=('SUBJECTS', 'LECTURES', 'QUESTIONS'),
+                        help="synthetic bank size: subjects, lectures per subject, questions per lecture")
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--duration', type=float, default=10.0, help="seconds per concurrency level")
+    parser.add_argument('--answers', type=int, default=10, help="questions answered per quiz")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--server-cmd', default=SERVER_CMD, help="{port} is substituted")
+    parser.add_argument('--target', help="HOST:PORT of a running server; skips the database setup")
+    parser.add_argument('-o', '--output', help="write the JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = {
+        'meta': {
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'duration_s': args.duration,
+            'answers_per_quiz': args.answers,
+            'seed': args.seed,
+        },
+    }
+    if args.target:
+        host, _, port = args.target.rpartition(':')
+        results['meta']['target'] = args.target
+        results['bank'], results['levels'] = run_levels(host or '127.0.0.1', int(port), args)
+    else:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = prepare_database(tmp, args.scale, args.seed)
+            port = free_port()
+            env = dict(
+                os.environ, QUIZ_DB_PATH=str(db_path), QUIZ_SESSION_CACHE_DIR=str(Path(tmp) / 'sessions'),
+                QUIZ_QUERY_COUNT_HEADER='1', DJANGO_SETTINGS_MODULE='config.settings',
+            )
+            server = subprocess.Popen(args.server_cmd.format(port=port).split(), cwd=BASE_DIR, env=env)
+            try:
+                wait_for_port(port)
+                results['meta']['server_cmd'] = args.server_cmd
+                results['meta']['scale'] = dict(zip(('subjects', 'lectures', 'questions'), args.scale))
+                results['bank'], results['levels'] = run_levels('127.0.0.1', port, args)
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Count the database writes of one quiz run with each session mode.
+
+Runs the same quiz (start a lecture quiz, answer and move on N times, open
+the summary) with QUIZ_SESSION_MODE=db and QUIZ_SESSION_MODE=cache on a
+scratch copy of db.sqlite3, and prints the INSERT/UPDATE/DELETE statements
+per table as JSON.
+
+    python benchmarks/session_writes.py --questions 20
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+WRITE_RE = re.compile(r'^\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM|REPLACE\s+INTO)\s+"?(\w+)"?', re.IGNORECASE)
+OPTION_RE = re.compile(r'name="option"\s+value="(\d+)"')
+
+
+class WriteCounter:
+    def __init__(self):
+        self.tables = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        match = WRITE_RE.match(sql)
+        if match:
+            self.tables[match.group(1)] += 1
+        return execute(sql, params, many, context)
+
+
+def run_quiz(questions):
+    """Take one quiz in this process and return the writes per table."""
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from quiz.models import Question
+    from quiz.stats_buffer import stats_buffer
+
+    setup_test_environment()
+    lecture_id = Question.objects.values_list('lecture_id', flat=True).order_by('lecture_id').first()
+    client = Client()
+    counter = WriteCounter()
+    with connection.execute_wrapper(counter):
+        client.get(f'/lectures/{lecture_id}/')  # opens the session like a real visit
+        client.get(f'/quiz/lecture/{lecture_id}/')
+        answered = 0
+        for _ in range(questions):
+            page = client.get('/quiz/run/')
+            options = OPTION_RE.findall(page.content.decode())
+            if not options:
+                break
+            client.post('/quiz/run/', {'action': 'answer', 'option': options[0]})
+            client.post('/quiz/run/', {'action': 'next'})
+            answered += 1
+        client.get('/quiz/summary/')
+        stats_buffer.flush()
+    return {'answered': answered, 'writes': dict(counter.tables)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=20)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_quiz(args.questions)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('db', 'cache'):
+            db_path = Path(tmp) / f'{mode}.sqlite3'
+            shutil.copy(BASE_DIR / 'db.sqlite3', db_path)
+            env = dict(
+                os.environ, QUIZ_DB_PATH=str(db_path), QUIZ_SESSION_MODE=mode,
+                QUIZ_SESSION_CACHE_DIR=str(Path(tmp) / f'{mode}-sessions'),
+                QUIZ_ASYNC_VIEWS='0', DJANGO_SETTINGS_MODULE='config.settings',
+            )
+            subprocess.run([sys.executable, 'manage.py', 'migrate', '--verbosity', '0'], cwd=BASE_DIR, env=env, check=True)
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', mode, '--questions', str(args.questions)],
+                cwd=BASE_DIR, env=env, check=True, capture_output=True, text=True,
+            ).stdout
+            run = json.loads(output.strip().splitlines()[-1])
+            writes = run['writes']
+            session_writes = writes.get('django_session', 0)
+            results[mode] = {
+                'answered': run['answered'],
+                'session_writes': session_writes,
+                'other_writes': sum(writes.values()) - session_writes,
+                'session_writes_per_answer': round(session_writes / max(run['answered'], 1), 2),
+                'by_table': writes,
+            }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
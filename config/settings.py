@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'quiz.middleware.MetricsMiddleware',
+    'quiz.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'quiz.middleware.QueryBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'quiz.middleware.ProfileMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -54,7 +59,8 @@ ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates that also times rendering for the Server-Timing header
+        'BACKEND': 'quiz.template_backend.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -74,13 +80,26 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# 'replica' is a read-only snapshot of the primary, refreshed by
+# quiz/replica.py; stats and exports read from it (see the Quiz section).
+QUIZ_DB_PATH = Path(os.environ.get('QUIZ_DB_PATH', BASE_DIR / 'db.sqlite3'))
+QUIZ_REPLICA_PATH = Path(os.environ.get('QUIZ_REPLICA_PATH', QUIZ_DB_PATH.with_suffix('.replica.sqlite3')))
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'NAME': QUIZ_DB_PATH,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'{QUIZ_REPLICA_PATH.resolve().as_uri()}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['quiz.replica.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -122,3 +141,147 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# 'default' holds the pages cached by quiz.page_cache; 'generations' holds
+# the counters that tell when they are stale, and must be shared by every
+# worker process (file-based works for the processes of one host, use Redis
+# or Memcached across hosts). quiz.page_cache stays off when 'generations'
+# is a per-process cache, unless QUIZ_GENERATIONS_PER_PROCESS is set.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'quiz',
+    },
+    'generations': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('QUIZ_GENERATION_CACHE_DIR', BASE_DIR / '.cache' / 'generations'),
+    },
+    # Shared by every worker process on the host, and survives restarts
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('QUIZ_SESSION_CACHE_DIR', BASE_DIR / '.cache' / 'sessions'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+# Sessions. In 'cache' mode (quiz/session_store.py) the quiz run state is
+# kept in the 'sessions' cache while answering and written to django_session
+# only when a quiz starts or finishes; 'db' is Django's default engine.
+QUIZ_SESSION_MODE = os.environ.get('QUIZ_SESSION_MODE', 'cache')
+if QUIZ_SESSION_MODE == 'cache':
+    SESSION_ENGINE = 'quiz.session_store'
+    SESSION_CACHE_ALIAS = 'sessions'
+
+
+# Quiz
+# Answer counters on Question are buffered in memory and written in batches.
+# Set QUIZ_STATS_WRITE_BEHIND = False to write every answer synchronously.
+
+QUIZ_SNAPSHOT_CACHE_SIZE = 2048
+# How often (seconds) each process compares the shared content generations
+# (see CACHES) with its cached snapshots, to notice changes made elsewhere.
+QUIZ_SNAPSHOT_CHECK_INTERVAL = 2.0
+# Optional .qbank file (manage.py export_question_bank) used to fill the
+# snapshot cache at startup. It must be exported from this same database;
+# it is skipped if the questions changed after it was exported.
+QUIZ_SNAPSHOT_WARM_BANK = os.environ.get('QUIZ_SNAPSHOT_WARM_BANK')
+
+QUIZ_STATS_WRITE_BEHIND = True
+QUIZ_STATS_FLUSH_SIZE = 100
+QUIZ_STATS_FLUSH_INTERVAL = 5.0
+
+# "Punti Deboli" runs: number of distinct questions drawn per run, and how
+# often (in seconds) the per-scope sampling tables are rebuilt from the
+# database. Answers recorded by the same process update them in between.
+QUIZ_WEAK_SPOTS_LENGTH = 20
+QUIZ_WEAK_SPOTS_REBUILD_INTERVAL = 300.0
+
+# Quiz runs resolve their positions from each scope's cached question ids
+# (quiz/cursor.py); this many scopes are kept per process.
+QUIZ_SCOPE_ID_CACHE_SIZE = 64
+
+# Serve the quiz hot path with the async views in quiz/async_views.py.
+# config/asgi.py turns this on; WSGI deployments keep the sync views.
+QUIZ_ASYNC_VIEWS = os.environ.get('QUIZ_ASYNC_VIEWS') == '1'
+
+# home, subject_detail, lecture_list, lecture_detail and api_lectures are
+# cached (and answered with 304s) until the content they show changes; this
+# is the upper bound on how long a rendered page is kept.
+QUIZ_PAGE_CACHE_TIMEOUT = 300
+
+# Offline subject packs (quiz/packs.py). The ids of the answer batches they
+# send are kept this long (in seconds) so a resent batch counts once;
+# `manage.py rollup_answers` deletes the older ones.
+QUIZ_PACK_BATCH_DEDUP_TIMEOUT = 7 * 24 * 3600
+
+# stats_global and the JSON exports read from the 'replica' database when
+# its snapshot is at most QUIZ_REPLICA_MAX_STALENESS seconds old, and from
+# the primary otherwise. Each process refreshes the snapshot in the
+# background every QUIZ_REPLICA_REFRESH_INTERVAL seconds; set it to 0 and
+# run `manage.py refresh_replica --interval N` to refresh from one place.
+QUIZ_REPLICA_MAX_STALENESS = 120
+QUIZ_REPLICA_REFRESH_INTERVAL = 60
+# The refresh copies this many database pages per step and sleeps this many
+# seconds between steps, so writers are only blocked for one step at a time.
+QUIZ_REPLICA_BACKUP_PAGES = 1024
+QUIZ_REPLICA_BACKUP_SLEEP = 0.005
+
+# Per-view SQL query budgets checked by quiz.middleware.QueryBudgetMiddleware
+# (keyed by URL name). Going over logs a warning, or raises when
+# QUIZ_QUERY_BUDGET_STRICT is set (useful in tests). A query shape repeated
+# QUIZ_NPLUSONE_THRESHOLD times in one request is reported as a likely N+1.
+# The budgets assume QUIZ_STATS_WRITE_BEHIND: with synchronous writes the
+# views that record answers (quiz_question, api_quiz_answers and
+# api_pack_answers) also write and roll up the answers on the request path.
+# quiz/tests/test_query_budgets.py checks every view listed here.
+QUIZ_QUERY_BUDGETS = {
+    'home': 2,
+    'subject_detail': 3,
+    'lecture_list': 2,
+    'lecture_detail': 5,
+    'api_lectures': 2,
+    'stats_global': 6,
+    'quiz_start_total': 6,
+    'quiz_start_subject': 6,
+    'quiz_start_lecture': 6,
+    'quiz_start_weak': 6,
+    'quiz_start_weak_subject': 6,
+    'quiz_start_weak_lecture': 6,
+    'quiz_question': 5,
+    'quiz_summary': 2,
+    'api_quiz_questions': 5,
+    'api_quiz_answers': 5,
+    'pack_manifest': 4,
+    'pack_download': 4,
+    'pack_play': 1,
+    'api_pack_answers': 5,
+    'search': 3,
+    'api_search': 3,
+    'metrics': 0,
+}
+QUIZ_QUERY_BUDGET_DEFAULT = None
+QUIZ_QUERY_BUDGET_STRICT = False
+QUIZ_NPLUSONE_THRESHOLD = 5
+# Send each request's query count as an X-Query-Count response header.
+QUIZ_QUERY_COUNT_HEADER = os.environ.get('QUIZ_QUERY_COUNT_HEADER') == '1'
+
+# Every response gets a Server-Timing header (db, template, view, total).
+# Staff can profile one request with cProfile by sending "X-Profile: 1" or
+# adding ?_profile=1; the last QUIZ_PROFILE_KEEP captures are kept in
+# QUIZ_PROFILE_DIR and listed at /profiles/.
+QUIZ_SERVER_TIMING = True
+QUIZ_PROFILING = True
+QUIZ_PROFILE_DIR = BASE_DIR / '.cache' / 'profiles'
+QUIZ_PROFILE_KEEP = 50
+
+# Prometheus metrics at /metrics (quiz/metrics.py). Every process writes its
+# values to QUIZ_METRICS_DIR every QUIZ_METRICS_FLUSH_INTERVAL seconds and a
+# scrape adds them up; the files of exited processes are folded into
+# archive.json, so counters keep growing across worker restarts. With
+# QUIZ_METRICS_TOKEN set, scrapes must send "Authorization: Bearer <token>";
+# without it only scrapes from localhost are answered (any when DEBUG is on).
+# Behind a reverse proxy every request looks local: set the token there.
+QUIZ_METRICS_DIR = os.environ.get('QUIZ_METRICS_DIR', BASE_DIR / '.cache' / 'metrics')
+QUIZ_METRICS_FLUSH_INTERVAL = 5.0
+QUIZ_METRICS_TOKEN = os.environ.get('QUIZ_METRICS_TOKEN')
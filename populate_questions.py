@@ -4,7 +4,7 @@ import django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
-from quiz.models import Lecture, Question, AnswerOption
+from quiz.models import Lecture, Question, AnswerOption, content_hash_for
 
 def populate():
     # Create Lecture
@@ -131,24 +131,28 @@ def populate():
         }
     ]
 
-    for q_data in questions_data:
-        question, created = Question.objects.get_or_create(
+    # One membership query for the whole list, on the content hash index
+    hashes = [content_hash_for(q['text'], [text for text, _ in q['options']]) for q in questions_data]
+    existing = Question.objects.filter(lecture=lecture).existing_hashes(hashes)
+
+    for q_data, content_hash in zip(questions_data, hashes):
+        if (lecture.id, content_hash) in existing:
+            print(f"Question already exists: {q_data['text'][:80]}")
+            continue
+
+        question = Question.objects.create(
             lecture=lecture,
             text=q_data['text'],
-            defaults={'page_number': q_data['page']}
+            page_number=q_data['page'],
+            content_hash=content_hash,
         )
-        
-        if created:
-            print(f"Created question: {question} (Page {q_data['page']})")
-            # Create options
-            for opt_text, is_correct in q_data['options']:
-                AnswerOption.objects.create(
-                    question=question,
-                    text=opt_text,
-                    is_correct=is_correct
-                )
-        else:
-            print(f"Question already exists: {question}")
+        existing.add((lecture.id, content_hash))
+        print(f"Created question: {question} (Page {q_data['page']})")
+        # Create options
+        AnswerOption.objects.bulk_create([
+            AnswerOption(question=question, text=opt_text, is_correct=is_correct)
+            for opt_text, is_correct in q_data['options']
+        ])
 
 if __name__ == '__main__':
     populate()
@@ -1,8 +1,26 @@
+from django import forms
 from django.contrib import admin
-from .models import Lecture, Question, AnswerOption
+from .models import Lecture, Question, AnswerOption, content_hash_for
+
+class AnswerOptionFormSet(forms.BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        # The question's hash covers its options, so duplicates can only be caught here
+        question = self.instance
+        if any(self.errors) or not question.lecture_id or not question.text:
+            return
+        texts = [
+            form.cleaned_data['text'] for form in self.forms
+            if form.cleaned_data.get('text') and not form.cleaned_data.get('DELETE')
+        ]
+        content_hash = content_hash_for(question.text, texts)
+        duplicates = Question.objects.filter(lecture_id=question.lecture_id, content_hash=content_hash).exclude(pk=question.pk)
+        if duplicates.exists():
+            raise forms.ValidationError("Questa domanda, con le stesse opzioni, esiste già nella lezione.")
 
 class AnswerOptionInline(admin.TabularInline):
     model = AnswerOption
+    formset = AnswerOptionFormSet
     min_num = 4
     max_num = 4
     extra = 0
@@ -12,6 +30,11 @@ class QuestionAdmin(admin.ModelAdmin):
     list_display = ('text', 'lecture', 'times_answered', 'times_correct', 'times_wrong')
     list_filter = ('lecture',)
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Options are saved after the question, so the hash is computed last
+        form.instance.refresh_content_hash()
+
 admin.site.register(Lecture)
 admin.site.register(Question, QuestionAdmin)
-admin.site.register(AnswerOption)
+# Options are only edited inline with their question, which keeps content_hash current
@@ -0,0 +1,114 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from . import page_cache
+from .models import AggregateStats, Lecture, Question
+
+# Materialized totals behind stats_global and lecture_detail. Every change is
+# applied as a delta of [questions, answered, correct, wrong] to the global
+# row and to the rows of the affected lecture and subject.
+
+
+def scope_keys(lecture_id, subject_id):
+    keys = [(AggregateStats.SCOPE_GLOBAL, 0)]
+    if lecture_id is not None:
+        keys.append((AggregateStats.SCOPE_LECTURE, lecture_id))
+    if subject_id is not None:
+        keys.append((AggregateStats.SCOPE_SUBJECT, subject_id))
+    return keys
+
+
+def apply_deltas(deltas):
+    """Apply ``{(scope, scope_id): [questions, answered, correct, wrong]}``."""
+    for (scope, scope_id), (questions, answered, correct, wrong) in deltas.items():
+        if not (questions or answered or correct or wrong):
+            continue
+        rows = AggregateStats.objects.filter(scope=scope, scope_id=scope_id)
+        changes = {
+            'questions': F('questions') + questions,
+            'answered': F('answered') + answered,
+            'correct': F('correct') + correct,
+            'wrong': F('wrong') + wrong,
+        }
+        if not rows.update(**changes):
+            AggregateStats.objects.get_or_create(scope=scope, scope_id=scope_id)
+            rows.update(**changes)
+
+
+def add_question(lecture_id, subject_id, question, sign=1):
+    delta = [sign, sign * question.times_answered, sign * question.times_correct, sign * question.times_wrong]
+    apply_deltas({key: delta for key in scope_keys(lecture_id, subject_id)})
+
+
+def remove_question(lecture_id, subject_id, question):
+    add_question(lecture_id, subject_id, question, sign=-1)
+
+
+def move_totals(source_keys, target_keys, totals):
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for key in source_keys:
+        for i, value in enumerate(totals):
+            deltas[key][i] -= value
+    for key in target_keys:
+        for i, value in enumerate(totals):
+            deltas[key][i] += value
+    apply_deltas(deltas)
+
+
+def record_answers(counts, scopes):
+    """Fold flushed answer counts into the aggregates.
+
+    ``counts`` maps question id to ``[answered, correct, wrong]`` and
+    ``scopes`` maps question id to ``(lecture_id, subject_id)``.
+    """
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for question_id, (answered, correct, wrong) in counts.items():
+        for key in scope_keys(*scopes[question_id]):
+            delta = deltas[key]
+            delta[1] += answered
+            delta[2] += correct
+            delta[3] += wrong
+    apply_deltas(deltas)
+
+
+def subject_of(lecture_id):
+    return Lecture.objects.filter(pk=lecture_id).values_list('subject_id', flat=True).first()
+
+
+def lecture_totals(lecture_id):
+    row = AggregateStats.objects.filter(scope=AggregateStats.SCOPE_LECTURE, scope_id=lecture_id).first()
+    if row is None:
+        return [0, 0, 0, 0]
+    return [row.questions, row.answered, row.correct, row.wrong]
+
+
+def rebuild_aggregates():
+    """Recompute every AggregateStats row from the Question table."""
+    rows = (
+        Question.objects.values('lecture_id', 'lecture__subject_id')
+        .annotate(
+            questions=Count('id'),
+            answered=Sum('times_answered'),
+            correct=Sum('times_correct'),
+            wrong=Sum('times_wrong'),
+        )
+        .order_by()
+    )
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    for row in rows:
+        values = [row['questions'], row['answered'] or 0, row['correct'] or 0, row['wrong'] or 0]
+        for key in scope_keys(row['lecture_id'], row['lecture__subject_id']):
+            for i, value in enumerate(values):
+                totals[key][i] += value
+    totals[(AggregateStats.SCOPE_GLOBAL, 0)]  # always keep a global row
+
+    with transaction.atomic():
+        AggregateStats.objects.all().delete()
+        AggregateStats.objects.bulk_create([
+            AggregateStats(scope=scope, scope_id=scope_id, questions=q, answered=a, correct=c, wrong=w)
+            for (scope, scope_id), (q, a, c, w) in totals.items()
+        ], batch_size=500)
+        page_cache.bump(page_cache.ANSWERS)
+    return len(totals)
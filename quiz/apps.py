@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+
+
+class QuizConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'quiz'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        from django.conf import settings
+        bank = getattr(settings, 'QUIZ_SNAPSHOT_WARM_BANK', None)
+        if bank:
+            from .qbank import warm_snapshot_cache
+            warm_snapshot_cache(bank)
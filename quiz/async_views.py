@@ -0,0 +1,137 @@
+import django.http
+from django.shortcuts import aget_object_or_404, redirect, render
+
+from . import metrics
+from .cursor import RunChanged, anew_cursor, aquestion_id_at, shuffle_options
+from .models import Lecture, Subject
+from .lecture_api import LectureQueryError, lecture_payload, lecture_query
+from .page_cache import LECTURES, QUESTIONS, cached_page
+from .pagination import aestimate_count, akeyset_page
+from .session_store import persist_session
+from .snapshots import snapshot_cache
+from .stats_buffer import stats_buffer
+
+# Async versions of the quiz hot path. They are routed instead of the ones in
+# views.py when QUIZ_ASYNC_VIEWS is enabled (the default under config/asgi.py),
+# so a slow client does not hold a worker thread while waiting.
+
+async def _start_quiz(request, scope, scope_id, mode, weighted=False):
+    await request.session.aset('quiz_run', await anew_cursor(scope, scope_id, weighted=weighted))
+    await request.session.aset('quiz_stats', {'correct': 0, 'wrong': 0, 'total': 0})
+    await request.session.aset('quiz_mode', mode)
+    for key in ('quiz_question_ids', 'quiz_index', 'quiz_current_question_id', 'quiz_option_order'):
+        await request.session.apop(key, None)
+    persist_session(request.session)
+    metrics.quiz_started(scope, weighted)
+    return redirect('quiz_question')
+
+async def quiz_start_total(request):
+    return await _start_quiz(request, 'all', None, 'Totale')
+
+async def quiz_start_subject(request, subject_id):
+    subject = await aget_object_or_404(Subject, pk=subject_id)
+    return await _start_quiz(request, 'subject', subject.id, f"Materia: {subject.name}")
+
+async def quiz_start_lecture(request, lecture_id):
+    lecture = await aget_object_or_404(Lecture, pk=lecture_id)
+    return await _start_quiz(request, 'lecture', lecture.id, f"Lezione: {lecture.title}")
+
+async def quiz_start_weak(request, subject_id=None, lecture_id=None):
+    if lecture_id:
+        lecture = await aget_object_or_404(Lecture, pk=lecture_id)
+        return await _start_quiz(request, 'lecture', lecture.id, f"Punti Deboli: {lecture.title}", weighted=True)
+    if subject_id:
+        subject = await aget_object_or_404(Subject, pk=subject_id)
+        return await _start_quiz(request, 'subject', subject.id, f"Punti Deboli: {subject.name}", weighted=True)
+    return await _start_quiz(request, 'all', None, 'Punti Deboli', weighted=True)
+
+async def quiz_question(request):
+    cursor = await request.session.aget('quiz_run')
+    if not cursor:
+        return redirect('quiz_summary')
+
+    index = cursor['index']
+    try:
+        question_id = await aquestion_id_at(cursor)
+    except RunChanged:
+        await request.session.apop('quiz_run', None)
+        return redirect('quiz_summary')
+    if question_id is None:
+        return redirect('quiz_summary')
+
+    question = await snapshot_cache.aget(question_id)
+    if question is None:
+        raise django.http.Http404("Domanda non trovata.")
+
+    options = shuffle_options(cursor['seed'], question.id, question.options)
+
+    context = {
+        'question': question,
+        'options': options,
+        'index': index + 1,
+        'total': cursor['total'],
+        'mode': await request.session.aget('quiz_mode', 'Quiz'),
+        'feedback': False
+    }
+
+    if request.method == 'POST':
+        action = request.POST.get('action')
+
+        if action == 'answer':
+            selected_option_id = request.POST.get('option')
+            option_ids = {str(opt.id) for opt in question.options}
+            if selected_option_id in option_ids:
+                is_correct = int(selected_option_id) == question.correct_option_id
+
+                await stats_buffer.arecord_many([(question.id, is_correct, question.lecture_id, question.subject_id)])
+                snapshot_cache.record_answer(question.id, is_correct)
+
+                stats = await request.session.aget('quiz_stats', {'correct': 0, 'wrong': 0, 'total': 0})
+                stats['total'] += 1
+                if is_correct:
+                    stats['correct'] += 1
+                else:
+                    stats['wrong'] += 1
+                await request.session.aset('quiz_stats', stats)
+
+                context['feedback'] = True
+                context['selected_option_id'] = int(selected_option_id)
+                context['is_correct'] = is_correct
+                context['correct_option_id'] = question.correct_option_id
+
+                return render(request, 'quiz/quiz_question.html', context)
+
+        elif action == 'next':
+            cursor['index'] = index + 1
+            await request.session.aset('quiz_run', cursor)
+            return redirect('quiz_question')
+
+        elif action == 'prev':
+            if index > 0:
+                cursor['index'] = index - 1
+                await request.session.aset('quiz_run', cursor)
+            return redirect('quiz_question')
+
+        elif action == 'finish':
+            return redirect('quiz_summary')
+
+    return render(request, 'quiz/quiz_question.html', context)
+
+async def quiz_summary(request):
+    stats = await request.session.aget('quiz_stats', {'correct': 0, 'wrong': 0, 'total': 0})
+    persist_session(request.session)
+    percent = 0
+    if stats['total'] > 0:
+        percent = (stats['correct'] / stats['total']) * 100
+
+    return render(request, 'quiz/quiz_summary.html', {'stats': stats, 'percent': percent})
+
+@cached_page(LECTURES, QUESTIONS)
+async def api_lectures(request):
+    try:
+        lectures, values, page_kwargs = lecture_query(request.GET)
+    except LectureQueryError as e:
+        return django.http.JsonResponse({'error': str(e)}, status=400)
+    page = await akeyset_page(values, **page_kwargs)
+    page.estimated_total = await aestimate_count(lectures)
+    return django.http.JsonResponse(lecture_payload(page))
@@ -0,0 +1,218 @@
+import hashlib
+import random
+import threading
+from array import array
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from . import page_cache
+from .models import Question
+from .weighted import weak_spot_sampler
+
+# A quiz run is described only by a small cursor stored in the session:
+#   {'scope': 'all' | 'subject' | 'lecture', 'scope_id': int | None,
+#    'seed': int, 'index': int, 'total': int, 'weighted': bool}
+# The question order and the order of the options are derived from the seed,
+# so the session size does not depend on how many questions are in the bank.
+# Weighted ("weak spots") runs instead draw QUIZ_WEAK_SPOTS_LENGTH distinct
+# questions from the scope's alias table when they start and keep their ids
+# in the cursor ('ids'), so later changes to the weights cannot move them.
+# Other runs also keep a 'fingerprint' of the scope's question ids, so a run
+# whose questions were added or removed ends (RunChanged) instead of drifting.
+
+FEISTEL_ROUNDS = 4
+SCOPE_DEPENDENCIES = (page_cache.QUESTIONS, page_cache.LECTURES)
+
+
+class RunChanged(Exception):
+    """The questions of a run's scope changed since the run started."""
+
+
+class ScopeIdCache:
+    """Bounded LRU cache of each scope's question ids, in id order.
+
+    Entries are kept under the shared QUESTIONS and LECTURES generations,
+    so a run position is resolved without a query until questions are
+    added, removed or moved. Without shared generations (see
+    page_cache.enabled) the ids are loaded on every lookup instead.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key, generations):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != generations:
+                return None
+            self._data.move_to_end(key)
+            return entry[1]
+
+    def _store(self, key, generations, ids):
+        with self._lock:
+            self._data[key] = (generations, ids)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get(self, scope, scope_id):
+        shared = page_cache.enabled()
+        generations = page_cache.generations(SCOPE_DEPENDENCIES) if shared else None
+        key = (scope, scope_id)
+        ids = self._cached(key, generations) if shared else None
+        if ids is None:
+            ids = array('q', _scope_ids(scope, scope_id).iterator(chunk_size=2000))
+            if shared:
+                self._store(key, generations, ids)
+        return ids
+
+    async def aget(self, scope, scope_id):
+        shared = page_cache.enabled()
+        generations = await page_cache.agenerations(SCOPE_DEPENDENCIES) if shared else None
+        key = (scope, scope_id)
+        ids = self._cached(key, generations) if shared else None
+        if ids is None:
+            ids = array('q', [question_id async for question_id in _scope_ids(scope, scope_id)])
+            if shared:
+                self._store(key, generations, ids)
+        return ids
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+scope_ids = ScopeIdCache(getattr(settings, 'QUIZ_SCOPE_ID_CACHE_SIZE', 64))
+
+
+def new_cursor(scope, scope_id=None, weighted=False):
+    cursor = {
+        'scope': scope,
+        'scope_id': scope_id,
+        'seed': random.getrandbits(32),
+        'index': 0,
+        'weighted': weighted,
+    }
+    if weighted:
+        length = getattr(settings, 'QUIZ_WEAK_SPOTS_LENGTH', 20)
+        cursor['ids'] = weak_spot_sampler.sample(scope, scope_id, cursor['seed'], length)
+        cursor['total'] = len(cursor['ids'])
+    else:
+        ids = scope_ids.get(scope, scope_id)
+        cursor['total'] = len(ids)
+        cursor['fingerprint'] = sum(ids)
+    return cursor
+
+
+async def anew_cursor(scope, scope_id=None, weighted=False):
+    if weighted:
+        return await sync_to_async(new_cursor)(scope, scope_id, weighted=True)
+    cursor = {
+        'scope': scope,
+        'scope_id': scope_id,
+        'seed': random.getrandbits(32),
+        'index': 0,
+        'weighted': False,
+    }
+    ids = await scope_ids.aget(scope, scope_id)
+    cursor['total'] = len(ids)
+    cursor['fingerprint'] = sum(ids)
+    return cursor
+
+
+def _scope_ids(scope, scope_id):
+    questions = Question.objects.all()
+    if scope == 'subject':
+        questions = questions.filter(lecture__subject_id=scope_id)
+    elif scope == 'lecture':
+        questions = questions.filter(lecture_id=scope_id)
+    return questions.order_by('id').values_list('id', flat=True)
+
+
+def _round(seed, round_no, value, mask):
+    digest = hashlib.blake2b(
+        f"{seed}:{round_no}:{value}".encode(), digest_size=8
+    ).digest()
+    return int.from_bytes(digest, 'big') & mask
+
+
+def permute(seed, n, i):
+    """Map position ``i`` to its place in a seeded permutation of ``range(n)``.
+
+    Uses a small Feistel network over the next even power of two and
+    cycle-walks until the value falls back inside ``range(n)``.
+    """
+    if n <= 1:
+        return 0
+    bits = max(2, (n - 1).bit_length())
+    bits += bits % 2
+    half = bits // 2
+    mask = (1 << half) - 1
+    value = i
+    while True:
+        left, right = value >> half, value & mask
+        for round_no in range(FEISTEL_ROUNDS):
+            left, right = right, left ^ _round(seed, round_no, right, mask)
+        value = (left << half) | right
+        if value < n:
+            return value
+
+
+def _drawn_id(cursor, index):
+    ids = cursor.get('ids', [])
+    return ids[index] if index < len(ids) else None
+
+
+def _checked(cursor, ids):
+    # Cursors from before fingerprints were kept are checked on the count only
+    if len(ids) != cursor['total'] or sum(ids) != cursor.get('fingerprint', sum(ids)):
+        raise RunChanged
+    return ids
+
+
+def question_id_at(cursor, index=None):
+    """The question id at ``index`` (the cursor's own by default), or None past the end.
+
+    Raises RunChanged when the scope's questions changed since the run started.
+    """
+    if index is None:
+        index = cursor['index']
+    if index < 0 or index >= cursor['total']:
+        return None
+    if cursor.get('weighted'):
+        return _drawn_id(cursor, index)
+    ids = _checked(cursor, scope_ids.get(cursor['scope'], cursor['scope_id']))
+    return ids[permute(cursor['seed'], cursor['total'], index)]
+
+
+def question_ids_at(cursor, indexes):
+    """Resolve several run positions at once: ``{index: question_id}``."""
+    indexes = [i for i in indexes if 0 <= i < cursor['total']]
+    if cursor.get('weighted'):
+        return {i: _drawn_id(cursor, i) for i in indexes}
+    if not indexes:
+        return {}
+    ids = _checked(cursor, scope_ids.get(cursor['scope'], cursor['scope_id']))
+    return {i: ids[permute(cursor['seed'], cursor['total'], i)] for i in indexes}
+
+
+async def aquestion_id_at(cursor, index=None):
+    if index is None:
+        index = cursor['index']
+    if index < 0 or index >= cursor['total']:
+        return None
+    if cursor.get('weighted'):
+        return _drawn_id(cursor, index)
+    ids = _checked(cursor, await scope_ids.aget(cursor['scope'], cursor['scope_id']))
+    return ids[permute(cursor['seed'], cursor['total'], index)]
+
+
+def shuffle_options(seed, question_id, options):
+    # Sort first so the result only depends on the seed and the option ids
+    options = sorted(options, key=lambda opt: opt.id)
+    random.Random(f"{seed}:{question_id}").shuffle(options)
+    return options
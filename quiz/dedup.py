@@ -0,0 +1,69 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .aggregates import rebuild_aggregates
+from .models import AnswerEvent, AnswerOption, Question, accuracy_expression, content_hash_for, difficulty_expression
+from .snapshots import snapshot_cache
+
+
+def content_hashes():
+    """Compute ``{question_id: (lecture_id, stored_hash, content_hash)}`` for the whole bank."""
+    options = defaultdict(list)
+    for question_id, text in AnswerOption.objects.order_by('id').values_list('question_id', 'text').iterator(chunk_size=2000):
+        options[question_id].append(text)
+    rows = Question.objects.order_by('id').values_list('id', 'lecture_id', 'content_hash', 'text')
+    return {
+        question_id: (lecture_id, stored, content_hash_for(text, options.pop(question_id, ())))
+        for question_id, lecture_id, stored, text in rows.iterator(chunk_size=2000)
+    }
+
+
+def duplicate_groups(hashes):
+    groups = defaultdict(list)
+    for question_id, (lecture_id, _, content_hash) in hashes.items():
+        groups[(lecture_id, content_hash)].append(question_id)
+    return [sorted(ids) for ids in groups.values() if len(ids) > 1]
+
+
+def merge_duplicates(dry_run=False):
+    """Fold every duplicate question into the oldest one of its lecture.
+
+    Answer counters and AnswerEvents move to the kept question, the copies
+    are deleted and every remaining question gets its current content hash.
+    Returns the duplicate groups as lists of ids, kept question first.
+    """
+    hashes = content_hashes()
+    groups = duplicate_groups(hashes)
+    if dry_run:
+        return groups
+
+    with transaction.atomic():
+        removed = set()
+        for keeper_id, *others in groups:
+            totals = Question.objects.filter(pk__in=others).aggregate(
+                answered=Sum('times_answered'), correct=Sum('times_correct'), wrong=Sum('times_wrong')
+            )
+            answered, correct, wrong = totals['answered'] or 0, totals['correct'] or 0, totals['wrong'] or 0
+            Question.objects.filter(pk=keeper_id).update(
+                times_answered=F('times_answered') + answered,
+                times_correct=F('times_correct') + correct,
+                times_wrong=F('times_wrong') + wrong,
+                accuracy=accuracy_expression(F('times_answered') + answered, F('times_correct') + correct),
+                difficulty=difficulty_expression(F('times_answered') + answered, F('times_wrong') + wrong),
+            )
+            AnswerEvent.objects.filter(question_id__in=others).update(question_id=keeper_id)
+            Question.objects.filter(pk__in=others).delete()
+            removed.update(others)
+            snapshot_cache.invalidate(keeper_id)
+
+        stale = [
+            Question(pk=question_id, content_hash=content_hash)
+            for question_id, (_, stored, content_hash) in hashes.items()
+            if question_id not in removed and stored != content_hash
+        ]
+        Question.objects.bulk_update(stale, ['content_hash'], batch_size=500)
+        # Counters were moved with plain UPDATEs, so recompute the totals
+        rebuild_aggregates()
+    return groups
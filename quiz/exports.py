@@ -0,0 +1,76 @@
+import json
+import zlib
+
+from django.db.models import Prefetch
+
+from .models import AnswerOption
+
+EXPORT_CHUNK_SIZE = 500
+
+
+def export_items(questions, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield questions in the import format, one dict at a time.
+
+    Questions are read through ``iterator()`` with their options prefetched
+    per chunk, so memory stays flat and each chunk costs one options query.
+    """
+    questions = (
+        questions.select_related('lecture__subject')
+        .prefetch_related(Prefetch('options', queryset=AnswerOption.objects.order_by('id')))
+        .order_by('id')
+    )
+    for q in questions.iterator(chunk_size=chunk_size):
+        options = list(q.options.all())
+        correct_index = next((i for i, opt in enumerate(options) if opt.is_correct), -1)
+        item = {
+            'lecture_title': q.lecture.title,
+            'question_text': q.text,
+            'options': [opt.text for opt in options],
+            'correct_index': correct_index,
+            'nature': q.nature,
+            'page_number': q.page_number,
+        }
+        if q.lecture.subject:
+            item['subject'] = q.lecture.subject.name
+        yield item
+
+
+def _encoded_batches(items, chunk_size):
+    batch = []
+    for item in items:
+        batch.append(json.dumps(item, ensure_ascii=False))
+        if len(batch) >= chunk_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ndjson_chunks(items, chunk_size=EXPORT_CHUNK_SIZE):
+    for batch in _encoded_batches(items, chunk_size):
+        yield ("\n".join(batch) + "\n").encode('utf-8')
+
+
+def json_chunks(items, chunk_size=EXPORT_CHUNK_SIZE):
+    # Same {"questions": [...]} document question_import accepts, written piece by piece
+    yield b'{"questions": [\n'
+    separator = ""
+    for batch in _encoded_batches(items, chunk_size):
+        yield (separator + ",\n".join(batch)).encode('utf-8')
+        separator = ",\n"
+    yield b'\n]}\n'
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(questions, fmt='json', gzip=False):
+    items = export_items(questions)
+    chunks = ndjson_chunks(items) if fmt == 'ndjson' else json_chunks(items)
+    return gzip_chunks(chunks) if gzip else chunks
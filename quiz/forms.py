@@ -1,5 +1,5 @@
 from django import forms
-from .models import Lecture, Question, AnswerOption, Subject
+from .models import Lecture, Question, AnswerOption, Subject, content_hash_for
 
 class SubjectForm(forms.ModelForm):
     class Meta:
@@ -64,6 +64,18 @@ class QuestionForm(forms.ModelForm):
                         self.fields['correct_option'].initial = str(i + 1)
                         break
 
+    def clean(self):
+        cleaned_data = super().clean()
+        lecture = cleaned_data.get('lecture')
+        texts = [cleaned_data.get(f'option_{i}') for i in range(1, 5)]
+        if lecture and cleaned_data.get('text') and all(texts):
+            content_hash = content_hash_for(cleaned_data['text'], texts)
+            duplicates = Question.objects.filter(lecture=lecture, content_hash=content_hash).exclude(pk=self.instance.pk)
+            if duplicates.exists():
+                raise forms.ValidationError("Questa domanda, con le stesse opzioni, esiste già nella lezione.")
+            self.instance.content_hash = content_hash
+        return cleaned_data
+
     def save(self, commit=True):
         question = super().save(commit=commit)
         
@@ -113,8 +125,21 @@ class QuestionForm(forms.ModelForm):
         return question
 
 class QuestionImportForm(forms.Form):
+    json_file = forms.FileField(
+        required=False,
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.json,.ndjson,.jsonl,.qbank'}),
+        label="File JSON",
+        help_text="Carica un file .json, .ndjson o .qbank (consigliato per banche grandi)."
+    )
     json_data = forms.CharField(
+        required=False,
         widget=forms.Textarea(attrs={'class': 'form-control', 'rows': 10, 'placeholder': 'Paste JSON here...'}),
         label="JSON Data",
-        help_text="Incolla qui il JSON con le domande."
+        help_text="Oppure incolla qui il JSON con le domande."
     )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if not cleaned_data.get('json_file') and not cleaned_data.get('json_data'):
+            raise forms.ValidationError("Carica un file oppure incolla il JSON.")
+        return cleaned_data
@@ -0,0 +1,260 @@
+import codecs
+import json
+import time
+from collections import defaultdict
+
+from django.db import transaction
+
+from . import aggregates, metrics, page_cache
+from .models import AnswerOption, Lecture, Question, Subject, content_hash_for
+from .weighted import weak_spot_sampler
+
+IMPORT_BATCH_SIZE = 500
+READ_SIZE = 64 * 1024
+NATURES = {choice for choice, _ in Question._meta.get_field('nature').choices}
+
+
+class ImportFormatError(ValueError):
+    pass
+
+
+def iter_json_items(fileobj, read_size=READ_SIZE):
+    """Incrementally yield the question objects of an import file.
+
+    Accepts the ``{"questions": [...]}`` document produced by the exports, a
+    bare ``[...]`` array, or NDJSON (one object per line). Only one item is
+    held in memory at a time, plus the unparsed tail of the read buffer.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    buffer, pos, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        data = fileobj.read(read_size)
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data:
+            eof = True
+            buffer = buffer[pos:] + text_decoder.decode(b'', final=True)
+        else:
+            buffer = buffer[pos:] + text_decoder.decode(data)
+        pos = 0
+
+    def skip(chars):
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def decode_value():
+        nonlocal pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                if eof:
+                    raise ImportFormatError(f"JSON non valido: {e.msg}") from e
+                fill()
+                continue
+            # A value ending exactly at the buffer edge may be truncated
+            if end == len(buffer) and not eof:
+                fill()
+                continue
+            pos = end
+            return value
+
+    whitespace = ' \t\r\n'
+    skip(whitespace)
+    if pos >= len(buffer):
+        return
+
+    if buffer[pos] == '{':
+        # Either a {"questions": [...]} document, whose other keys are
+        # skipped, or the first line of NDJSON: read it key by key
+        pos += 1
+        fields = {}
+        while True:
+            skip(whitespace)
+            char = buffer[pos:pos + 1]
+            if char == '}':
+                pos += 1
+                break
+            if not char:
+                raise ImportFormatError("JSON non valido: oggetto non terminato.")
+            if fields:
+                if char != ',':
+                    raise ImportFormatError("JSON non valido: ',' attesa tra i campi.")
+                pos += 1
+                skip(whitespace)
+            key = decode_value()
+            if not isinstance(key, str):
+                raise ImportFormatError("JSON non valido: chiave attesa.")
+            skip(whitespace)
+            if buffer[pos:pos + 1] != ':':
+                raise ImportFormatError(f"JSON non valido: ':' atteso dopo \"{key}\".")
+            pos += 1
+            skip(whitespace)
+            if key == 'questions':
+                if buffer[pos:pos + 1] != '[':
+                    raise ImportFormatError("Il campo 'questions' deve essere una lista.")
+                pos += 1
+                yield from _iter_array(skip, decode_value, lambda: buffer[pos:pos + 1], whitespace)
+                return
+            fields[key] = decode_value()
+        yield fields
+        while True:
+            skip(whitespace)
+            if pos >= len(buffer):
+                return
+            yield decode_value()
+
+    if buffer[pos] == '[':
+        pos += 1
+        yield from _iter_array(skip, decode_value, lambda: buffer[pos:pos + 1], whitespace)
+        return
+
+    raise ImportFormatError("JSON non valido: atteso un oggetto o una lista.")
+
+
+def _iter_array(skip, decode_value, peek, whitespace):
+    first = True
+    while True:
+        skip(whitespace)
+        char = peek()
+        if char == ']':
+            return
+        if not char:
+            raise ImportFormatError("JSON non valido: lista non terminata.")
+        if not first:
+            if char != ',':
+                raise ImportFormatError("JSON non valido: ',' attesa tra gli elementi.")
+            skip(whitespace + ',')
+        first = False
+        yield decode_value()
+
+
+def validate_item(item):
+    """Return ``None`` if the item can be imported, otherwise the reason."""
+    if not isinstance(item, dict):
+        return "non è un oggetto"
+    for field in ('lecture_title', 'question_text', 'options'):
+        if not item.get(field):
+            return f"campo '{field}' mancante"
+    options = item['options']
+    if not isinstance(options, list) or len(options) != 4 or not all(isinstance(o, str) and o for o in options):
+        return "servono esattamente 4 opzioni di testo"
+    correct_index = item.get('correct_index')
+    if not isinstance(correct_index, int) or isinstance(correct_index, bool) or not 0 <= correct_index < 4:
+        return "'correct_index' deve essere un intero tra 0 e 3"
+    if item.get('nature', 'Teorica') not in NATURES:
+        return f"'nature' deve essere una tra {', '.join(sorted(NATURES))}"
+    page_number = item.get('page_number')
+    if page_number is not None and (not isinstance(page_number, int) or isinstance(page_number, bool)):
+        return "'page_number' deve essere un intero"
+    return None
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.duplicates = 0
+        self.rejected = []  # (position, reason)
+
+    def reject(self, position, reason):
+        self.rejected.append((position, reason))
+
+
+class LectureResolver:
+    """Resolves subject names and lecture titles once per import."""
+
+    def __init__(self):
+        self.subjects = {}
+        self.lectures = {}
+
+    def subject(self, name):
+        if name not in self.subjects:
+            self.subjects[name], _ = Subject.objects.get_or_create(name=name)
+        return self.subjects[name]
+
+    def lecture(self, title, subject_name=None):
+        subject = self.subject(subject_name) if subject_name else None
+        lecture = self.lectures.get(title)
+        if lecture is None:
+            lecture, _ = Lecture.objects.get_or_create(title=title, defaults={'subject': subject})
+            self.lectures[title] = lecture
+        if subject and not lecture.subject_id:
+            # Existing lectures without a subject adopt the one given in the file
+            lecture.subject = subject
+            lecture.save()
+        return lecture
+
+
+def import_items(items, batch_size=IMPORT_BATCH_SIZE):
+    """Insert valid items with bulk_create in batches, all in one transaction."""
+    report = ImportReport()
+    resolver = LectureResolver()
+    started = time.monotonic()
+    with transaction.atomic():
+        batch = []
+        for position, item in enumerate(items):
+            reason = validate_item(item)
+            if reason:
+                report.reject(position, reason)
+                continue
+            lecture = resolver.lecture(item['lecture_title'], item.get('subject'))
+            batch.append((lecture, item))
+            if len(batch) >= batch_size:
+                _insert_batch(batch, report)
+                batch = []
+        if batch:
+            _insert_batch(batch, report)
+    if report.created:
+        weak_spot_sampler.mark_questions_changed()
+        page_cache.bump(page_cache.QUESTIONS, page_cache.OPTIONS)
+    metrics.IMPORT_SECONDS.observe(time.monotonic() - started)
+    for outcome, rows in (('created', report.created), ('duplicate', report.duplicates), ('rejected', len(report.rejected))):
+        if rows:
+            metrics.IMPORT_ROWS.inc(rows, outcome=outcome)
+    return report
+
+
+def _insert_batch(batch, report):
+    # Drop questions already in their lecture (or repeated within the file)
+    # with a single membership query on the content hash
+    hashes = [content_hash_for(item['question_text'], item['options']) for _, item in batch]
+    seen = Question.objects.existing_hashes(hashes)
+    fresh = []
+    for (lecture, item), content_hash in zip(batch, hashes):
+        if (lecture.id, content_hash) in seen:
+            report.duplicates += 1
+            continue
+        seen.add((lecture.id, content_hash))
+        fresh.append((lecture, item, content_hash))
+    if not fresh:
+        return
+    batch = [(lecture, item) for lecture, item, _ in fresh]
+
+    questions = Question.objects.bulk_create([
+        Question(
+            lecture=lecture, text=item['question_text'], nature=item.get('nature', 'Teorica'),
+            page_number=item.get('page_number'), content_hash=content_hash,
+        )
+        for lecture, item, content_hash in fresh
+    ])
+    AnswerOption.objects.bulk_create([
+        AnswerOption(question=question, text=text, is_correct=(i == item['correct_index']))
+        for question, (_, item) in zip(questions, batch)
+        for i, text in enumerate(item['options'])
+    ])
+
+    # bulk_create sends no signals, so update the materialized totals here
+    deltas = defaultdict(lambda: [0, 0, 0, 0])
+    for lecture, _ in batch:
+        for key in aggregates.scope_keys(lecture.id, lecture.subject_id):
+            deltas[key][0] += 1
+    aggregates.apply_deltas(deltas)
+    report.created += len(questions)
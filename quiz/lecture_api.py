@@ -0,0 +1,68 @@
+from django.db.models import Exists, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AggregateStats, Lecture, Question
+from .pagination import page_size, parse_cursor
+
+# Shared by the sync and async api_lectures views.
+
+API_PAGE_SIZE = 50
+API_MAX_PAGE_SIZE = 200
+DEFAULT_FIELDS = ('id', 'title')
+LECTURE_FIELDS = ('id', 'title', 'description', 'subject_id', 'num_questions')
+NATURES = {choice for choice, _ in Question._meta.get_field('nature').choices}
+
+
+class LectureQueryError(ValueError):
+    pass
+
+
+def lecture_query(params):
+    """Parse the API query string.
+
+    Returns ``(lectures, values, page_kwargs)``: the filtered queryset (for
+    the count estimate), the same rows projected to the requested fields,
+    and the keyword arguments for ``keyset_page``.
+    """
+    lectures = Lecture.objects.all()
+    subject_id = params.get('subject')
+    if subject_id:
+        if not subject_id.isdigit():
+            raise LectureQueryError("'subject' deve essere un id numerico.")
+        lectures = lectures.filter(subject_id=subject_id)
+    nature = params.get('nature')
+    if nature:
+        if nature not in NATURES:
+            raise LectureQueryError(f"'nature' deve essere una tra {', '.join(sorted(NATURES))}.")
+        lectures = lectures.filter(Exists(Question.objects.filter(lecture=OuterRef('pk'), nature=nature)))
+
+    fields = [f for f in params.get('fields', '').split(',') if f] or list(DEFAULT_FIELDS)
+    unknown = [f for f in fields if f not in LECTURE_FIELDS]
+    if unknown:
+        raise LectureQueryError(f"Campi non validi: {', '.join(unknown)}. Disponibili: {', '.join(LECTURE_FIELDS)}.")
+    if 'id' not in fields:
+        fields.insert(0, 'id')  # the keyset cursor needs it
+
+    values = lectures
+    if 'num_questions' in fields:
+        # Read from the materialized totals, only for the rows of the page
+        totals = AggregateStats.objects.filter(scope=AggregateStats.SCOPE_LECTURE, scope_id=OuterRef('pk'))
+        values = values.annotate(num_questions=Coalesce(Subquery(totals.values('questions')[:1]), 0))
+    values = values.values(*fields)
+
+    page_kwargs = {
+        'after': parse_cursor(params.get('after')),
+        'before': parse_cursor(params.get('before')),
+        'size': page_size(params.get('size'), API_PAGE_SIZE, API_MAX_PAGE_SIZE),
+    }
+    return lectures, values, page_kwargs
+
+
+def lecture_payload(page):
+    return {
+        'lectures': page.items,
+        'next_after': page.next_after,
+        'prev_before': page.prev_before,
+        'size': page.size,
+        'estimated_total': page.estimated_total,
+    }
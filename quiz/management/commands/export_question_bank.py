@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Question
+from quiz.qbank import write_bank
+
+
+class Command(BaseCommand):
+    help = "Write questions to a binary question bank (.qbank), all of them or one subject/lecture."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument('--subject', type=int)
+        scope.add_argument('--lecture', type=int)
+
+    def handle(self, *args, **options):
+        questions = Question.objects.all()
+        if options['subject']:
+            questions = questions.filter(lecture__subject_id=options['subject'])
+        elif options['lecture']:
+            questions = questions.filter(lecture_id=options['lecture'])
+
+        # Written next to the target and renamed, so readers never see half a file
+        path = os.path.abspath(options['path'])
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fileobj:
+                subjects, lectures, count, option_count = write_bank(fileobj, questions)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        if not count:
+            raise CommandError("Nessuna domanda da esportare.")
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {count} questions, {option_count} options, {lectures} lectures and {subjects} subjects "
+            f"to {path} ({os.path.getsize(path)} bytes)."
+        ))
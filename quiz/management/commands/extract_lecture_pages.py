@@ -0,0 +1,57 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.models import Lecture
+from quiz.pdf_pages import extract_lectures, lecture_for_file
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract the text of lecture PDFs page by page and store it on the Lecture. "
+        "Each argument is a PDF, a directory of PDFs, or PDF=LECTURE_ID; without an id "
+        "the lecture is matched from the number at the end of the file name."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('pdfs', nargs='+', help="PDF files, directories or PDF=LECTURE_ID.")
+        parser.add_argument('--workers', type=int, default=None, help="Extraction processes (default: CPU count).")
+        parser.add_argument('--force', action='store_true', help="Ignore the page cache and extract everything again.")
+
+    def handle(self, *args, **options):
+        try:
+            import pypdf  # noqa: F401
+        except ImportError:
+            raise CommandError("pypdf is required: pip install pypdf")
+
+        jobs = []
+        for spec in options['pdfs']:
+            path, _, lecture_id = spec.partition('=')
+            if os.path.isdir(path):
+                paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.lower().endswith('.pdf'))
+            elif os.path.isfile(path):
+                paths = [path]
+            else:
+                raise CommandError(f"{path} not found.")
+            for pdf in paths:
+                if lecture_id:
+                    lecture = Lecture.objects.filter(pk=lecture_id).first()
+                    if lecture is None:
+                        raise CommandError(f"Lecture {lecture_id} does not exist.")
+                else:
+                    lecture = lecture_for_file(pdf)
+                if lecture is None:
+                    self.stderr.write(f"Skipping {pdf}: no single lecture matches, use {pdf}=LECTURE_ID.")
+                    continue
+                jobs.append((pdf, lecture))
+
+        for result in extract_lectures(jobs, workers=options['workers'], force=options['force']):
+            if result.status == 'unchanged':
+                self.stdout.write(f"{result.path} -> {result.lecture}: unchanged")
+            elif result.status == 'failed':
+                self.stderr.write(f"{result.path} -> {result.lecture}: failed ({result.error})")
+            else:
+                cached = result.pages - result.extracted
+                self.stdout.write(self.style.SUCCESS(
+                    f"{result.path} -> {result.lecture}: {result.pages} pages ({result.extracted} extracted, {cached} cached)"
+                ))
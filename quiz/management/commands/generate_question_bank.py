@@ -0,0 +1,60 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.imports import IMPORT_BATCH_SIZE, NATURES, import_items
+
+WORDS = (
+    "automa linguaggio grammatica macchina stato nastro alfabeto stringa insieme funzione "
+    "relazione grafo albero cammino ciclo problema riduzione classe tempo spazio formula "
+    "variabile clausola predicato modello teorema lemma prova induzione ricorsione calcolo"
+).split()
+
+
+def synthetic_items(subjects, lectures, questions, prefix, rng):
+    """Yield import items for subjects x lectures x questions synthetic questions."""
+    natures = sorted(NATURES)
+    for i in range(1, subjects + 1):
+        subject = f"{prefix} Materia {i}"
+        for j in range(1, lectures + 1):
+            title = f"{prefix} Lezione {i}.{j}"
+            for k in range(1, questions + 1):
+                words = " ".join(rng.choices(WORDS, k=8))
+                yield {
+                    'subject': subject,
+                    'lecture_title': title,
+                    'question_text': f"[{i}.{j}.{k}] Quale affermazione su {words} è corretta?",
+                    'options': [f"Opzione {chr(65 + n)}: {' '.join(rng.choices(WORDS, k=5))}" for n in range(4)],
+                    'correct_index': rng.randrange(4),
+                    'nature': rng.choice(natures),
+                }
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic question bank (subjects x lectures x questions, four options each) "
+        "for load testing. Uses the bulk import path, so running it again adds nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subjects', type=int, default=5)
+        parser.add_argument('--lectures', type=int, default=10, help="Lectures per subject.")
+        parser.add_argument('--questions', type=int, default=100, help="Questions per lecture.")
+        parser.add_argument('--prefix', default="Sintetica", help="Prefix of the generated names.")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if min(options['subjects'], options['lectures'], options['questions']) < 1:
+            raise CommandError("--subjects, --lectures and --questions must be at least 1.")
+        started = time.monotonic()
+        items = synthetic_items(
+            options['subjects'], options['lectures'], options['questions'],
+            options['prefix'], random.Random(options['seed']),
+        )
+        report = import_items(items, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report.created} questions ({report.duplicates} already present) "
+            f"in {time.monotonic() - started:.1f}s."
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.imports import import_items
+from quiz.qbank import BankFormatError, BankReader
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a binary question bank (.qbank). Lectures and subjects are matched by title/name "
+        "and questions already present are skipped, as with the JSON import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--no-verify', action='store_true', help="Skip the checksum check.")
+
+    def handle(self, *args, **options):
+        try:
+            with BankReader(options['path']) as reader:
+                if not options['no_verify']:
+                    reader.verify()
+                report = import_items(reader.items())
+        except (OSError, BankFormatError) as e:
+            raise CommandError(str(e))
+        for position, reason in report.rejected:
+            self.stdout.write(f"Question #{position + 1} rejected: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report.created} questions ({report.duplicates} already present, {len(report.rejected)} rejected)."
+        ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from quiz.dedup import merge_duplicates
+from quiz.stats_buffer import stats_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Find questions with the same text and options in the same lecture and merge them "
+        "into the oldest one, keeping their answer statistics."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only list the duplicates.")
+
+    def handle(self, *args, **options):
+        stats_buffer.flush()
+        groups = merge_duplicates(dry_run=options['dry_run'])
+        for keeper_id, *others in groups:
+            self.stdout.write(f"Question {keeper_id} <- {', '.join(map(str, others))}")
+        merged = sum(len(ids) - 1 for ids in groups)
+        if options['dry_run']:
+            self.stdout.write(f"{merged} duplicates in {len(groups)} groups (dry run).")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Merged {merged} duplicates in {len(groups)} groups."))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from quiz.aggregates import rebuild_aggregates
+from quiz.stats_buffer import stats_buffer
+
+
+class Command(BaseCommand):
+    help = "Recompute the materialized global/subject/lecture statistics from the Question table."
+
+    def handle(self, *args, **options):
+        stats_buffer.flush()
+        rows = rebuild_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} aggregate statistics rows."))
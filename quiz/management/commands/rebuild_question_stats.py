@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from quiz.aggregates import rebuild_aggregates
+from quiz.rollups import rebuild_question_counters
+from quiz.stats_buffer import stats_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute times_answered/times_correct/times_wrong on every Question from the "
+        "AnswerEvent log. Answers given before the log existed are not counted."
+    )
+
+    def handle(self, *args, **options):
+        stats_buffer.flush()
+        updated = rebuild_question_counters()
+        # The counters were bulk-updated without signals, so refresh the totals too
+        rebuild_aggregates()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt counters for {updated} questions."))
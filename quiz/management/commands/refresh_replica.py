@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz.replica import refresh_replica, replica_path
+
+
+class Command(BaseCommand):
+    help = "Copy the primary database to the read-only replica (once, or every --interval seconds)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help="Keep running and refresh every N seconds.")
+
+    def handle(self, *args, **options):
+        if replica_path() is None:
+            raise CommandError("No 'replica' database is configured.")
+        while True:
+            started = time.monotonic()
+            path = refresh_replica()
+            if path is None:
+                self.stdout.write("Replica refresh skipped: another process is refreshing it.")
+            else:
+                self.stdout.write(self.style.SUCCESS(f"Replica refreshed: {path} ({time.monotonic() - started:.2f}s)"))
+            if options['interval'] <= 0:
+                return
+            time.sleep(options['interval'])
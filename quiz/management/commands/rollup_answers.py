@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from quiz.packs import forget_synced_batches
+from quiz.rollups import rollup_answer_events
+from quiz.stats_buffer import stats_buffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold new AnswerEvents into the daily per-lecture/per-subject statistics, "
+        "and forget expired offline pack batch ids."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        stats_buffer.flush()
+        processed = rollup_answer_events(batch_size=options['batch_size'])
+        forgotten = forget_synced_batches()
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {processed} answer events, forgot {forgotten} pack batches."))
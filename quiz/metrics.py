@@ -0,0 +1,315 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Small in-process metrics registry exposed in the Prometheus text format at
+# /metrics. Updating a metric is a dict update under a lock. Each process
+# writes its values to QUIZ_METRICS_DIR/<pid>.json every
+# QUIZ_METRICS_FLUSH_INTERVAL seconds (and at exit), and the process
+# answering the scrape adds up every file, so the numbers cover all workers.
+# The file of an exited process is folded into archive.json (its gauges are
+# dropped) and removed, by any live process's flusher or by the scrape; a
+# process also archives a file left under its own pid before its first
+# write, so a reused pid does not overwrite the counts of its predecessor.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, registry, name, help, labelnames=()):
+        self.name, self.help, self.labelnames = name, help, tuple(labelnames)
+        self._lock = registry.lock
+        self._values = {}
+        registry.register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return {key: list(value) if isinstance(value, list) else value for key, value in self._values.items()}
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, registry, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # per-bucket counts (the last is +Inf), then sum and count
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            counts[index] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+
+class CallbackMetric:
+    """A counter or gauge read from ``func()`` (``{label values: value}``) when collected."""
+
+    def __init__(self, registry, name, help, kind, func, labelnames=()):
+        self.name, self.help, self.kind, self.labelnames = name, help, kind, tuple(labelnames)
+        self.func = func
+        registry.register(self)
+
+    def samples(self):
+        return {tuple(str(v) for v in key): value for key, value in self.func().items()}
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+ARCHIVE = 'archive.json'
+
+
+class Registry:
+    def __init__(self, directory=None, flush_interval=5.0):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self._claimed_pid = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+
+    def collect(self):
+        """This process's samples: ``{name: {label values: value}}``."""
+        return {name: metric.samples() for name, metric in self.metrics.items()}
+
+    # --- Sharing between processes ---
+
+    def _path(self, pid):
+        return self.directory / f"{pid}.json"
+
+    @contextmanager
+    def _files_locked(self, exclusive=False):
+        # Archiving moves counts between files; readers must not see them twice
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.lock', 'a') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _write(self, path, payload):
+        tmp = path.with_name(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_text(json.dumps(payload))
+        os.replace(tmp, path)
+
+    def flush(self):
+        if self.directory is None:
+            return
+        collected = self.collect()
+        if not any(collected[name] for name, metric in self.metrics.items() if isinstance(metric, Metric)):
+            return  # e.g. a management command that recorded nothing
+        payload = {name: [[list(key), value] for key, value in samples.items()] for name, samples in collected.items()}
+        pid = os.getpid()
+        try:
+            if self._claimed_pid != pid:
+                # Whatever is under our pid was written by an earlier process
+                self._archive([pid])
+                self._claimed_pid = pid
+            with self._files_locked():
+                self._write(self._path(pid), payload)
+        except OSError:
+            logger.exception("Writing metrics to %s failed", self.directory)
+
+    def archive_dead(self):
+        """Fold the files of exited processes into the archive and remove them."""
+        if self.directory is None or not self.directory.exists():
+            return
+        dead = [int(path.stem) for path in self.directory.glob('*.json') if path.stem.isdigit() and not _alive(int(path.stem))]
+        if dead:
+            try:
+                self._archive(dead)
+            except OSError:
+                logger.exception("Archiving metrics in %s failed", self.directory)
+
+    def _archive(self, pids):
+        with self._files_locked(exclusive=True):
+            archive = {}
+            self._add(archive, self._read(self.directory / ARCHIVE) or {})
+            archived = []
+            for pid in pids:
+                data = self._read(self._path(pid))
+                if data is None:
+                    continue
+                self._add(archive, data, keep_gauges=False)
+                archived.append(pid)
+            if not archived:
+                return
+            self._write(self.directory / ARCHIVE, {
+                name: [[list(key), value] for key, value in samples.items()] for name, samples in archive.items() if samples
+            })
+            for pid in archived:
+                self._path(pid).unlink(missing_ok=True)
+
+    @staticmethod
+    def _read(path):
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            logger.warning("Ignoring unreadable metrics file %s", path)
+            return None
+
+    def _add(self, totals, data, keep_gauges=True):
+        for name, samples in data.items():
+            metric = self.metrics.get(name)
+            if metric is None or (metric.kind == 'gauge' and not keep_gauges):
+                continue
+            values = totals.setdefault(name, {})
+            for key, value in samples:
+                key = tuple(key)
+                if metric.kind == 'histogram':
+                    current = values.get(key)
+                    values[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    values[key] = values.get(key, 0) + value
+
+    def ensure_flusher(self):
+        if self.directory is None or (self._flusher is not None and self._flusher.is_alive()):
+            return
+        with self._flusher_lock:
+            if self._flusher is None or not self._flusher.is_alive():
+                self._flusher = threading.Thread(target=self._run, name='quiz-metrics', daemon=True)
+                self._flusher.start()
+
+    def _run(self):
+        while True:
+            self.flush()
+            self.archive_dead()
+            time.sleep(self.flush_interval)
+
+    def merged(self):
+        """Samples of every process, added up."""
+        totals = self.collect()
+        if self.directory is None:
+            return totals
+        self.archive_dead()
+        own = self._path(os.getpid())
+        with self._files_locked():
+            for path in self.directory.glob('*.json'):
+                if path == own or not (path.stem.isdigit() or path.name == ARCHIVE):
+                    continue
+                data = self._read(path)
+                if data is not None:
+                    self._add(totals, data)
+        return totals
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, samples in self.merged().items():
+            metric = self.metrics[name]
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key in sorted(samples):
+                value = samples[key]
+                if metric.kind != 'histogram':
+                    lines.append(f"{name}{_labels(metric.labelnames, key)} {_number(value)}")
+                    continue
+                cumulative = 0
+                for bound, count in zip((*metric.buckets, '+Inf'), value):
+                    cumulative += count
+                    le = ('le', bound if bound == '+Inf' else _number(float(bound)))
+                    lines.append(f"{name}_bucket{_labels(metric.labelnames, key, [le])} {cumulative}")
+                lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_number(value[-2])}")
+                lines.append(f"{name}_count{_labels(metric.labelnames, key)} {value[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry(
+    directory=getattr(settings, 'QUIZ_METRICS_DIR', None),
+    flush_interval=getattr(settings, 'QUIZ_METRICS_FLUSH_INTERVAL', 5.0),
+)
+atexit.register(registry.flush)
+
+# --- Metrics ---
+
+ANSWERS = Counter(registry, 'quiz_answers_total', "Answers recorded, by result.", ['result'])
+QUIZ_STARTS = Counter(registry, 'quiz_starts_total', "Quizzes started, by mode.", ['mode', 'weighted'])
+IMPORT_ROWS = Counter(registry, 'quiz_import_rows_total', "Imported question rows, by outcome.", ['outcome'])
+IMPORT_SECONDS = Histogram(
+    registry, 'quiz_import_duration_seconds', "Duration of question imports.",
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0),
+)
+REQUEST_SECONDS = Histogram(registry, 'quiz_request_duration_seconds', "Request latency, by view.", ['view'])
+RESPONSES = Counter(registry, 'quiz_responses_total', "Responses, by view and status class.", ['view', 'status'])
+START_MODES = {'all': 'Totale', 'subject': 'Materia', 'lecture': 'Lezione'}
+
+
+def quiz_started(scope, weighted):
+    QUIZ_STARTS.inc(mode=START_MODES.get(scope, scope), weighted='1' if weighted else '0')
+
+
+PAGE_CACHE = Counter(
+    registry, 'quiz_page_cache_requests_total',
+    "Cached page lookups, by view and result (hit, miss, not_modified).", ['view', 'result'],
+)
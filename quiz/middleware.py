@@ -0,0 +1,263 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import metrics
+from .profiling import aprofile_call, profile_call, save_profile
+
+logger = logging.getLogger(__name__)
+
+_NUMBER_RE = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IN_LIST_RE = re.compile(r"IN \((?:\s*(?:%s|\?)\s*,?)+\)")
+_PLACEHOLDER_RE = re.compile(r"%s")
+# Nested atomic() blocks (e.g. inside a TestCase) add savepoint statements
+# that a top-level transaction does not run; they are not counted.
+_SAVEPOINT_PREFIXES = ('SAVEPOINT ', 'RELEASE SAVEPOINT ', 'ROLLBACK TO SAVEPOINT ')
+
+
+def query_shape(sql):
+    """Normalize a SQL string so queries differing only in literals compare equal."""
+    shape = _STRING_RE.sub('?', sql)
+    shape = _NUMBER_RE.sub('?', shape)
+    shape = _PLACEHOLDER_RE.sub('?', shape)
+    return _IN_LIST_RE.sub('IN (...)', shape)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith(_SAVEPOINT_PREFIXES):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        """Query shapes run at least ``threshold`` times: likely N+1 patterns."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+
+def budget_for(view_name):
+    budgets = getattr(settings, 'QUIZ_QUERY_BUDGETS', {})
+    return budgets.get(view_name, getattr(settings, 'QUIZ_QUERY_BUDGET_DEFAULT', None))
+
+
+class _SyncAndAsyncMiddleware:
+    """Base for the middleware below: runs natively under WSGI and ASGI.
+
+    A sync-only middleware makes Django wrap the rest of the chain in a
+    thread adapter, which would run the async views of quiz/async_views.py
+    through async_to_sync. Subclasses implement ``_call`` and ``__acall__``.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return self._call(request)
+
+
+# The QueryStats of the current request. Queries are recorded by a wrapper
+# installed on every connection (quiz/signals.py), which looks the stats up
+# here: context variables follow the request into sync_to_async threads,
+# where the async ORM runs its queries on that thread's own connection.
+_current_stats = ContextVar('quiz_query_stats', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class QueryBudgetMiddleware(_SyncAndAsyncMiddleware):
+    """Count the SQL queries of each request and flag N+1 patterns.
+
+    The stats are attached to the request and the response as
+    ``query_stats``. Going over the view's budget in QUIZ_QUERY_BUDGETS
+    (or QUIZ_QUERY_BUDGET_DEFAULT) or repeating a query shape
+    QUIZ_NPLUSONE_THRESHOLD times logs a warning; with
+    QUIZ_QUERY_BUDGET_STRICT the budget check raises instead. With
+    QUIZ_QUERY_COUNT_HEADER the count is also sent as ``X-Query-Count``
+    (benchmarks/load_test.py reads it).
+    """
+
+    def _call(self, request):
+        stats = request.query_stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._check(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = request.query_stats = QueryStats()
+        token = _current_stats.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self._check(request, response, stats)
+
+    def _check(self, request, response, stats):
+        response.query_stats = stats
+        if getattr(settings, 'QUIZ_QUERY_COUNT_HEADER', False):
+            response['X-Query-Count'] = str(stats.count)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.url_name if match else None
+        threshold = getattr(settings, 'QUIZ_NPLUSONE_THRESHOLD', 5)
+        for shape, n in stats.repeated(threshold):
+            logger.warning("Possible N+1 in %s (%s): %d x %s", view_name, request.path, n, shape)
+
+        budget = budget_for(view_name)
+        if budget is not None and stats.count > budget:
+            message = (
+                f"{view_name} ({request.path}) ran {stats.count} queries in "
+                f"{stats.duration * 1000:.1f} ms, budget is {budget}"
+            )
+            if getattr(settings, 'QUIZ_QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+
+class ServerTimingMiddleware(_SyncAndAsyncMiddleware):
+    """Send a Server-Timing header splitting each request into db, template and view time.
+
+    db and its query count come from QueryBudgetMiddleware (which must come
+    after this one), template from quiz.template_backend; view is the rest
+    of the time spent below this middleware. Off with QUIZ_SERVER_TIMING = False.
+    """
+
+    def _call(self, request):
+        start = time.perf_counter()
+        return self._add_header(request, self.get_response(request), start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        return self._add_header(request, await self.get_response(request), start)
+
+    def _add_header(self, request, response, start):
+        if not getattr(settings, 'QUIZ_SERVER_TIMING', True):
+            return response
+        total = time.perf_counter() - start
+        stats = getattr(request, 'query_stats', None)
+        db = stats.duration if stats else 0.0
+        template = getattr(request, 'template_time', 0.0)
+        metrics = [
+            f'db;dur={db * 1000:.2f};desc="{stats.count if stats else 0} queries"',
+            f'template;dur={template * 1000:.2f}',
+            f'view;dur={max(total - db - template, 0.0) * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ]
+        response['Server-Timing'] = ', '.join(metrics)
+        return response
+
+
+class ProfileMiddleware(_SyncAndAsyncMiddleware):
+    """Profile a single request with cProfile when a staff user asks for it.
+
+    Send ``X-Profile: 1`` or add ``?_profile=1``; the capture is stored by
+    quiz.profiling, its id returned in ``X-Profile-Id`` and listed at
+    /profiles/. Goes after AuthenticationMiddleware. Only one request is
+    profiled at a time. Under ASGI the event loop thread is profiled, so
+    the capture also holds whatever else the loop ran meanwhile, and work
+    done in sync_to_async threads does not show up.
+    """
+
+    def _call(self, request):
+        if not self._requested(request) or not request.user.is_staff:
+            return self.get_response(request)
+        start = time.perf_counter()
+        response, profiler = profile_call(self.get_response, request)
+        return self._save(request, response, profiler, start, request.user)
+
+    async def __acall__(self, request):
+        if not self._requested(request):
+            return await self.get_response(request)
+        user = await request.auser()
+        if not user.is_staff:
+            return await self.get_response(request)
+        start = time.perf_counter()
+        response, profiler = await aprofile_call(self.get_response, request)
+        return self._save(request, response, profiler, start, user)
+
+    def _save(self, request, response, profiler, start, user):
+        if profiler is None:
+            response['X-Profile-Id'] = 'busy'
+            return response
+        match = getattr(request, 'resolver_match', None)
+        stats = getattr(request, 'query_stats', None)
+        response['X-Profile-Id'] = save_profile(profiler, {
+            'method': request.method,
+            'path': request.get_full_path(),
+            'view': match.url_name if match else None,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 2),
+            'queries': stats.count if stats else None,
+            'user': user.get_username(),
+        })
+        return response
+
+    def _requested(self, request):
+        if not getattr(settings, 'QUIZ_PROFILING', True):
+            return False
+        return request.headers.get('X-Profile') == '1' or request.GET.get('_profile') == '1'
+
+
+class MetricsMiddleware(_SyncAndAsyncMiddleware):
+    """Record the latency and status of every request in quiz.metrics, per view."""
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        # Runs once per worker process, after any fork
+        metrics.registry.ensure_flusher()
+
+    def _call(self, request):
+        start = time.perf_counter()
+        return self._observe(request, self.get_response(request), start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        return self._observe(request, await self.get_response(request), start)
+
+    def _observe(self, request, response, start):
+        match = getattr(request, 'resolver_match', None)
+        view = match.url_name if match and match.url_name else 'unmatched'
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, view=view)
+        metrics.RESPONSES.inc(view=view, status=f"{response.status_code // 100}xx")
+        return response
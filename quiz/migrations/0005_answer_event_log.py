@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0004_subject_lecture_subject'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupState',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_event_id', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnswerEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lecture_id', models.IntegerField(blank=True, null=True)),
+                ('subject_id', models.IntegerField(blank=True, null=True)),
+                ('is_correct', models.BooleanField()),
+                ('answered_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('question', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='quiz.question')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyAnswerStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('scope', models.CharField(choices=[('global', 'Globale'), ('subject', 'Materia'), ('lecture', 'Lezione')], max_length=10)),
+                ('scope_id', models.IntegerField(default=0)),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('wrong', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'scope_id', 'day'), name='unique_daily_answer_stats')],
+            },
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:35
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_aggregates(apps, schema_editor):
+    Question = apps.get_model('quiz', 'Question')
+    AggregateStats = apps.get_model('quiz', 'AggregateStats')
+    rows = (
+        Question.objects.values('lecture_id', 'lecture__subject_id')
+        .annotate(questions=Count('id'), answered=Sum('times_answered'), correct=Sum('times_correct'), wrong=Sum('times_wrong'))
+        .order_by()
+    )
+    totals = defaultdict(lambda: [0, 0, 0, 0])
+    totals[('global', 0)]  # always keep a global row
+    for row in rows:
+        values = [row['questions'], row['answered'] or 0, row['correct'] or 0, row['wrong'] or 0]
+        keys = [('global', 0), ('lecture', row['lecture_id'])]
+        if row['lecture__subject_id'] is not None:
+            keys.append(('subject', row['lecture__subject_id']))
+        for key in keys:
+            for i, value in enumerate(values):
+                totals[key][i] += value
+    AggregateStats.objects.bulk_create([
+        AggregateStats(scope=scope, scope_id=scope_id, questions=q, answered=a, correct=c, wrong=w)
+        for (scope, scope_id), (q, a, c, w) in totals.items()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0005_answer_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AggregateStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('global', 'Globale'), ('subject', 'Materia'), ('lecture', 'Lezione')], max_length=10)),
+                ('scope_id', models.IntegerField(default=0)),
+                ('questions', models.IntegerField(default=0)),
+                ('answered', models.IntegerField(default=0)),
+                ('correct', models.IntegerField(default=0)),
+                ('wrong', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'scope_id'), name='unique_aggregate_stats')],
+            },
+        ),
+        migrations.RunPython(backfill_aggregates, migrations.RunPython.noop),
+    ]
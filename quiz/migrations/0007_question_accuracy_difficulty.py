@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:36
+
+from django.db import migrations, models
+from django.db.models import Case, ExpressionWrapper, F, FloatField, Value, When
+
+
+def backfill_accuracy_difficulty(apps, schema_editor):
+    Question = apps.get_model('quiz', 'Question')
+    Question.objects.update(
+        accuracy=Case(
+            When(times_answered__gte=3, then=ExpressionWrapper(
+                F('times_correct') * 100.0 / F('times_answered'), output_field=FloatField()
+            )),
+            default=Value(None),
+            output_field=FloatField(),
+        ),
+        difficulty=ExpressionWrapper(
+            (F('times_wrong') + 1.0) / (F('times_answered') + 2.0), output_field=FloatField()
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0006_aggregate_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='accuracy',
+            field=models.FloatField(blank=True, help_text='Percentuale di risposte corrette (vuota finché non ci sono abbastanza risposte)', null=True),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.FloatField(default=0.5, help_text='Tasso di errore smussato'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['accuracy'], name='question_accuracy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['lecture', 'accuracy'], name='question_lecture_acc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['difficulty'], name='question_difficulty_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['lecture', 'difficulty'], name='question_lecture_diff_idx'),
+        ),
+        migrations.RunPython(backfill_accuracy_difficulty, migrations.RunPython.noop),
+    ]
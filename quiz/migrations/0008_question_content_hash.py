@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:41
+
+import hashlib
+import unicodedata
+
+from django.db import migrations, models
+
+
+def _normalize(value):
+    return " ".join(unicodedata.normalize('NFKC', value).casefold().split())
+
+
+def backfill_content_hash(apps, schema_editor):
+    # Same hashing as quiz.models.content_hash_for. Only the oldest question of
+    # each duplicate group gets its hash; the others stay NULL so the unique
+    # constraint can be added, and merge_duplicate_questions folds them in.
+    Question = apps.get_model('quiz', 'Question')
+    AnswerOption = apps.get_model('quiz', 'AnswerOption')
+    options = {}
+    for question_id, text in AnswerOption.objects.order_by('id').values_list('question_id', 'text').iterator():
+        options.setdefault(question_id, []).append(text)
+    seen = set()
+    batch = []
+    for question in Question.objects.order_by('id').only('id', 'lecture_id', 'text').iterator():
+        parts = [_normalize(question.text)] + sorted(_normalize(t) for t in options.get(question.id, []))
+        content_hash = hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+        if (question.lecture_id, content_hash) in seen:
+            continue
+        seen.add((question.lecture_id, content_hash))
+        question.content_hash = content_hash
+        batch.append(question)
+        if len(batch) >= 500:
+            Question.objects.bulk_update(batch, ['content_hash'])
+            batch = []
+    Question.objects.bulk_update(batch, ['content_hash'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0007_question_accuracy_difficulty'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_content_hash, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.UniqueConstraint(fields=('lecture', 'content_hash'), name='question_lecture_hash_uniq'),
+        ),
+    ]
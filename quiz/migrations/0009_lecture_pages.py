@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 15:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0008_question_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LecturePage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.PositiveIntegerField()),
+                ('text', models.TextField(blank=True)),
+                ('source_hash', models.CharField(help_text='SHA-256 del PDF da cui è stata estratta la pagina', max_length=64)),
+                ('lecture', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='quiz.lecture')),
+            ],
+            options={
+                'ordering': ['page_number'],
+                'indexes': [models.Index(fields=['source_hash', 'page_number'], name='lecture_page_source_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lecture', 'page_number'), name='lecture_page_uniq')],
+            },
+        ),
+    ]
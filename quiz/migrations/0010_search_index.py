@@ -0,0 +1,114 @@
+from django.db import migrations
+
+# FTS5 index over question text, option texts and extracted lecture pages.
+# Questions use rowid = id * 2 and pages rowid = id * 2 + 1 so both share one
+# table. Triggers keep it in sync, including bulk_create and queryset updates
+# that bypass model signals. The 3-character prefix index serves the
+# search-as-you-type prefix queries built by quiz.search.match_expression.
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE quiz_search USING fts5(
+        kind UNINDEXED, ref_id UNINDEXED, lecture_id UNINDEXED, page_number UNINDEXED,
+        body, options,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '3'
+    )
+    """,
+    """
+    CREATE TRIGGER quiz_search_question_ai AFTER INSERT ON quiz_question BEGIN
+        INSERT INTO quiz_search(rowid, kind, ref_id, lecture_id, page_number, body, options)
+        VALUES (new.id * 2, 'question', new.id, new.lecture_id, new.page_number, new.text,
+                (SELECT group_concat(text, ' | ') FROM quiz_answeroption WHERE question_id = new.id));
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_question_au AFTER UPDATE OF text, lecture_id, page_number ON quiz_question BEGIN
+        UPDATE quiz_search SET body = new.text, lecture_id = new.lecture_id, page_number = new.page_number
+        WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_question_ad AFTER DELETE ON quiz_question BEGIN
+        DELETE FROM quiz_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_option_ai AFTER INSERT ON quiz_answeroption BEGIN
+        UPDATE quiz_search SET options = (SELECT group_concat(text, ' | ') FROM quiz_answeroption WHERE question_id = new.question_id)
+        WHERE rowid = new.question_id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_option_au AFTER UPDATE OF text, question_id ON quiz_answeroption BEGIN
+        UPDATE quiz_search SET options = (SELECT group_concat(text, ' | ') FROM quiz_answeroption WHERE question_id = old.question_id)
+        WHERE rowid = old.question_id * 2;
+        UPDATE quiz_search SET options = (SELECT group_concat(text, ' | ') FROM quiz_answeroption WHERE question_id = new.question_id)
+        WHERE rowid = new.question_id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_option_ad AFTER DELETE ON quiz_answeroption BEGIN
+        UPDATE quiz_search SET options = (SELECT group_concat(text, ' | ') FROM quiz_answeroption WHERE question_id = old.question_id)
+        WHERE rowid = old.question_id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_page_ai AFTER INSERT ON quiz_lecturepage BEGIN
+        INSERT INTO quiz_search(rowid, kind, ref_id, lecture_id, page_number, body, options)
+        VALUES (new.id * 2 + 1, 'page', new.id, new.lecture_id, new.page_number, new.text, '');
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_page_au AFTER UPDATE ON quiz_lecturepage BEGIN
+        UPDATE quiz_search SET body = new.text, lecture_id = new.lecture_id, page_number = new.page_number
+        WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER quiz_search_page_ad AFTER DELETE ON quiz_lecturepage BEGIN
+        DELETE FROM quiz_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+    """
+    INSERT INTO quiz_search(rowid, kind, ref_id, lecture_id, page_number, body, options)
+    SELECT q.id * 2, 'question', q.id, q.lecture_id, q.page_number, q.text,
+           (SELECT group_concat(o.text, ' | ') FROM quiz_answeroption o WHERE o.question_id = q.id)
+    FROM quiz_question q
+    """,
+    """
+    INSERT INTO quiz_search(rowid, kind, ref_id, lecture_id, page_number, body, options)
+    SELECT p.id * 2 + 1, 'page', p.id, p.lecture_id, p.page_number, p.text, ''
+    FROM quiz_lecturepage p
+    """,
+]
+
+DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS quiz_search_{name}"
+    for name in ('question_ai', 'question_au', 'question_ad', 'option_ai', 'option_au', 'option_ad', 'page_ai', 'page_au', 'page_ad')
+] + ["DROP TABLE IF EXISTS quiz_search"]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in CREATE_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for sql in DROP_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quiz', '0009_lecture_pages'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
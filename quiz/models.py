@@ -1,4 +1,9 @@
+import hashlib
+import unicodedata
+
 from django.db import models
+from django.db.models.lookups import GreaterThanOrEqual
+from django.utils import timezone
 
 class Subject(models.Model):
     name = models.CharField(max_length=200)
@@ -17,6 +22,100 @@ class Lecture(models.Model):
         return self.title
 
 
+class LecturePage(models.Model):
+    # Text of one page of the lecture slides, filled by extract_lecture_pages
+    lecture = models.ForeignKey(Lecture, on_delete=models.CASCADE, related_name="pages")
+    page_number = models.PositiveIntegerField()
+    text = models.TextField(blank=True)
+    source_hash = models.CharField(max_length=64, help_text="SHA-256 del PDF da cui è stata estratta la pagina")
+
+    class Meta:
+        ordering = ['page_number']
+        constraints = [
+            models.UniqueConstraint(fields=['lecture', 'page_number'], name='lecture_page_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['source_hash', 'page_number'], name='lecture_page_source_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lecture} - p. {self.page_number}"
+
+
+SLIDE_SNIPPET_LENGTH = 600
+
+
+def slide_snippet(text, length=SLIDE_SNIPPET_LENGTH):
+    """Trim a page's text for display next to the questions that cite it."""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    snippet = "\n".join(lines)
+    if len(snippet) <= length:
+        return snippet
+    return snippet[:length].rsplit(None, 1)[0] + "…"
+
+
+# Accuracy is only stored once a question has this many answers
+ACCURACY_MIN_ANSWERS = 3
+
+# Beta prior on the error rate behind the smoothed difficulty: an unseen
+# question has difficulty PRIOR_WRONG / (PRIOR_WRONG + PRIOR_RIGHT)
+PRIOR_WRONG = 1.0
+PRIOR_RIGHT = 1.0
+
+
+def accuracy_for(answered, correct):
+    if answered < ACCURACY_MIN_ANSWERS:
+        return None
+    return correct * 100.0 / answered
+
+
+def difficulty_for(answered, wrong):
+    return (wrong + PRIOR_WRONG) / (answered + PRIOR_WRONG + PRIOR_RIGHT)
+
+
+def accuracy_expression(answered, correct):
+    # SQL counterpart of accuracy_for(), for use inside UPDATE statements
+    return models.Case(
+        models.When(GreaterThanOrEqual(answered, ACCURACY_MIN_ANSWERS), then=models.ExpressionWrapper(
+            correct * 100.0 / answered, output_field=models.FloatField()
+        )),
+        default=models.Value(None),
+        output_field=models.FloatField(),
+    )
+
+
+def difficulty_expression(answered, wrong):
+    # SQL counterpart of difficulty_for()
+    return models.ExpressionWrapper(
+        (wrong + PRIOR_WRONG) / (answered + PRIOR_WRONG + PRIOR_RIGHT), output_field=models.FloatField()
+    )
+
+
+def _normalize_text(value):
+    return " ".join(unicodedata.normalize('NFKC', value).casefold().split())
+
+
+def content_hash_for(text, option_texts):
+    """Hash of the question text and its options, ignoring case, spacing and option order."""
+    parts = [_normalize_text(text)] + sorted(_normalize_text(t) for t in option_texts)
+    return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+
+class QuestionQuerySet(models.QuerySet):
+    def existing_hashes(self, hashes):
+        # One query, served by the (lecture, content_hash) unique index
+        rows = self.filter(content_hash__in=set(hashes)).values_list('lecture_id', 'content_hash')
+        return set(rows)
+
+
+    # Both orderings are served by the (accuracy) / (lecture, accuracy) indexes
+    def hardest(self, limit=5):
+        return self.filter(accuracy__isnull=False).order_by('accuracy')[:limit]
+
+    def easiest(self, limit=5):
+        return self.filter(accuracy__isnull=False).order_by('-accuracy')[:limit]
+
+
 class Question(models.Model):
     lecture = models.ForeignKey(Lecture, on_delete=models.CASCADE, related_name="questions")
     text = models.TextField()
@@ -27,10 +126,32 @@ class Question(models.Model):
     times_answered = models.IntegerField(default=0)
     times_correct = models.IntegerField(default=0)
     times_wrong = models.IntegerField(default=0)
+    # derived from the counters above and written in the same UPDATE
+    accuracy = models.FloatField(null=True, blank=True, help_text="Percentuale di risposte corrette (vuota finché non ci sono abbastanza risposte)")
+    difficulty = models.FloatField(default=PRIOR_WRONG / (PRIOR_WRONG + PRIOR_RIGHT), help_text="Tasso di errore smussato")
+    # content_hash_for(text, options): a lecture can't hold the same question twice
+    content_hash = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['accuracy'], name='question_accuracy_idx'),
+            models.Index(fields=['lecture', 'accuracy'], name='question_lecture_acc_idx'),
+            models.Index(fields=['difficulty'], name='question_difficulty_idx'),
+            models.Index(fields=['lecture', 'difficulty'], name='question_lecture_diff_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['lecture', 'content_hash'], name='question_lecture_hash_uniq'),
+        ]
 
     def __str__(self):
         return self.text[:80]
 
+    def refresh_content_hash(self):
+        self.content_hash = content_hash_for(self.text, self.options.values_list('text', flat=True))
+        Question.objects.filter(pk=self.pk).update(content_hash=self.content_hash)
+
 
 class AnswerOption(models.Model):
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="options")
@@ -39,3 +160,84 @@ class AnswerOption(models.Model):
 
     def __str__(self):
         return f"{'[OK]' if self.is_correct else '[X]'} {self.text[:60]}"
+
+
+class AnswerEvent(models.Model):
+    # Append-only log of answers. Lecture and subject are copied at insert
+    # time so rollups keep their attribution if the question is deleted later.
+    question = models.ForeignKey(Question, on_delete=models.DO_NOTHING, db_constraint=False, related_name="+")
+    lecture_id = models.IntegerField(null=True, blank=True)
+    subject_id = models.IntegerField(null=True, blank=True)
+    is_correct = models.BooleanField()
+    answered_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{'[OK]' if self.is_correct else '[X]'} Q{self.question_id} @ {self.answered_at:%Y-%m-%d %H:%M}"
+
+
+class PackSyncBatch(models.Model):
+    # Answer batches received from offline subject packs: the unique batch_id
+    # makes a resent batch count once, whichever worker receives it
+    batch_id = models.CharField(max_length=64, unique=True)
+    received_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.batch_id} @ {self.received_at:%Y-%m-%d %H:%M}"
+
+
+class DailyAnswerStats(models.Model):
+    SCOPE_GLOBAL = 'global'
+    SCOPE_SUBJECT = 'subject'
+    SCOPE_LECTURE = 'lecture'
+
+    day = models.DateField()
+    scope = models.CharField(max_length=10, choices=[(SCOPE_GLOBAL, 'Globale'), (SCOPE_SUBJECT, 'Materia'), (SCOPE_LECTURE, 'Lezione')])
+    scope_id = models.IntegerField(default=0)  # 0 for the global scope
+    answered = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    wrong = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id', 'day'], name='unique_daily_answer_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} {self.day} ({self.correct}/{self.answered})"
+
+
+class RollupState(models.Model):
+    # High-water mark of the last AnswerEvent folded into the rollup tables
+    name = models.CharField(max_length=50, primary_key=True)
+    last_event_id = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.last_event_id}"
+
+
+class AggregateStats(models.Model):
+    # Materialized totals for the stats pages, kept current by quiz/aggregates.py
+    SCOPE_GLOBAL = 'global'
+    SCOPE_SUBJECT = 'subject'
+    SCOPE_LECTURE = 'lecture'
+
+    scope = models.CharField(max_length=10, choices=[(SCOPE_GLOBAL, 'Globale'), (SCOPE_SUBJECT, 'Materia'), (SCOPE_LECTURE, 'Lezione')])
+    scope_id = models.IntegerField(default=0)  # 0 for the global scope
+    questions = models.IntegerField(default=0)
+    answered = models.IntegerField(default=0)
+    correct = models.IntegerField(default=0)
+    wrong = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'scope_id'], name='unique_aggregate_stats'),
+        ]
+
+    @property
+    def accuracy(self):
+        if not self.answered:
+            return 0
+        return round((self.correct / self.answered) * 100, 1)
+
+    def __str__(self):
+        return f"{self.scope}:{self.scope_id} ({self.correct}/{self.answered})"
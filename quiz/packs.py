@@ -0,0 +1,118 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from . import page_cache
+from .models import AnswerOption, Lecture, PackSyncBatch, Question
+
+# Offline "subject packs": every lecture, question and option of a subject
+# in one compact JSON document, so quiz/pack_play.html can run quizzes in the
+# browser without a request per question. A pack is identified by the hash
+# of its content and cached under the generations of what it contains, so
+# it is built once per change and its versioned URL can be cached forever.
+
+PACK_FORMAT = 1
+PACK_DEPENDENCIES = (page_cache.SUBJECTS, page_cache.LECTURES, page_cache.QUESTIONS, page_cache.OPTIONS)
+
+
+class Pack:
+    def __init__(self, subject_id, version, body, questions, question_ids=None):
+        self.subject_id = subject_id
+        self.version = version
+        self.body = body
+        self.questions = questions
+        self.question_ids = question_ids
+
+
+def _cache():
+    return caches[getattr(settings, 'QUIZ_PAGE_CACHE_ALIAS', 'default')]
+
+
+def build_pack(subject):
+    """Serialize a subject's questions; three queries however large the subject is.
+
+    Options are ``[id, text]`` pairs in id order and ``correct`` is the id
+    of the right one, so the browser can grade answers on its own.
+    """
+    lectures = list(Lecture.objects.filter(subject=subject).order_by('id').values_list('id', 'title'))
+    questions = {}
+    for qid, lecture_id, text, nature, page_number in (
+        Question.objects.filter(lecture__subject=subject).order_by('id')
+        .values_list('id', 'lecture_id', 'text', 'nature', 'page_number')
+    ):
+        questions[qid] = {
+            'id': qid, 'lecture': lecture_id, 'text': text, 'nature': nature,
+            'page': page_number, 'options': [], 'correct': None,
+        }
+    for option_id, question_id, text, is_correct in (
+        AnswerOption.objects.filter(question__lecture__subject=subject).order_by('id')
+        .values_list('id', 'question_id', 'text', 'is_correct')
+    ):
+        question = questions.get(question_id)
+        if question is None:
+            continue  # added between the two queries
+        question['options'].append([option_id, text])
+        if is_correct:
+            question['correct'] = option_id
+
+    content = {
+        'subject': {'id': subject.id, 'name': subject.name},
+        'lectures': [{'id': lecture_id, 'title': title} for lecture_id, title in lectures],
+        'questions': list(questions.values()),
+    }
+    canonical = json.dumps(content, ensure_ascii=False, separators=(',', ':'), sort_keys=True)
+    version = hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:16]
+    body = json.dumps({'format': PACK_FORMAT, 'version': version, **content}, ensure_ascii=False, separators=(',', ':'))
+    return Pack(subject.id, version, body.encode('utf-8'), len(questions), frozenset(questions))
+
+
+def _body_key(subject_id, version):
+    return f"quiz:pack-body:{subject_id}:{version}"
+
+
+def _ids_key(subject_id, version):
+    return f"quiz:pack-ids:{subject_id}:{version}"
+
+
+def subject_pack(subject):
+    """The current pack of ``subject``, rebuilt only after its content changed."""
+    if not page_cache.enabled():
+        return build_pack(subject)
+    key = f"quiz:pack:{subject.id}:{'-'.join(map(str, page_cache.generations(PACK_DEPENDENCIES)))}"
+    cache = _cache()
+    entry = cache.get(key)
+    if entry is not None:
+        version, questions = entry
+        body = cache.get(_body_key(subject.id, version))
+        if body is not None:
+            return Pack(subject.id, version, body, questions)
+    pack = build_pack(subject)
+    timeout = getattr(settings, 'QUIZ_PACK_CACHE_TIMEOUT', 24 * 3600)
+    # Unchanged content keeps its version (and body) across generation bumps
+    cache.set_many({
+        _body_key(subject.id, pack.version): pack.body,
+        _ids_key(subject.id, pack.version): pack.question_ids,
+        key: (pack.version, pack.questions),
+    }, timeout)
+    return pack
+
+
+def cached_pack_body(subject_id, version):
+    """The body of a pack version if it is still cached; no database access."""
+    return _cache().get(_body_key(subject_id, version))
+
+
+def cached_pack_question_ids(subject_id, version):
+    """The question ids of a pack version if it is still cached; no database access."""
+    return _cache().get(_ids_key(subject_id, version))
+
+
+def forget_synced_batches():
+    """Delete the pack batch ids older than QUIZ_PACK_BATCH_DEDUP_TIMEOUT; returns how many."""
+    timeout = getattr(settings, 'QUIZ_PACK_BATCH_DEDUP_TIMEOUT', 7 * 24 * 3600)
+    deleted, _ = PackSyncBatch.objects.filter(received_at__lt=timezone.now() - timedelta(seconds=timeout)).delete()
+    return deleted
@@ -0,0 +1,183 @@
+import hashlib
+import logging
+import time
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+# Generation counters for the content behind the read-mostly pages. Each
+# generation is the time (in microseconds) of the last change to its kind of
+# content, so it doubles as the Last-Modified date, and a counter lost to a
+# cache eviction or restart comes back newer than anything cached before.
+# The generations live in their own cache (QUIZ_GENERATION_CACHE_ALIAS),
+# which every worker process must share; the pages themselves can stay in a
+# per-process cache since their keys are derived from the generations.
+SUBJECTS = 'subject'
+LECTURES = 'lecture'
+QUESTIONS = 'question'
+OPTIONS = 'option'
+PAGES = 'page'
+ANSWERS = 'answers'
+
+
+def _cache():
+    return caches[getattr(settings, 'QUIZ_PAGE_CACHE_ALIAS', 'default')]
+
+
+def _generation_cache():
+    return caches[getattr(settings, 'QUIZ_GENERATION_CACHE_ALIAS', 'generations')]
+
+
+_warned = False
+
+
+def enabled():
+    """Whether generations are shared, so cached content can be trusted.
+
+    Generations in a per-process cache (LocMemCache) would let a change
+    seen by one worker go unnoticed by the others, so caching is off then
+    unless QUIZ_GENERATIONS_PER_PROCESS says there is a single process.
+    """
+    global _warned
+    if not isinstance(_generation_cache(), LocMemCache) or getattr(settings, 'QUIZ_GENERATIONS_PER_PROCESS', False):
+        return True
+    if not _warned:
+        _warned = True
+        logger.warning("Page cache disabled: QUIZ_GENERATION_CACHE_ALIAS is a per-process cache")
+    return False
+
+
+def _key(name):
+    return f"quiz:generation:{name}"
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def bump(*names):
+    """Move the given generations forward once the current transaction commits."""
+    def apply():
+        _generation_cache().set_many({_key(name): _now() for name in names}, timeout=None)
+    transaction.on_commit(apply)
+
+
+def generations(names):
+    cache = _generation_cache()
+    values = cache.get_many([_key(name) for name in names])
+    missing = {_key(name): _now() for name in names if _key(name) not in values}
+    for key, value in missing.items():
+        # add() so a concurrent bump is not overwritten
+        if not cache.add(key, value, timeout=None):
+            value = cache.get(key, value)
+        values[key] = value
+    return [values[_key(name)] for name in names]
+
+
+async def agenerations(names):
+    cache = _generation_cache()
+    values = await cache.aget_many([_key(name) for name in names])
+    for name in names:
+        key = _key(name)
+        if key not in values:
+            value = _now()
+            if not await cache.aadd(key, value, timeout=None):
+                value = await cache.aget(key, value)
+            values[key] = value
+    return [values[_key(name)] for name in names]
+
+
+def _validators(request, view_name, values):
+    # The date is part of the ETag because pages show "today"-relative trends
+    material = f"{view_name}|{request.get_full_path()}|{timezone.localdate()}|{values}"
+    etag = quote_etag(hashlib.blake2b(material.encode('utf-8'), digest_size=16).hexdigest())
+    return etag, max(values) // 1_000_000
+
+
+def _finish(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Let browsers keep the page but revalidate it on every visit
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def _from_cache(entry):
+    content, content_type = entry
+    return HttpResponse(content, content_type=content_type)
+
+
+def _cacheable(response):
+    return response.status_code == 200 and not response.streaming and not response.cookies
+
+
+def cached_page(*dependencies):
+    """Cache a read-only view's response under the generations it depends on.
+
+    A conditional GET whose validators still match gets a 304 without
+    touching the database; otherwise the rendered body is served from the
+    cache, and only a change to one of ``dependencies`` forces a new render.
+    Works for sync and async views. Without shared generations (see
+    ``enabled``) the view is served uncached.
+    """
+    timeout = getattr(settings, 'QUIZ_PAGE_CACHE_TIMEOUT', 300)
+
+    def decorator(view):
+        view_name = f"{view.__module__}.{view.__qualname__}"
+
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or not enabled():
+                    return await view(request, *args, **kwargs)
+                etag, last_modified = _validators(request, view_name, await agenerations(dependencies))
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is not None:
+                    metrics.PAGE_CACHE.inc(view=view.__name__, result='not_modified')
+                    return _finish(response, etag, last_modified)
+                key = f"quiz:page:{etag}"
+                entry = await _cache().aget(key)
+                metrics.PAGE_CACHE.inc(view=view.__name__, result='miss' if entry is None else 'hit')
+                if entry is not None:
+                    return _finish(_from_cache(entry), etag, last_modified)
+                response = await view(request, *args, **kwargs)
+                if _cacheable(response):
+                    await _cache().aset(key, (response.content, response['Content-Type']), timeout)
+                    _finish(response, etag, last_modified)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not enabled():
+                return view(request, *args, **kwargs)
+            etag, last_modified = _validators(request, view_name, generations(dependencies))
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                metrics.PAGE_CACHE.inc(view=view.__name__, result='not_modified')
+                return _finish(response, etag, last_modified)
+            key = f"quiz:page:{etag}"
+            entry = _cache().get(key)
+            metrics.PAGE_CACHE.inc(view=view.__name__, result='miss' if entry is None else 'hit')
+            if entry is not None:
+                return _finish(_from_cache(entry), etag, last_modified)
+            response = view(request, *args, **kwargs)
+            if _cacheable(response):
+                _cache().set(key, (response.content, response['Content-Type']), timeout)
+                _finish(response, etag, last_modified)
+            return response
+        return wrapper
+
+    return decorator
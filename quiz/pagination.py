@@ -0,0 +1,97 @@
+from math import ceil
+
+from django.db.models import Max, Min
+
+# Keyset ("seek") pagination on the primary key. A page is addressed by the
+# last id of the previous page (?after=) or the first id of the next one
+# (?before=), so every page is an index range scan of `size` rows, however
+# deep it is, instead of an OFFSET that skips all the rows before it.
+
+
+def parse_cursor(value):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def page_size(value, default, maximum):
+    try:
+        return min(max(int(value), 1), maximum)
+    except (TypeError, ValueError):
+        return default
+
+
+class KeysetPage:
+    def __init__(self, items, size, next_after=None, prev_before=None, estimated_total=None):
+        self.items = items
+        self.size = size
+        self.next_after = next_after
+        self.prev_before = prev_before
+        self.estimated_total = estimated_total
+
+    @property
+    def estimated_pages(self):
+        if self.estimated_total is None:
+            return None
+        return max(ceil(self.estimated_total / self.size), 1)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def _key(row):
+    return row['id'] if isinstance(row, dict) else row.pk
+
+
+def _query(queryset, after, before, size):
+    if before is not None:
+        return queryset.filter(pk__lt=before).order_by('-pk')[:size + 1]
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    return queryset.order_by('pk')[:size + 1]
+
+
+def _page(rows, after, before, size):
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if before is not None:
+        rows.reverse()
+        return KeysetPage(
+            rows, size,
+            next_after=_key(rows[-1]) if rows else None,
+            prev_before=_key(rows[0]) if has_more else None,
+        )
+    return KeysetPage(
+        rows, size,
+        next_after=_key(rows[-1]) if has_more else None,
+        prev_before=_key(rows[0]) if after is not None and rows else None,
+    )
+
+
+def keyset_page(queryset, after=None, before=None, size=50):
+    return _page(list(_query(queryset, after, before, size)), after, before, size)
+
+
+async def akeyset_page(queryset, after=None, before=None, size=50):
+    rows = [row async for row in _query(queryset, after, before, size)]
+    return _page(rows, after, before, size)
+
+
+def _estimate(bounds):
+    if bounds['lo'] is None:
+        return 0
+    return bounds['hi'] - bounds['lo'] + 1
+
+
+def estimate_count(queryset):
+    """Upper bound on the row count from the id range: two index seeks, no COUNT scan."""
+    return _estimate(queryset.order_by().aggregate(lo=Min('pk'), hi=Max('pk')))
+
+
+async def aestimate_count(queryset):
+    return _estimate(await queryset.order_by().aaggregate(lo=Min('pk'), hi=Max('pk')))
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.db import transaction
+
+from . import page_cache
+from .models import Lecture, LecturePage
+from .snapshots import snapshot_cache
+
+PAGES_PER_TASK = 8
+_LECTURE_NUMBER_RE = re.compile(r'(\d+)\D*$')
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def page_count(path):
+    from pypdf import PdfReader
+    return len(PdfReader(path).pages)
+
+
+def extract_pages(path, page_numbers):
+    """Extract the text of the given 1-based pages. Runs in a worker process."""
+    from pypdf import PdfReader
+    reader = PdfReader(path)
+    return [
+        (number, (reader.pages[number - 1].extract_text() or '').replace('\x00', ''))
+        for number in page_numbers
+    ]
+
+
+def lecture_for_file(path):
+    """Guess the lecture from the number at the end of the file name (``..._01.pdf``)."""
+    match = _LECTURE_NUMBER_RE.search(os.path.splitext(os.path.basename(path))[0])
+    if not match:
+        return None
+    title_re = re.compile(rf'\b(Lecture|Lezione)\s+0*{int(match.group(1))}\b', re.IGNORECASE)
+    candidates = [lecture for lecture in Lecture.objects.order_by('id') if title_re.search(lecture.title)]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+class ExtractionResult:
+    def __init__(self, path, lecture, status, pages=0, extracted=0):
+        self.path = path
+        self.lecture = lecture
+        self.status = status  # 'unchanged', 'extracted' or 'failed'
+        self.pages = pages
+        self.extracted = extracted
+        self.error = None
+
+
+def extract_lectures(jobs, workers=None, force=False):
+    """Extract and store the pages of ``[(pdf_path, lecture)]``.
+
+    Files whose hash matches the pages already stored for their lecture are
+    skipped. Other files reuse any page cached under the same file hash and
+    page number (for example the same PDF attached to another lecture), and
+    the remaining pages of each distinct file are extracted once, in a
+    process pool. Each lecture's pages are replaced in a single transaction
+    once its file is complete.
+    """
+    results = []
+    tasks = []
+    pending = []  # (result, source_hash)
+    texts = {}  # source_hash -> {page_number: text}
+    for path, lecture in jobs:
+        source_hash = file_hash(path)
+        stored = set(LecturePage.objects.filter(lecture=lecture).values_list('source_hash', flat=True))
+        if stored == {source_hash} and not force:
+            results.append(ExtractionResult(path, lecture, 'unchanged'))
+            continue
+        result = ExtractionResult(path, lecture, 'extracted')
+        results.append(result)
+        try:
+            result.pages = page_count(path)
+        except Exception as e:
+            result.status, result.error = 'failed', str(e)
+            continue
+        if source_hash not in texts:
+            texts[source_hash] = {} if force else dict(
+                LecturePage.objects.filter(source_hash=source_hash).values_list('page_number', 'text')
+            )
+            missing = [n for n in range(1, result.pages + 1) if n not in texts[source_hash]]
+            result.extracted = len(missing)
+            for start in range(0, len(missing), PAGES_PER_TASK):
+                tasks.append((source_hash, path, missing[start:start + PAGES_PER_TASK]))
+        pending.append((result, source_hash))
+
+    failed = {}
+    if tasks:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(extract_pages, path, numbers): source_hash for source_hash, path, numbers in tasks}
+            for future in as_completed(futures):
+                source_hash = futures[future]
+                try:
+                    texts[source_hash].update(future.result())
+                except Exception as e:
+                    failed[source_hash] = str(e)
+
+    for result, source_hash in pending:
+        if source_hash in failed:
+            result.status, result.error = 'failed', failed[source_hash]
+            continue
+        with transaction.atomic():
+            LecturePage.objects.filter(lecture=result.lecture).delete()
+            LecturePage.objects.bulk_create([
+                LecturePage(lecture=result.lecture, page_number=number, text=texts[source_hash][number], source_hash=source_hash)
+                for number in range(1, result.pages + 1)
+            ], batch_size=500)
+        # bulk_create sends no signals
+        snapshot_cache.invalidate_lecture(result.lecture.id)
+        page_cache.bump(page_cache.PAGES)
+    return results
@@ -0,0 +1,133 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+
+# On-demand cProfile captures of single requests, written by
+# quiz.middleware.ProfileMiddleware and listed at /profiles/ for staff.
+# Each capture is a pstats file (<id>.prof, loadable with pstats or
+# snakeviz) next to a small JSON file describing the request.
+
+PROFILE_ID_RE = re.compile(r'^[\w-]+$')
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls')
+
+# cProfile can only have one active profiler per process on newer Pythons,
+# and concurrent captures would mix their threads anyway
+_capture_lock = threading.Lock()
+
+
+def profile_dir():
+    return Path(getattr(settings, 'QUIZ_PROFILE_DIR', settings.BASE_DIR / '.cache' / 'profiles'))
+
+
+def _path(profile_id, suffix):
+    if not PROFILE_ID_RE.match(profile_id):
+        raise FileNotFoundError(profile_id)
+    return profile_dir() / f"{profile_id}{suffix}"
+
+
+def profile_call(func, *args):
+    """Run func(*args) under cProfile; returns (result, profiler or None if busy)."""
+    if not _capture_lock.acquire(blocking=False):
+        return func(*args), None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = func(*args)
+        finally:
+            profiler.disable()
+        return result, profiler
+    finally:
+        _capture_lock.release()
+
+
+async def aprofile_call(func, *args):
+    """Async profile_call: profiles the event loop thread while func(*args) is awaited."""
+    if not _capture_lock.acquire(blocking=False):
+        return await func(*args), None
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            result = await func(*args)
+        finally:
+            profiler.disable()
+        return result, profiler
+    finally:
+        _capture_lock.release()
+
+
+def save_profile(profiler, meta):
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    profiler.dump_stats(_path(profile_id, '.prof'))
+    meta = dict(meta, id=profile_id, created=time.time())
+    _path(profile_id, '.json').write_text(json.dumps(meta))
+    _prune(getattr(settings, 'QUIZ_PROFILE_KEEP', 50))
+    return profile_id
+
+
+def _prune(keep):
+    for meta_path in sorted(profile_dir().glob('*.json'), reverse=True)[keep:]:
+        for path in (meta_path, meta_path.with_suffix('.prof')):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """Metadata of the stored captures, newest first."""
+    profiles = []
+    for meta_path in sorted(profile_dir().glob('*.json'), reverse=True):
+        try:
+            profiles.append(json.loads(meta_path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def load_profile(profile_id):
+    return json.loads(_path(profile_id, '.json').read_text())
+
+
+def profile_file(profile_id):
+    path = _path(profile_id, '.prof')
+    if not path.exists():
+        raise FileNotFoundError(profile_id)
+    return path
+
+
+def _short_path(filename):
+    base = str(settings.BASE_DIR) + os.sep
+    if filename.startswith(base):
+        return filename[len(base):]
+    _, marker, rest = filename.rpartition('site-packages' + os.sep)
+    return rest if marker else filename
+
+
+def top_functions(profile_id, sort='cumulative', limit=40):
+    """Total profiled time (ms) and the ``limit`` most expensive functions of a capture."""
+    stats = pstats.Stats(str(profile_file(profile_id)))
+    stats.sort_stats(sort if sort in SORT_KEYS else 'cumulative')
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, tottime, cumtime, _ = stats.stats[func]
+        filename, line, name = func
+        rows.append({
+            'function': name if filename == '~' else f"{_short_path(filename)}:{line}({name})",
+            'calls': str(calls) if calls == primitive_calls else f"{calls}/{primitive_calls}",
+            'tottime_ms': tottime * 1000,
+            'cumtime_ms': cumtime * 1000,
+            'percall_ms': cumtime * 1000 / primitive_calls if primitive_calls else 0.0,
+        })
+    return stats.total_tt * 1000, rows
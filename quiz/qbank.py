@@ -0,0 +1,344 @@
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+from collections import namedtuple
+from functools import wraps
+
+from . import page_cache
+from .models import AnswerOption, Lecture, Subject
+from .snapshots import SNAPSHOT_DEPENDENCIES, OptionSnapshot, QuestionSnapshot, snapshot_cache
+
+logger = logging.getLogger(__name__)
+
+# Binary question banks (.qbank): a compact alternative to the JSON exports
+# that can be read in place through mmap.
+#
+#   header     HEADER, then the sections at the offsets it lists
+#   subjects   SUBJECT records
+#   lectures   LECTURE records, subject as an index into subjects (-1: none)
+#   questions  QUESTION records sorted by id; options are a contiguous run
+#              of OPTION records starting at first_option
+#   index      the question ids again as a sorted uint32 array, so a lookup
+#              by id is a binary search over 4-byte entries
+#   options    OPTION records
+#   strings    UTF-8 string table; records refer to (offset, length) pairs
+#              and identical strings are stored once
+#
+# All integers are little-endian. The header ends with the CRC-32 of
+# everything after it and the export time (Unix seconds, 0 if unknown).
+
+MAGIC = b'QBNK'
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct('<4sHH4I7QII')
+SUBJECT = struct.Struct('<5I')           # id, name, description
+LECTURE = struct.Struct('<Ii4I')         # id, subject index, title, description
+QUESTION = struct.Struct('<7Ii3I2B2x')   # id, lecture index, text, nature, first option, page, 3 counters, n options, correct
+OPTION = struct.Struct('<3I')            # id, text
+INDEX_ENTRY = struct.Struct('<I')
+
+NO_PAGE = -1
+NO_CORRECT = 255
+U32_MAX = 2 ** 32 - 1
+
+BankQuestion = namedtuple('BankQuestion', [
+    'id', 'lecture_id', 'subject_id', 'text', 'nature', 'page_number', 'options', 'correct_option_id',
+    'times_answered', 'times_correct', 'times_wrong',
+])
+BankOption = namedtuple('BankOption', ['id', 'text'])
+
+
+class BankFormatError(ValueError):
+    pass
+
+
+def _u32(value, what):
+    if not 0 <= value <= U32_MAX:
+        raise BankFormatError(f"{what} {value} non rappresentabile (uint32).")
+    return value
+
+
+class _Strings:
+    def __init__(self):
+        self.data = bytearray()
+        self.refs = {}
+
+    def add(self, text):
+        ref = self.refs.get(text)
+        if ref is None:
+            encoded = (text or '').encode('utf-8')
+            ref = self.refs[text] = (len(self.data), len(encoded))
+            self.data += encoded
+        return ref
+
+
+def write_bank(fileobj, questions):
+    """Write ``questions`` (a Question queryset) and their lectures, subjects and options.
+
+    Reads flat value tuples, four queries in all, and returns the counts
+    written: ``(subjects, lectures, questions, options)``.
+    """
+    # Taken before reading, so it predates any change the file could miss
+    exported_at = int(time.time())
+    strings = _Strings()
+    db = questions.db
+    question_rows = list(
+        questions.order_by('id').values_list(
+            'id', 'lecture_id', 'text', 'nature', 'page_number', 'times_answered', 'times_correct', 'times_wrong',
+        )
+    )
+    lecture_ids = sorted({row[1] for row in question_rows})
+    lecture_rows = list(Lecture.objects.using(db).filter(pk__in=lecture_ids).order_by('id').values_list('id', 'subject_id', 'title', 'description'))
+    subject_ids = sorted({row[1] for row in lecture_rows if row[1] is not None})
+    subject_rows = list(Subject.objects.using(db).filter(pk__in=subject_ids).order_by('id').values_list('id', 'name', 'description'))
+
+    options = {}
+    for option_id, question_id, text, is_correct in (
+        AnswerOption.objects.using(db).filter(question__in=questions).order_by('id').values_list('id', 'question_id', 'text', 'is_correct')
+    ):
+        options.setdefault(question_id, []).append((option_id, text, is_correct))
+
+    subject_index = {row[0]: i for i, row in enumerate(subject_rows)}
+    lecture_index = {row[0]: i for i, row in enumerate(lecture_rows)}
+
+    subjects = bytearray()
+    for subject_id, name, description in subject_rows:
+        subjects += SUBJECT.pack(_u32(subject_id, "id materia"), *strings.add(name), *strings.add(description))
+    lectures = bytearray()
+    for lecture_id, subject_id, title, description in lecture_rows:
+        lectures += LECTURE.pack(
+            _u32(lecture_id, "id lezione"), subject_index.get(subject_id, -1), *strings.add(title), *strings.add(description),
+        )
+
+    records, index, option_records = bytearray(), bytearray(), bytearray()
+    option_count = 0
+    for question_id, lecture_id, text, nature, page_number, answered, correct, wrong in question_rows:
+        question_options = options.get(question_id, [])
+        if len(question_options) >= NO_CORRECT:
+            raise BankFormatError(f"La domanda {question_id} ha troppe opzioni.")
+        correct_index = next((i for i, (_, _, is_correct) in enumerate(question_options) if is_correct), NO_CORRECT)
+        records += QUESTION.pack(
+            _u32(question_id, "id domanda"), lecture_index[lecture_id], *strings.add(text), *strings.add(nature),
+            option_count, NO_PAGE if page_number is None else page_number,
+            _u32(answered, "contatore"), _u32(correct, "contatore"), _u32(wrong, "contatore"),
+            len(question_options), correct_index,
+        )
+        index += INDEX_ENTRY.pack(question_id)
+        for option_id, option_text, _ in question_options:
+            option_records += OPTION.pack(_u32(option_id, "id opzione"), *strings.add(option_text))
+        option_count += len(question_options)
+
+    sections = [subjects, lectures, records, index, option_records, strings.data]
+    offsets, position = [], HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+    crc = 0
+    for section in sections:
+        crc = zlib.crc32(section, crc)
+
+    fileobj.write(HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0,
+        len(subject_rows), len(lecture_rows), len(question_rows), option_count,
+        *offsets, len(strings.data), crc, exported_at,
+    ))
+    for section in sections:
+        fileobj.write(section)
+    return len(subject_rows), len(lecture_rows), len(question_rows), option_count
+
+
+def _damaged(method):
+    # Records pointing outside their section (a corrupted file read without
+    # verify()) fail while unpacking; report them like any format error
+    @wraps(method)
+    def wrapper(self, *args):
+        try:
+            return method(self, *args)
+        except (struct.error, IndexError, UnicodeDecodeError) as e:
+            raise BankFormatError(f"Question bank danneggiato: {e}") from e
+    return wrapper
+
+
+class BankReader:
+    """Random access to a .qbank file (mapped with mmap) or to its bytes.
+
+    Nothing is decoded up front: records are unpacked and strings decoded
+    only when they are asked for.
+    """
+
+    def __init__(self, source):
+        self._file = None
+        if isinstance(source, (str, os.PathLike)):
+            self._file = open(source, 'rb')
+            try:
+                self._buf = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:  # empty file
+                self._buf = b''
+        else:
+            self._buf = source
+        if len(self._buf) < HEADER.size:
+            self.close()
+            raise BankFormatError("File troppo corto per essere un question bank.")
+        (magic, version, _, self.num_subjects, self.num_lectures, self.num_questions, self.num_options,
+         self._subjects, self._lectures, self._questions, self._index, self._options, self._strings,
+         self._strings_size, self._crc, self.exported_at) = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            self.close()
+            raise BankFormatError("Non è un question bank (.qbank).")
+        if version != FORMAT_VERSION:
+            self.close()
+            raise BankFormatError(f"Versione del formato non supportata: {version}.")
+        sections = (
+            (self._subjects, SUBJECT.size * self.num_subjects),
+            (self._lectures, LECTURE.size * self.num_lectures),
+            (self._questions, QUESTION.size * self.num_questions),
+            (self._index, INDEX_ENTRY.size * self.num_questions),
+            (self._options, OPTION.size * self.num_options),
+            (self._strings, self._strings_size),
+        )
+        if any(offset < HEADER.size or offset + size > len(self._buf) for offset, size in sections):
+            self.close()
+            raise BankFormatError("Question bank troncato.")
+
+    def close(self):
+        if isinstance(self._buf, mmap.mmap):
+            self._buf.close()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def verify(self):
+        if zlib.crc32(memoryview(self._buf)[HEADER.size:]) != self._crc:
+            raise BankFormatError("Checksum non valido: il file è danneggiato.")
+
+    def _string(self, offset, length):
+        if offset + length > self._strings_size:
+            raise IndexError("string outside the string table")
+        start = self._strings + offset
+        return str(self._buf[start:start + length], 'utf-8')
+
+    @_damaged
+    def find(self, question_id):
+        """Position of a question in the file, by binary search on the id index."""
+        lo, hi = 0, self.num_questions
+        while lo < hi:
+            mid = (lo + hi) // 2
+            (value,) = INDEX_ENTRY.unpack_from(self._buf, self._index + 4 * mid)
+            if value < question_id:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.num_questions and INDEX_ENTRY.unpack_from(self._buf, self._index + 4 * lo)[0] == question_id:
+            return lo
+        return None
+
+    def question(self, question_id):
+        position = self.find(question_id)
+        return None if position is None else self.question_at(position)
+
+    @_damaged
+    def question_at(self, position):
+        (question_id, lecture_position, text_off, text_len, nature_off, nature_len, first_option,
+         page_number, answered, correct, wrong, num_options, correct_index) = QUESTION.unpack_from(
+            self._buf, self._questions + QUESTION.size * position)
+        if not 0 <= lecture_position < self.num_lectures or first_option + num_options > self.num_options:
+            raise IndexError("record outside its section")
+        lecture_id, subject_position = LECTURE.unpack_from(self._buf, self._lectures + LECTURE.size * lecture_position)[:2]
+        if subject_position >= self.num_subjects:
+            raise IndexError("record outside its section")
+        subject_id = SUBJECT.unpack_from(self._buf, self._subjects + SUBJECT.size * subject_position)[0] if subject_position >= 0 else None
+        options = []
+        for i in range(num_options):
+            option_id, option_off, option_len = OPTION.unpack_from(self._buf, self._options + OPTION.size * (first_option + i))
+            options.append(BankOption(option_id, self._string(option_off, option_len)))
+        return BankQuestion(
+            id=question_id, lecture_id=lecture_id, subject_id=subject_id,
+            text=self._string(text_off, text_len), nature=self._string(nature_off, nature_len),
+            page_number=None if page_number == NO_PAGE else page_number,
+            options=tuple(options),
+            correct_option_id=options[correct_index].id if correct_index != NO_CORRECT else None,
+            times_answered=answered, times_correct=correct, times_wrong=wrong,
+        )
+
+    @_damaged
+    def subjects(self):
+        """``(id, name, description)`` of every subject."""
+        return [
+            (subject_id, self._string(name_off, name_len), self._string(desc_off, desc_len))
+            for subject_id, name_off, name_len, desc_off, desc_len in (
+                SUBJECT.unpack_from(self._buf, self._subjects + SUBJECT.size * i) for i in range(self.num_subjects)
+            )
+        ]
+
+    @_damaged
+    def lectures(self):
+        """``(id, subject id, title, description)`` of every lecture."""
+        subject_ids = [SUBJECT.unpack_from(self._buf, self._subjects + SUBJECT.size * i)[0] for i in range(self.num_subjects)]
+        return [
+            (lecture_id, subject_ids[subject] if subject >= 0 else None,
+             self._string(title_off, title_len), self._string(desc_off, desc_len))
+            for lecture_id, subject, title_off, title_len, desc_off, desc_len in (
+                LECTURE.unpack_from(self._buf, self._lectures + LECTURE.size * i) for i in range(self.num_lectures)
+            )
+        ]
+
+    def __iter__(self):
+        for position in range(self.num_questions):
+            yield self.question_at(position)
+
+    def items(self):
+        """The questions as import items (the JSON export format), for ``import_items``."""
+        lectures = {lecture_id: (title, subject_id) for lecture_id, subject_id, title, _ in self.lectures()}
+        subjects = {subject_id: name for subject_id, name, _ in self.subjects()}
+        for question in self:
+            title, subject_id = lectures[question.lecture_id]
+            option_ids = [option.id for option in question.options]
+            item = {
+                'lecture_title': title,
+                'question_text': question.text,
+                'options': [option.text for option in question.options],
+                'correct_index': option_ids.index(question.correct_option_id) if question.correct_option_id in option_ids else -1,
+                'nature': question.nature,
+                'page_number': question.page_number,
+            }
+            if subject_id is not None:
+                item['subject'] = subjects[subject_id]
+            yield item
+
+
+def warm_snapshot_cache(path, limit=None):
+    """Fill the question snapshot cache from a bank file, without queries.
+
+    The file must come from this database (e.g. exported at deploy time).
+    It is ignored if questions, options, lectures or slides changed after
+    it was exported, going by their page_cache generations. Questions
+    citing a slide are skipped, they are loaded with the slide on first
+    use. Returns the number of snapshots added.
+    """
+    if not page_cache.enabled():
+        logger.warning("Not warming the snapshot cache from %s: generations are not shared", path)
+        return 0
+    limit = snapshot_cache.maxsize if limit is None else limit
+    with BankReader(path) as reader:
+        generations = page_cache.generations(SNAPSHOT_DEPENDENCIES)
+        if reader.exported_at * 1_000_000 < max(generations):
+            logger.warning("Not warming the snapshot cache from %s: the questions changed after it was exported", path)
+            return 0
+        snapshots = []
+        for question in reader:
+            if len(snapshots) >= limit:
+                break
+            if question.page_number is not None:
+                continue
+            options = tuple(OptionSnapshot(option.id, option.text) for option in question.options)
+            snapshots.append(QuestionSnapshot(*question._replace(options=options), slide=None))
+    return snapshot_cache.warm(snapshots, generations)
@@ -0,0 +1,181 @@
+import contextvars
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+try:
+    import fcntl
+except ImportError:  # Windows: no locking between processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Read-only snapshot of the primary SQLite file for heavy read-only views.
+# refresh_replica() copies the primary with SQLite's online backup API into a
+# temporary file and renames it over the replica, so readers always see a
+# complete snapshot; connections opened afterwards pick up the new file.
+# The copy runs QUIZ_REPLICA_BACKUP_PAGES pages at a time, sleeping between
+# steps so writers on the primary are not locked out for the whole copy, and
+# a lock next to the replica lets a single process refresh it at a time.
+
+REPLICA_ALIAS = 'replica'
+
+# Alias chosen by replica_reads() for the current request, None outside it
+_read_alias = contextvars.ContextVar('quiz_replica_read_alias', default=None)
+
+
+def replica_path():
+    return getattr(settings, 'QUIZ_REPLICA_PATH', None) if REPLICA_ALIAS in settings.DATABASES else None
+
+
+def replica_age():
+    """Seconds since the replica was last refreshed, or None if there is none."""
+    path = replica_path()
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except (TypeError, OSError):
+        return None
+
+
+def read_alias():
+    """The replica if it is fresher than QUIZ_REPLICA_MAX_STALENESS, else the primary."""
+    replica_refresher.ensure_started()
+    age = replica_age()
+    if age is None or age > getattr(settings, 'QUIZ_REPLICA_MAX_STALENESS', 120):
+        return DEFAULT_DB_ALIAS
+    return REPLICA_ALIAS
+
+
+@contextmanager
+def replica_reads():
+    """Route the reads made inside the block to the replica, when it is fresh enough."""
+    token = _read_alias.set(read_alias())
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def read_from_replica(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with replica_reads():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def _refresh_lock(target):
+    # Yields whether this process holds the lock; never waits for it
+    with open(f"{target}.lock", 'a') as lock:
+        if fcntl is None:
+            yield True
+            return
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def refresh_replica(min_age=0):
+    """Copy the primary over the replica and return its path.
+
+    Returns None without copying when another process is refreshing it, or
+    when it was refreshed less than ``min_age`` seconds ago.
+    """
+    primary, target = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'], replica_path()
+    with _refresh_lock(target) as elected:
+        if not elected:
+            return None
+        # Checked under the lock: another process may have just finished
+        age = replica_age()
+        if min_age and age is not None and age < min_age:
+            return None
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(target)), suffix='.tmp')
+        os.close(fd)
+        try:
+            source, copy = sqlite3.connect(primary), sqlite3.connect(tmp)
+            try:
+                source.backup(
+                    copy,
+                    pages=getattr(settings, 'QUIZ_REPLICA_BACKUP_PAGES', 1024),
+                    sleep=getattr(settings, 'QUIZ_REPLICA_BACKUP_SLEEP', 0.005),
+                )
+            finally:
+                copy.close()
+                source.close()
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+    return target
+
+
+class ReplicaRouter:
+    """Send reads to the replica inside replica_reads(); everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, never migrated on its own
+        return False if db == REPLICA_ALIAS else None
+
+
+class ReplicaRefresher:
+    """Background thread refreshing the replica every ``interval`` seconds.
+
+    Each process may run one; a process only refreshes when the file is
+    older than the interval and no other process is refreshing it, so
+    several workers do not multiply the copies. An interval of 0 leaves
+    refreshing to ``manage.py refresh_replica``.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self.interval <= 0 or replica_path() is None:
+            return
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='quiz-replica-refresher', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            age = replica_age()
+            if age is None or age >= self.interval:
+                try:
+                    refresh_replica(min_age=self.interval)
+                except Exception:
+                    logger.exception("Replica refresh failed")
+                age = 0
+            time.sleep(max(self.interval - age, 1))
+
+
+replica_refresher = ReplicaRefresher(getattr(settings, 'QUIZ_REPLICA_REFRESH_INTERVAL', 60))
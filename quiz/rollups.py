@@ -0,0 +1,115 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import page_cache
+from .models import AnswerEvent, DailyAnswerStats, Question, RollupState, accuracy_for, difficulty_for
+
+ROLLUP_NAME = 'daily_answer_stats'
+COUNTER_FIELDS = ['times_answered', 'times_correct', 'times_wrong', 'accuracy', 'difficulty']
+
+
+def rollup_answer_events(batch_size=10000):
+    """Fold AnswerEvents newer than the high-water mark into DailyAnswerStats.
+
+    Returns the number of events processed.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            state, _ = RollupState.objects.get_or_create(name=ROLLUP_NAME)
+            ids = list(
+                AnswerEvent.objects.filter(id__gt=state.last_event_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                return processed
+            high_water = ids[-1]
+
+            rows = (
+                AnswerEvent.objects.filter(id__gt=state.last_event_id, id__lte=high_water)
+                .annotate(day=TruncDate('answered_at'))
+                .values('day', 'lecture_id', 'subject_id')
+                .annotate(answered=Count('id'), correct=Count('id', filter=Q(is_correct=True)))
+            )
+            deltas = defaultdict(lambda: [0, 0])
+            for row in rows:
+                keys = [(DailyAnswerStats.SCOPE_GLOBAL, 0)]
+                if row['lecture_id'] is not None:
+                    keys.append((DailyAnswerStats.SCOPE_LECTURE, row['lecture_id']))
+                if row['subject_id'] is not None:
+                    keys.append((DailyAnswerStats.SCOPE_SUBJECT, row['subject_id']))
+                for scope, scope_id in keys:
+                    delta = deltas[(scope, scope_id, row['day'])]
+                    delta[0] += row['answered']
+                    delta[1] += row['correct']
+
+            _apply_deltas(deltas)
+            state.last_event_id = high_water
+            state.save(update_fields=['last_event_id'])
+            page_cache.bump(page_cache.ANSWERS)
+            processed += len(ids)
+
+
+def _apply_deltas(deltas):
+    days = {day for _, _, day in deltas}
+    existing = {
+        (row.scope, row.scope_id, row.day): row
+        for row in DailyAnswerStats.objects.filter(day__in=days)
+    }
+    to_update, to_create = [], []
+    for key, (answered, correct) in deltas.items():
+        row = existing.get(key)
+        if row is None:
+            scope, scope_id, day = key
+            row = DailyAnswerStats(scope=scope, scope_id=scope_id, day=day)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        row.answered += answered
+        row.correct += correct
+        row.wrong += answered - correct
+    DailyAnswerStats.objects.bulk_update(to_update, ['answered', 'correct', 'wrong'], batch_size=500)
+    DailyAnswerStats.objects.bulk_create(to_create, batch_size=500)
+
+
+def daily_trend(scope, scope_id=0, days=30):
+    since = timezone.localdate() - timedelta(days=days - 1)
+    rows = DailyAnswerStats.objects.filter(scope=scope, scope_id=scope_id, day__gte=since).order_by('day')
+    trend = []
+    for row in rows:
+        accuracy = (row.correct / row.answered) * 100 if row.answered else 0
+        trend.append({'day': row.day, 'answered': row.answered, 'accuracy': round(accuracy, 1)})
+    return trend
+
+
+def rebuild_question_counters(batch_size=1000):
+    """Recompute the answer counters on every Question from the event log."""
+    totals = {
+        row['question_id']: row
+        for row in AnswerEvent.objects.values('question_id').annotate(
+            answered=Count('id'), correct=Count('id', filter=Q(is_correct=True))
+        )
+    }
+    updated = 0
+    with transaction.atomic():
+        batch = []
+        for question in Question.objects.only('id').iterator(chunk_size=batch_size):
+            row = totals.get(question.id)
+            question.times_answered = row['answered'] if row else 0
+            question.times_correct = row['correct'] if row else 0
+            question.times_wrong = question.times_answered - question.times_correct
+            question.accuracy = accuracy_for(question.times_answered, question.times_correct)
+            question.difficulty = difficulty_for(question.times_answered, question.times_wrong)
+            batch.append(question)
+            if len(batch) >= batch_size:
+                Question.objects.bulk_update(batch, COUNTER_FIELDS)
+                updated += len(batch)
+                batch = []
+        Question.objects.bulk_update(batch, COUNTER_FIELDS)
+        updated += len(batch)
+    return updated
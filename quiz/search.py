@@ -0,0 +1,87 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+
+from .models import Lecture
+
+SEARCH_PAGE_SIZE = 20
+SEARCH_MAX_PAGE = 50
+PREFIX_MIN_LENGTH = 3  # matches the prefix='3' index of quiz_search
+
+# highlight()/snippet() markers, swapped for <mark> after HTML-escaping the text
+_OPEN, _CLOSE = '\x02', '\x03'
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+# bm25() weights for the columns of quiz_search: matches in the question or
+# page text rank above matches in the options
+_RANK = "bm25(quiz_search, 0, 0, 0, 0, 5.0, 1.0)"
+
+
+def match_expression(query):
+    """Turn free text into an FTS5 query: every word must match, the last one as a prefix.
+
+    Prefixes shorter than PREFIX_MIN_LENGTH would expand to too many terms,
+    so a short last word has to match exactly.
+    """
+    terms = _TERM_RE.findall(query)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if len(terms[-1]) >= PREFIX_MIN_LENGTH:
+        quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _marked(text):
+    return escape(text or '').replace(_OPEN, '<mark>').replace(_CLOSE, '</mark>')
+
+
+def search(query, page=1, per_page=SEARCH_PAGE_SIZE, kind=None, lecture_id=None):
+    """Ranked full-text search over questions, their options and lecture pages.
+
+    Returns ``(results, has_next)``. Pages are fetched with LIMIT/OFFSET on
+    the rank order, plus one extra row to tell whether a next page exists,
+    so no COUNT over the matches is needed.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return [], False
+    page = min(max(page, 1), SEARCH_MAX_PAGE)
+
+    sql = [
+        "SELECT kind, ref_id, lecture_id, page_number,"
+        " highlight(quiz_search, 4, %s, %s), snippet(quiz_search, 4, %s, %s, '…', 32),"
+        " highlight(quiz_search, 5, %s, %s)"
+        " FROM quiz_search WHERE quiz_search MATCH %s"
+    ]
+    params = [_OPEN, _CLOSE, _OPEN, _CLOSE, _OPEN, _CLOSE, expression]
+    if kind:
+        sql.append(" AND kind = %s")
+        params.append(kind)
+    if lecture_id:
+        sql.append(" AND lecture_id = %s")
+        params.append(lecture_id)
+    sql.append(f" ORDER BY {_RANK} LIMIT %s OFFSET %s")
+    params += [per_page + 1, (page - 1) * per_page]
+
+    with connection.cursor() as cursor:
+        cursor.execute(''.join(sql), params)
+        rows = cursor.fetchall()
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+
+    titles = dict(Lecture.objects.filter(pk__in={row[2] for row in rows}).values_list('id', 'title'))
+    results = []
+    for kind, ref_id, row_lecture_id, page_number, body, snippet, options in rows:
+        results.append({
+            'kind': kind,
+            'id': ref_id,
+            'lecture_id': row_lecture_id,
+            'lecture_title': titles.get(row_lecture_id, ''),
+            'page_number': page_number,
+            # Questions are short enough to show whole; pages only around the match
+            'highlight': _marked(body if kind == 'question' else snippet),
+            'options': _marked(options) if kind == 'question' else '',
+        })
+    return results, has_next
@@ -0,0 +1,83 @@
+import json
+import logging
+
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+logger = logging.getLogger('django.contrib.sessions')
+
+# Session keys rewritten on every answer and next/prev click during a run
+HOT_KEYS = frozenset({'quiz_run', 'quiz_stats', 'quiz_mode'})
+
+
+def _durable_part(data):
+    return json.dumps({k: v for k, v in data.items() if k not in HOT_KEYS}, sort_keys=True, default=str)
+
+
+def persist_session(session):
+    """Make this request write the whole session to the database.
+
+    Called when a quiz starts and when it finishes. With other session
+    engines it only forces a normal save.
+    """
+    session.write_through = True
+    session.modified = True
+
+
+class SessionStore(CachedDBStore):
+    """cached_db sessions that keep in-run quiz state in the cache only.
+
+    A save that changes nothing but HOT_KEYS goes to the cache alone, so
+    answering and moving through a quiz does not write django_session.
+    Everything else (new sessions, logins, CSRF rotation...) and saves
+    flagged with persist_session() are written through to the database as
+    usual. If the cache entry is lost, the session falls back to its last
+    database copy, i.e. the run as it was when it started.
+    """
+
+    cache_key_prefix = 'quiz.session_store'
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self.write_through = False
+        self._durable = None
+
+    def load(self):
+        data = super().load()
+        self._durable = _durable_part(data)
+        return data
+
+    async def aload(self):
+        data = await super().aload()
+        self._durable = _durable_part(data)
+        return data
+
+    def _needs_db(self, must_create):
+        return (
+            must_create or self.write_through or self.session_key is None
+            or self._durable is None or _durable_part(self._session) != self._durable
+        )
+
+    def save(self, must_create=False):
+        if self._needs_db(must_create):
+            super().save(must_create)
+            self._durable = _durable_part(self._session)
+            self.write_through = False
+            return
+        try:
+            self._cache.set(self.cache_key, self._session, self.get_expiry_age())
+        except Exception:
+            # Without the cache the only safe copy is the database one
+            logger.exception("Error saving to cache (%s)", self._cache)
+            super().save()
+
+    async def asave(self, must_create=False):
+        if self._needs_db(must_create):
+            await super().asave(must_create)
+            self._durable = _durable_part(self._session)
+            self.write_through = False
+            return
+        try:
+            await self._cache.aset(await self.acache_key(), self._session, await self.aget_expiry_age())
+        except Exception:
+            logger.exception("Error saving to cache (%s)", self._cache)
+            await super().asave()
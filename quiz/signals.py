@@ -0,0 +1,125 @@
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, page_cache
+from .middleware import install_query_recorder
+from .models import AggregateStats, AnswerOption, Lecture, LecturePage, Question, Subject
+from .snapshots import snapshot_cache
+from .weighted import weak_spot_sampler
+
+
+@receiver([post_save, post_delete], sender=Question)
+def invalidate_question_snapshot(sender, instance, **kwargs):
+    snapshot_cache.invalidate(instance.pk)
+    if kwargs.get('created', True):
+        # Created or deleted: the weak-spot alias tables no longer match the bank
+        weak_spot_sampler.mark_questions_changed()
+
+
+@receiver([post_save, post_delete], sender=AnswerOption)
+def invalidate_option_snapshot(sender, instance, **kwargs):
+    snapshot_cache.invalidate(instance.question_id)
+
+
+@receiver(post_save, sender=Lecture)
+def invalidate_lecture_snapshots(sender, instance, **kwargs):
+    # Snapshots carry the lecture's subject, which may have changed
+    snapshot_cache.invalidate_lecture(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=LecturePage)
+def invalidate_page_snapshots(sender, instance, **kwargs):
+    # Snapshots carry the snippet of the slide their question cites
+    snapshot_cache.invalidate_lecture(instance.lecture_id)
+
+
+# --- Page cache generations (quiz/page_cache.py) ---
+
+@receiver([post_save, post_delete], sender=Subject)
+def bump_subject_generation(sender, **kwargs):
+    page_cache.bump(page_cache.SUBJECTS)
+
+
+@receiver([post_save, post_delete], sender=Lecture)
+def bump_lecture_generation(sender, **kwargs):
+    page_cache.bump(page_cache.LECTURES)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def bump_question_generation(sender, **kwargs):
+    page_cache.bump(page_cache.QUESTIONS)
+
+
+@receiver([post_save, post_delete], sender=AnswerOption)
+def bump_option_generation(sender, **kwargs):
+    page_cache.bump(page_cache.OPTIONS)
+
+
+@receiver([post_save, post_delete], sender=LecturePage)
+def bump_page_generation(sender, **kwargs):
+    page_cache.bump(page_cache.PAGES)
+
+
+# --- Materialized aggregates (quiz/aggregates.py) ---
+
+@receiver(pre_save, sender=Question)
+def remember_question_lecture(sender, instance, **kwargs):
+    instance._previous_lecture_id = None
+    if instance.pk:
+        instance._previous_lecture_id = (
+            Question.objects.filter(pk=instance.pk).values_list('lecture_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Question)
+def update_aggregates_on_question_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_lecture_id', None)
+    if created or previous is None:
+        aggregates.add_question(instance.lecture_id, aggregates.subject_of(instance.lecture_id), instance)
+    elif previous != instance.lecture_id:
+        aggregates.remove_question(previous, aggregates.subject_of(previous), instance)
+        aggregates.add_question(instance.lecture_id, aggregates.subject_of(instance.lecture_id), instance)
+        weak_spot_sampler.mark_questions_changed()
+
+
+@receiver(post_delete, sender=Question)
+def update_aggregates_on_question_delete(sender, instance, **kwargs):
+    aggregates.remove_question(instance.lecture_id, aggregates.subject_of(instance.lecture_id), instance)
+
+
+@receiver(pre_save, sender=Lecture)
+def remember_lecture_subject(sender, instance, **kwargs):
+    instance._previous_subject_id = None
+    if instance.pk:
+        instance._previous_subject_id = (
+            Lecture.objects.filter(pk=instance.pk).values_list('subject_id', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Lecture)
+def update_aggregates_on_lecture_save(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_subject_id', None)
+    if not created and previous != instance.subject_id:
+        totals = aggregates.lecture_totals(instance.pk)
+        source = [(AggregateStats.SCOPE_SUBJECT, previous)] if previous is not None else []
+        target = [(AggregateStats.SCOPE_SUBJECT, instance.subject_id)] if instance.subject_id is not None else []
+        aggregates.move_totals(source, target, totals)
+        weak_spot_sampler.mark_questions_changed()
+
+
+@receiver(post_delete, sender=Lecture)
+def drop_lecture_aggregates(sender, instance, **kwargs):
+    AggregateStats.objects.filter(scope=AggregateStats.SCOPE_LECTURE, scope_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=Subject)
+def drop_subject_aggregates(sender, instance, **kwargs):
+    AggregateStats.objects.filter(scope=AggregateStats.SCOPE_SUBJECT, scope_id=instance.pk).delete()
+
+
+# --- Query budgets (quiz/middleware.py) ---
+
+@receiver(connection_created)
+def record_connection_queries(sender, connection, **kwargs):
+    install_query_recorder(connection)
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+
+from . import metrics, page_cache
+from .models import LecturePage, Question, slide_snippet
+
+# Immutable views of a question and its options, used by the quiz hot path
+# so serving and grading a question does not need to hit the database.
+OptionSnapshot = namedtuple('OptionSnapshot', ['id', 'text'])
+QuestionSnapshot = namedtuple('QuestionSnapshot', [
+    'id', 'lecture_id', 'subject_id', 'text', 'nature', 'page_number', 'options', 'correct_option_id',
+    'times_answered', 'times_correct', 'times_wrong', 'slide',
+])
+
+# Snapshots are built from these kinds of content; their page_cache
+# generations are shared by every process (unlike the save/delete signals),
+# so a change made by another worker empties this process's cache as well.
+SNAPSHOT_DEPENDENCIES = (page_cache.QUESTIONS, page_cache.OPTIONS, page_cache.LECTURES, page_cache.PAGES)
+
+
+def build_snapshot(question, options, slide=None):
+    options = sorted(options, key=lambda opt: opt.id)
+    correct_option_id = next((opt.id for opt in options if opt.is_correct), None)
+    return QuestionSnapshot(
+        id=question.id,
+        lecture_id=question.lecture_id,
+        subject_id=question.lecture.subject_id,
+        text=question.text,
+        nature=question.nature,
+        page_number=question.page_number,
+        options=tuple(OptionSnapshot(opt.id, opt.text) for opt in options),
+        correct_option_id=correct_option_id,
+        times_answered=question.times_answered,
+        times_correct=question.times_correct,
+        times_wrong=question.times_wrong,
+        slide=slide,
+    )
+
+
+def slide_rows(questions):
+    """Query for the pages cited by ``questions``, by the (lecture, page_number) unique index."""
+    cited = {(q.lecture_id, q.page_number) for q in questions if q.page_number is not None}
+    if not cited:
+        return None
+    return LecturePage.objects.filter(
+        lecture_id__in={lecture_id for lecture_id, _ in cited},
+        page_number__in={page_number for _, page_number in cited},
+    ).values_list('lecture_id', 'page_number', 'text')
+
+
+def _slides(rows):
+    return {(lecture_id, page_number): slide_snippet(text) for lecture_id, page_number, text in rows}
+
+
+class SnapshotCache:
+    """Bounded, thread-safe LRU cache of ``QuestionSnapshot`` objects.
+
+    Signals invalidate single entries in the process that made a change.
+    Every ``check_interval`` seconds a lookup also compares the shared
+    content generations with those the entries were loaded under, and
+    drops everything when they moved. Without shared generations (see
+    page_cache.enabled) the entries are dropped at every check instead.
+    """
+
+    def __init__(self, maxsize, check_interval=2.0):
+        self.maxsize = maxsize
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._generations = None
+        self._checked_at = float('-inf')
+
+    def _check_generations(self):
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return
+        self._checked_at = now
+        shared = page_cache.enabled()
+        current = page_cache.generations(SNAPSHOT_DEPENDENCIES)
+        with self._lock:
+            if current != self._generations or not shared:
+                self._data.clear()
+                self._generations = current
+
+    def warm(self, snapshots, generations):
+        """Add snapshots loaded under ``generations`` (from page_cache.generations)."""
+        with self._lock:
+            if self._generations is not None and self._generations != generations:
+                return 0
+            self._generations = generations
+            self._checked_at = time.monotonic()
+        added = 0
+        for snapshot in snapshots:
+            self.put(snapshot)
+            added += 1
+        return added
+
+    def get(self, question_id):
+        return self.get_many([question_id]).get(question_id)
+
+    def get_many(self, question_ids):
+        """Return ``{question_id: snapshot}``, loading all misses with one query."""
+        found, missing, generations = self._lookup(question_ids)
+        if missing:
+            questions = list(Question.objects.filter(pk__in=missing).select_related('lecture').prefetch_related('options'))
+            rows = slide_rows(questions)
+            slides = _slides(rows) if rows is not None else {}
+            for question in questions:
+                slide = slides.get((question.lecture_id, question.page_number))
+                snapshot = build_snapshot(question, question.options.all(), slide)
+                self.put(snapshot, generations)
+                found[question.id] = snapshot
+        return found
+
+    def _lookup(self, question_ids):
+        self._check_generations()
+        found, missing = {}, []
+        with self._lock:
+            generations = self._generations
+            for question_id in question_ids:
+                snapshot = self._data.get(question_id)
+                if snapshot is not None:
+                    self._data.move_to_end(question_id)
+                    self.hits += 1
+                    found[question_id] = snapshot
+                else:
+                    self.misses += 1
+                    missing.append(question_id)
+        return found, missing, generations
+
+    async def aget(self, question_id):
+        return (await self.aget_many([question_id])).get(question_id)
+
+    async def aget_many(self, question_ids):
+        found, missing, generations = self._lookup(question_ids)
+        if missing:
+            queryset = Question.objects.filter(pk__in=missing).select_related('lecture').prefetch_related('options')
+            questions = [question async for question in queryset]
+            rows = slide_rows(questions)
+            slides = _slides([row async for row in rows]) if rows is not None else {}
+            for question in questions:
+                slide = slides.get((question.lecture_id, question.page_number))
+                snapshot = build_snapshot(question, question.options.all(), slide)
+                self.put(snapshot, generations)
+                found[question.id] = snapshot
+        return found
+
+    def put(self, snapshot, generations=None):
+        with self._lock:
+            if generations is not None and generations != self._generations:
+                return  # loaded before a content change this process has since seen
+            self._data[snapshot.id] = snapshot
+            self._data.move_to_end(snapshot.id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def record_answer(self, question_id, is_correct):
+        # Counters are updated with QuerySet.update(), which sends no signals,
+        # so keep the cached copy roughly in line instead of dropping it.
+        with self._lock:
+            snapshot = self._data.get(question_id)
+            if snapshot is None:
+                return
+            self._data[question_id] = snapshot._replace(
+                times_answered=snapshot.times_answered + 1,
+                times_correct=snapshot.times_correct + (1 if is_correct else 0),
+                times_wrong=snapshot.times_wrong + (0 if is_correct else 1),
+            )
+
+    def invalidate(self, question_id):
+        with self._lock:
+            self._data.pop(question_id, None)
+
+    def invalidate_lecture(self, lecture_id):
+        with self._lock:
+            stale = [qid for qid, snapshot in self._data.items() if snapshot.lecture_id == lecture_id]
+            for question_id in stale:
+                del self._data[question_id]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._generations = None
+            self._checked_at = float('-inf')
+            self.hits = 0
+            self.misses = 0
+
+    def info(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+            }
+
+
+snapshot_cache = SnapshotCache(
+    getattr(settings, 'QUIZ_SNAPSHOT_CACHE_SIZE', 2048),
+    getattr(settings, 'QUIZ_SNAPSHOT_CHECK_INTERVAL', 2.0),
+)
+metrics.CallbackMetric(
+    metrics.registry, 'quiz_snapshot_cache_lookups_total', "Question snapshot cache lookups, by result.", 'counter',
+    lambda: {('hit',): snapshot_cache.hits, ('miss',): snapshot_cache.misses}, ['result'],
+)
@@ -0,0 +1,179 @@
+import atexit
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+
+from . import aggregates, metrics, page_cache
+from .models import AnswerEvent, Question, accuracy_expression, difficulty_expression
+from .rollups import rollup_answer_events
+from .weighted import weak_spot_sampler
+
+logger = logging.getLogger(__name__)
+
+
+class StatsBuffer:
+    """Write-behind buffer for the answer counters on ``Question``.
+
+    Answers are accumulated per question in memory and written by a
+    background thread as one transaction, either when ``flush_size``
+    answers are pending or every ``flush_interval`` seconds. The same
+    transaction bulk-inserts the matching ``AnswerEvent`` rows and the
+    worker then folds them into the daily rollups. With ``write_behind``
+    disabled every answer is written and rolled up immediately.
+    """
+
+    def __init__(self, write_behind=True, flush_size=100, flush_interval=5.0):
+        self.write_behind = write_behind
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._pending_count = 0
+        self._events = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+    def record(self, question_id, is_correct, lecture_id=None, subject_id=None):
+        self.record_many([(question_id, is_correct, lecture_id, subject_id)])
+
+    def record_many(self, answers):
+        """Record ``(question_id, is_correct, lecture_id, subject_id)`` tuples.
+
+        In synchronous mode the whole batch is written in one transaction.
+        """
+        events = [
+            AnswerEvent(question_id=question_id, lecture_id=lecture_id, subject_id=subject_id, is_correct=is_correct)
+            for question_id, is_correct, lecture_id, subject_id in answers
+        ]
+        if not events:
+            return
+        correct = sum(1 for event in events if event.is_correct)
+        if correct:
+            metrics.ANSWERS.inc(correct, result='correct')
+        if correct < len(events):
+            metrics.ANSWERS.inc(len(events) - correct, result='wrong')
+        if not self.write_behind:
+            batch = {}
+            self._add_counts(batch, events)
+            self._write(batch, events)
+            weak_spot_sampler.mark_stats_changed(batch)
+            # There is no worker to fold the events into the daily trends
+            self._rollup()
+            return
+
+        with self._lock:
+            self._events.extend(events)
+            self._add_counts(self._pending, events)
+            self._pending_count += len(events)
+            full = self._pending_count >= self.flush_size
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+
+    async def arecord_many(self, answers):
+        # Buffered answers never touch the database on the request path
+        if self.write_behind:
+            self.record_many(answers)
+        else:
+            await sync_to_async(self.record_many)(answers)
+
+    @staticmethod
+    def _add_counts(batch, events):
+        for event in events:
+            counts = batch.setdefault(event.question_id, [0, 0, 0])
+            counts[0] += 1
+            counts[1 if event.is_correct else 2] += 1
+
+    def pending(self):
+        with self._lock:
+            return {qid: tuple(counts) for qid, counts in self._pending.items()}
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, {}
+                events, self._events = self._events, []
+                self._pending_count = 0
+            if not batch:
+                return 0
+            try:
+                self._write(batch, events)
+            except Exception:
+                logger.exception("Flushing %d buffered question stats failed, retrying later", len(batch))
+                self._merge_back(batch, events)
+                return 0
+            weak_spot_sampler.mark_stats_changed(batch)
+            return len(batch)
+
+    def _write(self, batch, events):
+        scopes = {event.question_id: (event.lecture_id, event.subject_id) for event in events}
+        with transaction.atomic():
+            AnswerEvent.objects.bulk_create(events, batch_size=500)
+            applied = {}
+            for question_id, (answered, correct, wrong) in batch.items():
+                # SET expressions see the old row, so derive accuracy/difficulty from old + delta
+                updated = Question.objects.filter(pk=question_id).update(
+                    times_answered=F('times_answered') + answered,
+                    times_correct=F('times_correct') + correct,
+                    times_wrong=F('times_wrong') + wrong,
+                    accuracy=accuracy_expression(F('times_answered') + answered, F('times_correct') + correct),
+                    difficulty=difficulty_expression(F('times_answered') + answered, F('times_wrong') + wrong),
+                )
+                # Questions deleted since the answer no longer count in the totals
+                if updated:
+                    applied[question_id] = (answered, correct, wrong)
+            aggregates.record_answers(applied, scopes)
+            page_cache.bump(page_cache.ANSWERS)
+
+    def _merge_back(self, batch, events):
+        with self._lock:
+            self._events[:0] = events
+            for question_id, counts in batch.items():
+                pending = self._pending.setdefault(question_id, [0, 0, 0])
+                for i, value in enumerate(counts):
+                    pending[i] += value
+                self._pending_count += counts[0]
+
+    @staticmethod
+    def _rollup():
+        try:
+            rollup_answer_events()
+        except Exception:
+            logger.exception("Rolling up answer events failed")
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is not None and self._worker.is_alive():
+                return
+            self._worker = threading.Thread(target=self._run, name='quiz-stats-buffer', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            close_old_connections()
+            if self.flush():
+                self._rollup()
+            # The worker thread owns its own connection; don't keep it open
+            # between flushes so SQLite can be checkpointed/replaced freely.
+            connection.close()
+
+
+stats_buffer = StatsBuffer(
+    write_behind=getattr(settings, 'QUIZ_STATS_WRITE_BEHIND', True),
+    flush_size=getattr(settings, 'QUIZ_STATS_FLUSH_SIZE', 100),
+    flush_interval=getattr(settings, 'QUIZ_STATS_FLUSH_INTERVAL', 5.0),
+)
+atexit.register(stats_buffer.flush)
+metrics.CallbackMetric(
+    metrics.registry, 'quiz_stats_buffer_pending', "Answers buffered but not yet written.", 'gauge',
+    lambda: {(): stats_buffer._pending_count},
+)
@@ -0,0 +1,40 @@
+import time
+
+from django.template.backends.django import DjangoTemplates
+
+
+class TimedTemplate:
+    """Adds the rendering time to ``request.template_time`` for the Server-Timing header.
+
+    Queries run while rendering (lazy querysets evaluated in the template)
+    are left out, they are already counted as db time.
+    """
+
+    def __init__(self, template):
+        self.template = template
+
+    @property
+    def origin(self):
+        return self.template.origin
+
+    def render(self, context=None, request=None):
+        if request is None:
+            return self.template.render(context, request)
+        stats = getattr(request, 'query_stats', None)
+        db_before = stats.duration if stats else 0.0
+        start = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            elapsed = time.perf_counter() - start
+            if stats:
+                elapsed -= stats.duration - db_before
+            request.template_time = getattr(request, 'template_time', 0.0) + elapsed
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
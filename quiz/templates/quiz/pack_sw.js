@@ -0,0 +1,55 @@
+// Service worker for the offline subject packs (served at /packs/sw.js, so
+// it controls the pages under /packs/). Versioned pack files never change
+// and are served from the cache first; everything else (the quiz page, the
+// pack manifests, styles and scripts) goes to the network first and falls
+// back to the last cached copy when offline.
+
+const CACHE = 'quiz-packs-v1';
+const VERSIONED_PACK = /\/packs\/subject\/(\d+)\/v\/[\w-]+\.json$/;
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil((async () => {
+        for (const name of await caches.keys()) {
+            if (name !== CACHE) await caches.delete(name);
+        }
+        await self.clients.claim();
+    })());
+});
+
+async function cacheFirst(request, subjectId) {
+    const cache = await caches.open(CACHE);
+    const cached = await cache.match(request);
+    if (cached) return cached;
+    const response = await fetch(request);
+    if (response.ok) {
+        // Keep only the latest pack of each subject
+        for (const old of await cache.keys()) {
+            const match = new URL(old.url).pathname.match(VERSIONED_PACK);
+            if (match && match[1] === subjectId) await cache.delete(old);
+        }
+        await cache.put(request, response.clone());
+    }
+    return response;
+}
+
+async function networkFirst(request) {
+    const cache = await caches.open(CACHE);
+    try {
+        const response = await fetch(request);
+        if (response.ok || response.type === 'opaque') await cache.put(request, response.clone());
+        return response;
+    } catch (error) {
+        const cached = await cache.match(request);
+        if (cached) return cached;
+        throw error;
+    }
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+    const match = new URL(request.url).pathname.match(VERSIONED_PACK);
+    event.respondWith(match ? cacheFirst(request, match[1]) : networkFirst(request));
+});
@@ -0,0 +1,36 @@
+from django.conf import settings
+
+from .middleware import budget_for
+
+# Helpers for tests that keep views inside their query budgets, e.g.:
+#
+#     class StatsTests(QueryBudgetMixin, TestCase):
+#         def test_stats_budget(self):
+#             self.assertWithinQueryBudget(self.client.get(reverse('stats_global')))
+
+
+def assert_query_budget(response, budget=None, allow_repeats=False):
+    stats = getattr(response, 'query_stats', None)
+    if stats is None:
+        raise AssertionError("quiz.middleware.QueryBudgetMiddleware is not installed")
+
+    view_name = response.resolver_match.url_name if response.resolver_match else None
+    if budget is None:
+        budget = budget_for(view_name)
+    if budget is None:
+        raise AssertionError(f"No query budget configured for {view_name!r}")
+
+    repeated = stats.repeated(getattr(settings, 'QUIZ_NPLUSONE_THRESHOLD', 5))
+    details = "".join(f"\n  {n} x {shape}" for shape, n in repeated)
+    if stats.count > budget:
+        raise AssertionError(f"{view_name} ran {stats.count} queries, budget is {budget}{details}")
+    if repeated and not allow_repeats:
+        raise AssertionError(f"{view_name} repeats queries (likely N+1):{details}")
+
+
+class QueryBudgetMixin:
+    def assertWithinQueryBudget(self, response, budget=None, allow_repeats=False):
+        try:
+            assert_query_budget(response, budget, allow_repeats)
+        except AssertionError as e:
+            self.fail(str(e))
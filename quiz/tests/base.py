@@ -0,0 +1,58 @@
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from quiz.cursor import scope_ids
+from quiz.models import AnswerOption, Lecture, Question, Subject
+from quiz.snapshots import snapshot_cache
+from quiz.stats_buffer import stats_buffer
+from quiz.weighted import weak_spot_sampler
+
+# Every cache in this process, and no replica: reads go to the test database
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'quiz-tests'},
+    'generations': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'quiz-tests-generations'},
+    'sessions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'quiz-tests-sessions'},
+}
+
+
+@override_settings(
+    CACHES=TEST_CACHES,
+    QUIZ_GENERATIONS_PER_PROCESS=True,
+    QUIZ_REPLICA_PATH=None,
+    QUIZ_PROFILING=False,
+)
+class QuizTestCase(TestCase):
+    def setUp(self):
+        super().setUp()
+        for cache in caches.all():
+            cache.clear()
+        snapshot_cache.clear()
+        scope_ids.clear()
+        weak_spot_sampler.mark_questions_changed()
+        # Answers are written on the request path, inside the test transaction
+        patcher = mock.patch.object(stats_buffer, 'write_behind', False)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+def make_question(lecture, text, options=('A', 'B', 'C', 'D'), correct=0, **fields):
+    question = Question.objects.create(lecture=lecture, text=text, **fields)
+    AnswerOption.objects.bulk_create([
+        AnswerOption(question=question, text=option, is_correct=(i == correct)) for i, option in enumerate(options)
+    ])
+    question.refresh_content_hash()
+    return question
+
+
+def make_bank(subjects=2, lectures=2, questions=3):
+    """``subjects`` x ``lectures`` x ``questions``, options 'A'..'D' with the first one correct."""
+    created = []
+    for s in range(subjects):
+        subject = Subject.objects.create(name=f"Materia {s}")
+        for l in range(lectures):
+            lecture = Lecture.objects.create(subject=subject, title=f"Lezione {s}.{l}")
+            for q in range(questions):
+                created.append(make_question(lecture, f"Domanda {s}.{l}.{q}?", page_number=q + 1))
+    return created
@@ -0,0 +1,34 @@
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.urls import reverse
+
+from quiz.models import AnswerOption, Lecture, Question
+from quiz.tests.base import QuizTestCase, make_question
+
+
+class AdminTests(QuizTestCase):
+    def test_duplicate_question_is_a_form_error(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        lecture = Lecture.objects.create(title="Lezione")
+        make_question(lecture, "Uguale?", options=('A', 'B', 'C', 'D'))
+        other = make_question(lecture, "Diversa?", options=('A', 'B', 'C', 'D'))
+        options = list(other.options.order_by('id'))
+        data = {
+            'lecture': lecture.id, 'text': "uguale?", 'nature': 'Teorica', 'page_number': '',
+            'times_answered': 0, 'times_correct': 0, 'times_wrong': 0, 'difficulty': 0.5, 'accuracy': '',
+            'options-TOTAL_FORMS': 4, 'options-INITIAL_FORMS': 4, 'options-MIN_NUM_FORMS': 4, 'options-MAX_NUM_FORMS': 4,
+        }
+        for i, option in enumerate(options):
+            data.update({
+                f'options-{i}-id': option.id, f'options-{i}-question': other.id,
+                f'options-{i}-text': option.text, f'options-{i}-is_correct': 'on' if option.is_correct else '',
+            })
+        response = self.client.post(reverse('admin:quiz_question_change', args=[other.id]), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "esiste già nella lezione")
+        self.assertEqual(Question.objects.get(pk=other.id).text, "Diversa?")
+
+    def test_options_are_only_edited_inline(self):
+        self.assertFalse(admin.site.is_registered(AnswerOption))
+        self.assertTrue(admin.site.is_registered(Question))
@@ -0,0 +1,99 @@
+from asgiref.sync import async_to_sync
+from django.urls import reverse
+
+from quiz.cursor import (
+    RunChanged, anew_cursor, aquestion_id_at, new_cursor, permute, question_id_at, question_ids_at, shuffle_options,
+)
+from quiz.models import Question
+from quiz.tests.base import QuizTestCase, make_bank, make_question
+
+
+class PermuteTests(QuizTestCase):
+    def test_permute_is_a_bijection(self):
+        sizes = list(range(0, 130)) + [255, 256, 257, 1000, 1023, 1025, 4097]
+        for seed in (0, 1, 2 ** 32 - 1):
+            for n in sizes:
+                with self.subTest(seed=seed, n=n):
+                    self.assertEqual(sorted(permute(seed, n, i) for i in range(n)), list(range(n)))
+
+    def test_permute_depends_on_the_seed(self):
+        n = 50
+        orders = {tuple(permute(seed, n, i) for i in range(n)) for seed in range(10)}
+        self.assertGreater(len(orders), 1)
+        self.assertEqual([permute(7, n, i) for i in range(n)], [permute(7, n, i) for i in range(n)])
+
+
+class CursorTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=2, lectures=2, questions=5)
+
+    def test_a_run_visits_every_question_of_its_scope_once(self):
+        lecture_id = self.questions[0].lecture_id
+        cursor = new_cursor('lecture', lecture_id)
+        self.assertEqual(cursor['total'], 5)
+        ids = [question_id_at(cursor, i) for i in range(cursor['total'])]
+        self.assertCountEqual(ids, Question.objects.filter(lecture_id=lecture_id).values_list('id', flat=True))
+        self.assertIsNone(question_id_at(cursor, cursor['total']))
+        self.assertIsNone(question_id_at(cursor, -1))
+
+    def test_question_ids_at_matches_question_id_at(self):
+        cursor = new_cursor('all')
+        indexes = [0, 3, 7, 19, 20, -1]
+        expected = {i: question_id_at(cursor, i) for i in range(cursor['total']) if i in indexes}
+        self.assertEqual(question_ids_at(cursor, indexes), expected)
+
+    def test_positions_are_resolved_without_queries_once_cached(self):
+        cursor = new_cursor('subject', self.questions[0].lecture.subject_id)
+        with self.assertNumQueries(0):
+            ids = [question_id_at(cursor, i) for i in range(cursor['total'])]
+            self.assertEqual(question_ids_at(cursor, range(cursor['total'])), dict(enumerate(ids)))
+
+    def test_async_cursor_matches_the_sync_one(self):
+        cursor = async_to_sync(anew_cursor)('lecture', self.questions[0].lecture_id)
+        self.assertEqual(cursor['fingerprint'], new_cursor('lecture', self.questions[0].lecture_id)['fingerprint'])
+        ids = [async_to_sync(aquestion_id_at)(cursor, i) for i in range(cursor['total'])]
+        self.assertEqual(ids, [question_id_at(cursor, i) for i in range(cursor['total'])])
+
+    def test_a_changed_scope_ends_the_run(self):
+        lecture = self.questions[0].lecture
+        cursor = new_cursor('lecture', lecture.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_question(lecture, "Domanda aggiunta?")
+        with self.assertRaises(RunChanged):
+            question_id_at(cursor, 0)
+        with self.assertRaises(RunChanged):
+            question_ids_at(cursor, [0, 1])
+        # Same count, different questions
+        cursor = new_cursor('lecture', lecture.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            Question.objects.filter(lecture=lecture).order_by('id').first().delete()
+            make_question(lecture, "Altra domanda?")
+        with self.assertRaises(RunChanged):
+            question_id_at(cursor, 0)
+
+    def test_other_scopes_do_not_end_the_run(self):
+        cursor = new_cursor('lecture', self.questions[0].lecture_id)
+        other = next(q for q in self.questions if q.lecture_id != self.questions[0].lecture_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_question(other.lecture, "Domanda aggiunta?")
+        self.assertIsNotNone(question_id_at(cursor, 0))
+
+    def test_quiz_views_end_a_changed_run(self):
+        lecture = self.questions[0].lecture
+        self.client.get(reverse('quiz_start_lecture', args=[lecture.id]))
+        with self.captureOnCommitCallbacks(execute=True):
+            make_question(lecture, "Domanda aggiunta?")
+        response = self.client.get(reverse('api_quiz_questions'))
+        self.assertEqual(response.status_code, 409)
+        answers = {'answers': [{'index': 0, 'question_id': self.questions[0].id, 'option_id': 1}]}
+        response = self.client.post(reverse('api_quiz_answers'), answers, content_type='application/json')
+        self.assertEqual(response.status_code, 409)
+        self.assertRedirects(self.client.get(reverse('quiz_question')), reverse('quiz_summary'))
+        self.assertNotIn('quiz_run', self.client.session)
+
+    def test_shuffle_options_is_stable_per_seed(self):
+        options = list(self.questions[0].options.all())
+        first = shuffle_options(42, self.questions[0].id, options)
+        self.assertEqual(first, shuffle_options(42, self.questions[0].id, options))
+        self.assertCountEqual(first, options)
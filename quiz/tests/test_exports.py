@@ -0,0 +1,69 @@
+import gzip
+import io
+import json
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from quiz.exports import export_items
+from quiz.imports import import_items, iter_json_items
+from quiz.models import Lecture, Question
+from quiz.tests.base import QuizTestCase, make_bank, make_question
+
+
+def question_rows():
+    return sorted(
+        (q.lecture.title, q.lecture.subject.name if q.lecture.subject else None, q.text, q.nature, q.page_number, q.content_hash)
+        for q in Question.objects.select_related('lecture__subject')
+    )
+
+
+class ExportTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=2, lectures=2, questions=4)
+        self.lecture = self.questions[0].lecture
+        self.questions[1].page_number = None
+        self.questions[1].nature = 'Pratica'
+        self.questions[1].save()
+
+    def download(self, name, *args, **params):
+        response = self.client.get(reverse(name, args=args), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_queries_do_not_grow_with_the_questions(self):
+        def export_queries(lecture):
+            with CaptureQueriesContext(connection) as queries:
+                items = json.loads(self.download('lecture_export_json', lecture.id))['questions']
+            return len(items), len(queries)
+
+        small = export_queries(self.lecture)
+        big_lecture = Lecture.objects.create(title="Grande", subject=self.lecture.subject)
+        for i in range(40):
+            make_question(big_lecture, f"Grande {i}?")
+        big = export_queries(big_lecture)
+        self.assertEqual((small[0], big[0]), (4, 40))
+        self.assertEqual(small[1], big[1])
+
+    def test_formats_round_trip_through_the_importer(self):
+        expected = question_rows()
+        bodies = {
+            'json': self.download('export_all_json'),
+            'ndjson': self.download('export_all_json', format='ndjson'),
+            'gzip': gzip.decompress(self.download('export_all_json', format='ndjson', gzip='1')),
+        }
+        for fmt, body in bodies.items():
+            with self.subTest(fmt):
+                items = list(iter_json_items(io.BytesIO(body)))
+                self.assertEqual(items, list(export_items(Question.objects.all())))
+                Question.objects.all().delete()
+                report = import_items(items)
+                self.assertEqual((report.created, report.rejected), (16, []))
+                self.assertEqual(question_rows(), expected)
+
+    def test_items_keep_the_slide_reference(self):
+        items = {item['question_text']: item for item in export_items(Question.objects.all())}
+        self.assertEqual(items[self.questions[0].text]['page_number'], 1)
+        self.assertIsNone(items[self.questions[1].text]['page_number'])
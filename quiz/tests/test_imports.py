@@ -0,0 +1,86 @@
+import io
+import json
+
+from quiz.imports import ImportFormatError, import_items, iter_json_items
+from quiz.models import AggregateStats, Lecture, Question, Subject
+from quiz.tests.base import QuizTestCase, make_question
+
+
+def item(text, lecture='Lezione 1', correct=0, **fields):
+    return {'lecture_title': lecture, 'question_text': text, 'options': ['A', 'B', 'C', 'D'], 'correct_index': correct, **fields}
+
+
+ITEMS = [item("Prima?", subject='Materia'), item("Seconda è già \"citata\"?", correct=3, page_number=4), item("Terza?", nature='Pratica')]
+
+
+class IterJsonItemsTests(QuizTestCase):
+    def parse(self, text, read_size=7):
+        return list(iter_json_items(io.BytesIO(text.encode('utf-8')), read_size=read_size))
+
+    def test_formats(self):
+        documents = {
+            'document': json.dumps({'questions': ITEMS}, indent=2),
+            'array': json.dumps(ITEMS),
+            'ndjson': "\n".join(json.dumps(i) for i in ITEMS) + "\n",
+            'bom': "﻿" + json.dumps(ITEMS),
+        }
+        for name, text in documents.items():
+            for read_size in (1, 7, 64 * 1024):
+                with self.subTest(name=name, read_size=read_size):
+                    self.assertEqual(self.parse(text, read_size), ITEMS)
+
+    def test_questions_after_other_keys(self):
+        text = json.dumps({'version': 1, 'meta': {'questions': 'no', 'list': [1, {}]}, 'questions': ITEMS, 'after': 2})
+        for read_size in (1, 7, 64 * 1024):
+            with self.subTest(read_size=read_size):
+                self.assertEqual(self.parse(text, read_size), ITEMS)
+
+    def test_ndjson_lines_are_read_whole(self):
+        lines = [{'nested': {'questions': ITEMS}, **ITEMS[0]}, ITEMS[1]]
+        self.assertEqual(self.parse("\n".join(json.dumps(i) for i in lines)), lines)
+
+    def test_text_file_objects(self):
+        self.assertEqual(list(iter_json_items(io.StringIO(json.dumps(ITEMS)))), ITEMS)
+
+    def test_empty_input(self):
+        self.assertEqual(self.parse(""), [])
+        self.assertEqual(self.parse("  []  "), [])
+        self.assertEqual(self.parse('{"questions": []}'), [])
+
+    def test_invalid_json(self):
+        for text in ('[{"a": 1},', '[{"a": 1} {"b": 2}]', '[{"a": ', '"questions"', '{"questions": {}}', '{"v": 1, "questions": 3}', '{"a": 1 "b": 2}', '{1: 2}', '{"a" 1}', '{"a": 1', '{"a": 1}\n{"b"'):
+            with self.subTest(text=text), self.assertRaises(ImportFormatError):
+                self.parse(text)
+
+
+class ImportItemsTests(QuizTestCase):
+    def test_report(self):
+        existing_lecture = Lecture.objects.create(title='Lezione 1')
+        make_question(existing_lecture, "Già presente?")
+        items = ITEMS + [
+            item("già   PRESENTE?"),                      # duplicate of a question in the database
+            item("Prima?", subject='Materia'),            # duplicate within the file
+            item("Senza opzioni?", options=['A', 'B']),
+            item("Indice?", correct=4),
+            item("Natura?", nature='Altro'),
+            {'question_text': "Senza lezione?"},
+            "non un oggetto",
+        ]
+        report = import_items(iter(items), batch_size=2)
+        self.assertEqual(report.created, 3)
+        self.assertEqual(report.duplicates, 2)
+        self.assertEqual([position for position, _ in report.rejected], [5, 6, 7, 8, 9])
+        self.assertIn("4 opzioni", report.rejected[0][1])
+        self.assertIn("'lecture_title'", report.rejected[3][1])
+
+        self.assertEqual(Question.objects.filter(lecture=existing_lecture).count(), 4)
+        self.assertEqual(Lecture.objects.get().subject, Subject.objects.get(name='Materia'))
+        second = Question.objects.get(text__startswith="Seconda")
+        self.assertEqual(second.page_number, 4)
+        self.assertEqual(second.options.get(is_correct=True).text, 'D')
+        self.assertEqual(AggregateStats.objects.get(scope=AggregateStats.SCOPE_GLOBAL, scope_id=0).questions, 4)
+
+    def test_reimport_creates_nothing(self):
+        self.assertEqual(import_items(ITEMS).created, 3)
+        report = import_items(ITEMS)
+        self.assertEqual((report.created, report.duplicates, report.rejected), (0, 3, []))
@@ -0,0 +1,41 @@
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from quiz.middleware import QueryBudgetMiddleware, QueryStats, query_shape
+from quiz.models import Subject
+from quiz.tests.base import QuizTestCase
+
+
+class QueryStatsTests(QuizTestCase):
+    def test_query_shape(self):
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE a = 12 AND b = 'x''y' AND c IN (%s, %s, %s)"),
+            "SELECT * FROM t WHERE a = ? AND b = ? AND c IN (...)",
+        )
+
+    def test_savepoints_are_not_counted(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            with transaction.atomic():
+                Subject.objects.create(name="Materia")
+        self.assertEqual(stats.count, 1)
+
+    def test_repeated_shapes(self):
+        stats = QueryStats()
+        with connection.execute_wrapper(stats):
+            for i in range(5):
+                list(Subject.objects.filter(pk=i))
+        self.assertEqual(stats.count, 5)
+        self.assertEqual(len(stats.repeated(5)), 1)
+        self.assertEqual(stats.repeated(6), [])
+
+    def test_stats_follow_the_request(self):
+        def view(request):
+            list(Subject.objects.all())
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        response = QueryBudgetMiddleware(view)(request)
+        self.assertEqual(response.query_stats.count, 1)
+        self.assertIs(request.query_stats, response.query_stats)
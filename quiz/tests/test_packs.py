@@ -0,0 +1,78 @@
+import json
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils import timezone
+
+from quiz.models import PackSyncBatch, Question
+from quiz.packs import forget_synced_batches
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+class PackTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=2, lectures=2, questions=3)
+        self.subject = self.questions[0].lecture.subject
+        self.manifest = self.client.get(reverse('pack_manifest', args=[self.subject.id])).json()
+        self.pack = json.loads(self.client.get(self.manifest['url']).content)
+        self.inside = [q for q in self.questions if q.lecture.subject_id == self.subject.id]
+        self.outside = [q for q in self.questions if q.lecture.subject_id != self.subject.id]
+
+    def answer(self, question, correct=True):
+        return {'question_id': question.id, 'option_id': question.options.filter(is_correct=correct).first().id}
+
+    def sync(self, answers, batch_id='batch-1', **fields):
+        payload = {'batch_id': batch_id, 'subject': self.subject.id, 'version': self.manifest['version'], 'answers': answers, **fields}
+        return self.client.post(reverse('api_pack_answers'), json.dumps(payload), content_type='application/json')
+
+    def test_pack_contents(self):
+        self.assertEqual(self.pack['version'], self.manifest['version'])
+        self.assertEqual(sorted(q['id'] for q in self.pack['questions']), sorted(q.id for q in self.inside))
+        self.assertEqual(self.manifest['questions'], 6)
+
+    def test_batch_is_recorded(self):
+        response = self.sync([self.answer(self.inside[0]), self.answer(self.inside[1], correct=False)])
+        self.assertEqual(response.json(), {'batch_id': 'batch-1', 'recorded': 2, 'rejected': [], 'duplicate': False})
+        self.assertEqual(Question.objects.get(pk=self.inside[0].pk).times_correct, 1)
+        self.assertEqual(Question.objects.get(pk=self.inside[1].pk).times_wrong, 1)
+
+    def test_replayed_batch_counts_once(self):
+        answers = [self.answer(self.inside[0])]
+        self.assertFalse(self.sync(answers).json()['duplicate'])
+        # As if the batch were resent to another worker, or after a restart
+        caches['default'].clear()
+        response = self.sync(answers)
+        self.assertEqual(response.json(), {'batch_id': 'batch-1', 'recorded': 0, 'rejected': [], 'duplicate': True})
+        self.assertEqual(Question.objects.get(pk=self.inside[0].pk).times_answered, 1)
+        self.assertEqual(self.sync(answers, batch_id='batch-2').json()['recorded'], 1)
+
+    def test_questions_outside_the_pack_are_rejected(self):
+        answers = [self.answer(self.outside[0]), self.answer(self.inside[0]), {'question_id': [1]}, 'x']
+        for cached in (True, False):
+            with self.subTest(cached=cached):
+                if not cached:
+                    caches['default'].clear()
+                response = self.sync(answers, batch_id=f"batch-{cached}")
+                self.assertEqual((response.json()['recorded'], response.json()['rejected']), (1, [0, 2, 3]))
+        self.assertEqual(Question.objects.get(pk=self.outside[0].pk).times_answered, 0)
+        self.assertEqual(Question.objects.get(pk=self.inside[0].pk).times_answered, 2)
+
+    def test_other_subject_claimed(self):
+        other = self.outside[0].lecture.subject
+        response = self.sync([self.answer(self.inside[0])], subject=other.id)
+        self.assertEqual(response.json()['rejected'], [0])
+
+    def test_invalid_batches(self):
+        for fields in ({'subject': None}, {'version': ''}, {'subject': str(self.subject.id)}, {'batch_id': ''}):
+            with self.subTest(fields=fields):
+                self.assertEqual(self.sync([self.answer(self.inside[0])], **fields).status_code, 400)
+        self.assertFalse(PackSyncBatch.objects.exists())
+
+    def test_forget_synced_batches(self):
+        self.sync([], batch_id='old')
+        self.sync([], batch_id='new')
+        PackSyncBatch.objects.filter(batch_id='old').update(received_at=timezone.now() - timedelta(days=8))
+        self.assertEqual(forget_synced_batches(), 1)
+        self.assertEqual(list(PackSyncBatch.objects.values_list('batch_id', flat=True)), ['new'])
@@ -0,0 +1,48 @@
+from quiz.models import Lecture
+from quiz.pagination import estimate_count, keyset_page, page_size, parse_cursor
+from quiz.tests.base import QuizTestCase
+
+
+class KeysetPageTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ids = [Lecture.objects.create(title=f"Lezione {i}").pk for i in range(23)]
+        self.lectures = Lecture.objects.all()
+
+    def test_walk_forward_and_back(self):
+        pages, page = [], keyset_page(self.lectures, size=5)
+        self.assertIsNone(page.prev_before)
+        while True:
+            pages.append([lecture.pk for lecture in page])
+            if page.next_after is None:
+                break
+            page = keyset_page(self.lectures, after=page.next_after, size=5)
+        self.assertEqual(sum(pages, []), self.ids)
+        self.assertEqual([len(p) for p in pages], [5, 5, 5, 5, 3])
+
+        back = []
+        while page.prev_before is not None:
+            page = keyset_page(self.lectures, before=page.prev_before, size=5)
+            back.append([lecture.pk for lecture in page])
+        self.assertEqual(back, pages[-2::-1])
+        self.assertIsNotNone(page.next_after)
+
+    def test_values_rows(self):
+        page = keyset_page(self.lectures.values('id', 'title'), after=self.ids[1], size=2)
+        self.assertEqual([row['id'] for row in page], self.ids[2:4])
+        self.assertEqual((page.prev_before, page.next_after), (self.ids[2], self.ids[3]))
+
+    def test_past_the_end(self):
+        page = keyset_page(self.lectures, after=self.ids[-1], size=5)
+        self.assertEqual((len(page), page.next_after, page.prev_before), (0, None, None))
+
+    def test_estimate_count(self):
+        self.assertEqual(estimate_count(self.lectures), 23)
+        self.assertEqual(estimate_count(Lecture.objects.none()), 0)
+        page = keyset_page(self.lectures, size=5)
+        page.estimated_total = 23
+        self.assertEqual(page.estimated_pages, 5)
+
+    def test_parse_cursor_and_page_size(self):
+        self.assertEqual([parse_cursor(v) for v in ('12', '0', '-3', 'x', None)], [12, None, None, None, None])
+        self.assertEqual([page_size(v, 20, 100) for v in ('5', '0', '500', 'x', None)], [5, 1, 100, 20, 20])
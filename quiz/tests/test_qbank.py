@@ -0,0 +1,123 @@
+import io
+import tempfile
+
+from django.core.management import CommandError, call_command
+
+from quiz.exports import export_items
+from quiz.imports import import_items
+from quiz.models import Question
+from quiz.qbank import HEADER, QUESTION, BankFormatError, BankReader, write_bank
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+class QBankTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=2, lectures=2, questions=3)
+        self.questions[0].page_number = None
+        self.questions[0].save()
+        Question.objects.filter(pk=self.questions[1].pk).update(times_answered=7, times_correct=5, times_wrong=2)
+
+    def bank(self):
+        out = io.BytesIO()
+        counts = write_bank(out, Question.objects.all())
+        return out.getvalue(), counts
+
+    def test_round_trip(self):
+        data, counts = self.bank()
+        self.assertEqual(counts, (2, 4, 12, 48))
+        with BankReader(data) as reader:
+            reader.verify()
+            self.assertEqual((reader.num_subjects, reader.num_lectures, reader.num_questions), (2, 4, 12))
+            for question in Question.objects.select_related('lecture').prefetch_related('options'):
+                stored = reader.question(question.pk)
+                options = sorted(question.options.all(), key=lambda o: o.pk)
+                self.assertEqual(stored.text, question.text)
+                self.assertEqual(stored.lecture_id, question.lecture_id)
+                self.assertEqual(stored.subject_id, question.lecture.subject_id)
+                self.assertEqual(stored.page_number, question.page_number)
+                self.assertEqual([(o.id, o.text) for o in stored.options], [(o.pk, o.text) for o in options])
+                self.assertEqual(stored.correct_option_id, next(o.pk for o in options if o.is_correct))
+                self.assertEqual(
+                    (stored.times_answered, stored.times_correct, stored.times_wrong),
+                    (question.times_answered, question.times_correct, question.times_wrong),
+                )
+            self.assertIsNone(reader.question(max(q.pk for q in self.questions) + 1))
+
+    def test_items_import_back(self):
+        data, _ = self.bank()
+        expected = sorted(
+            (q.lecture.title, q.lecture.subject.name, q.text, q.page_number, q.content_hash)
+            for q in Question.objects.select_related('lecture__subject')
+        )
+        with BankReader(data) as reader:
+            items = list(reader.items())
+        self.assertEqual(items, list(export_items(Question.objects.all())))
+        Question.objects.all().delete()
+        report = import_items(items)
+        self.assertEqual((report.created, report.rejected), (12, []))
+        imported = sorted(
+            (q.lecture.title, q.lecture.subject.name, q.text, q.page_number, q.content_hash)
+            for q in Question.objects.select_related('lecture__subject')
+        )
+        self.assertEqual(imported, expected)
+
+    def test_corrupt_files(self):
+        data, _ = self.bank()
+        damaged = bytearray(data)
+        damaged[-1] ^= 0xFF
+        with BankReader(bytes(damaged)) as reader, self.assertRaisesMessage(BankFormatError, "Checksum"):
+            reader.verify()
+
+        cases = {
+            'short': data[:HEADER.size - 1],
+            'truncated': data[:len(data) - 10],
+            'magic': b'XXXX' + data[4:],
+            'version': data[:4] + b'\x09\x00' + data[6:],
+        }
+        for name, broken in cases.items():
+            with self.subTest(name), self.assertRaises(BankFormatError):
+                BankReader(broken)
+
+    def damage_question(self, data, field, value):
+        # Overwrite one field of the first question record, keeping the CRC
+        with BankReader(data) as reader:
+            start = reader._questions
+        fields = list(QUESTION.unpack_from(data, start))
+        fields[field] = value
+        return data[:start] + QUESTION.pack(*fields) + data[start + QUESTION.size:]
+
+    def test_damaged_records_without_verify(self):
+        data, _ = self.bank()
+        cases = {
+            'lecture': self.damage_question(data, 1, 99),
+            'options': self.damage_question(data, 6, 10 ** 6),
+            'text': self.damage_question(data, 2, 10 ** 6),
+            'correct': self.damage_question(data, 12, 9),
+        }
+        for name, damaged in cases.items():
+            with self.subTest(name), BankReader(damaged) as reader:
+                with self.assertRaises(BankFormatError):
+                    list(reader.items())
+                with self.assertRaises(BankFormatError):
+                    reader.verify()
+
+    def test_import_command_reports_damaged_files(self):
+        data, _ = self.bank()
+        for damaged in (data[:len(data) // 2], self.damage_question(data, 6, 10 ** 6)):
+            with tempfile.NamedTemporaryFile(suffix='.qbank') as f:
+                f.write(damaged)
+                f.flush()
+                with self.subTest(size=len(damaged)), self.assertRaises(CommandError):
+                    call_command('import_question_bank', f.name, '--no-verify', stdout=io.StringIO())
+
+    def test_file_path(self):
+        data, _ = self.bank()
+        with tempfile.NamedTemporaryFile(suffix='.qbank') as f:
+            f.write(data)
+            f.flush()
+            with BankReader(f.name) as reader:
+                reader.verify()
+                self.assertEqual(reader.question(self.questions[1].pk).times_answered, 7)
+        with tempfile.NamedTemporaryFile(suffix='.qbank') as empty, self.assertRaises(BankFormatError):
+            BankReader(empty.name)
@@ -0,0 +1,126 @@
+import json
+import uuid
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.test import override_settings
+from django.urls import reverse
+
+from quiz.middleware import QueryBudgetExceeded
+from quiz.stats_buffer import stats_buffer
+from quiz.testing import QueryBudgetMixin
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+@override_settings(QUIZ_QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(QueryBudgetMixin, QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        # Enough rows per page for an N+1 to show up as repeated queries
+        self.questions = make_bank(subjects=2, lectures=6, questions=4)
+        self.lecture = self.questions[0].lecture
+        self.subject = self.lecture.subject
+        # Budgets are for the default configuration, where answers are
+        # buffered; the worker is not started and the buffer is dropped after
+        patcher = mock.patch.object(stats_buffer, 'write_behind', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(stats_buffer, '_ensure_worker')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.drop_buffered_answers)
+
+    def drop_buffered_answers(self):
+        with stats_buffer._lock:
+            stats_buffer._pending, stats_buffer._events, stats_buffer._pending_count = {}, [], 0
+
+    def get(self, name, *args, **params):
+        return self.client.get(reverse(name, args=args), params)
+
+    def post_json(self, name, data, *args):
+        return self.client.post(reverse(name, args=args), json.dumps(data), content_type='application/json')
+
+    def start_run(self):
+        self.get('quiz_start_lecture', self.lecture.id)
+
+    def quiz_question_answer(self):
+        self.start_run()
+        question = self.get('quiz_question').context['question']
+        return self.client.post(reverse('quiz_question'), {'action': 'answer', 'option': question.correct_option_id})
+
+    def api_quiz_questions(self):
+        self.start_run()
+        return self.get('api_quiz_questions', count=10)
+
+    def api_quiz_answers(self):
+        self.start_run()
+        first = self.get('api_quiz_questions', count=4).json()['questions'][0]
+        return self.post_json('api_quiz_answers', {'answers': [
+            {'index': first['index'], 'question_id': first['id'], 'option_id': first['options'][0]['id']},
+        ]})
+
+    def pack_download(self):
+        version = self.get('pack_manifest', self.subject.id).json()['version']
+        # Measure a download that has to rebuild the pack
+        caches['default'].clear()
+        return self.get('pack_download', self.subject.id, version)
+
+    def api_pack_answers(self):
+        pack = self.get('pack_download', self.subject.id, self.get('pack_manifest', self.subject.id).json()['version']).json()
+        # Answers checked against the database rather than the cached pack ids
+        caches['default'].clear()
+        answers = [
+            {'question_id': question['id'], 'option_id': question['correct']} for question in pack['questions'][:5]
+        ]
+        return self.post_json('api_pack_answers', {
+            'batch_id': uuid.uuid4().hex, 'subject': self.subject.id, 'version': pack['version'], 'answers': answers,
+        })
+
+    def requests(self):
+        """One request per budgeted view: ``{url name: callable returning the response}``."""
+        return {
+            'home': lambda: self.get('home'),
+            'subject_detail': lambda: self.get('subject_detail', self.subject.id),
+            'lecture_list': lambda: self.get('lecture_list'),
+            'lecture_detail': lambda: self.get('lecture_detail', self.lecture.id),
+            'api_lectures': lambda: self.get('api_lectures'),
+            'stats_global': lambda: self.get('stats_global'),
+            'quiz_start_total': lambda: self.get('quiz_start_total'),
+            'quiz_start_subject': lambda: self.get('quiz_start_subject', self.subject.id),
+            'quiz_start_lecture': lambda: self.get('quiz_start_lecture', self.lecture.id),
+            'quiz_start_weak': lambda: self.get('quiz_start_weak'),
+            'quiz_start_weak_subject': lambda: self.get('quiz_start_weak_subject', self.subject.id),
+            'quiz_start_weak_lecture': lambda: self.get('quiz_start_weak_lecture', self.lecture.id),
+            'quiz_question': self.quiz_question_answer,
+            'quiz_summary': lambda: self.get('quiz_summary'),
+            'api_quiz_questions': self.api_quiz_questions,
+            'api_quiz_answers': self.api_quiz_answers,
+            'pack_manifest': lambda: self.get('pack_manifest', self.subject.id),
+            'pack_download': self.pack_download,
+            'pack_play': lambda: self.get('pack_play', self.subject.id),
+            'api_pack_answers': self.api_pack_answers,
+            'search': lambda: self.get('search', q='Domanda'),
+            'api_search': lambda: self.get('api_search', q='Domanda'),
+            'metrics': lambda: self.get('metrics'),
+        }
+
+    def test_every_budgeted_view_is_checked(self):
+        self.assertEqual(set(self.requests()), set(settings.QUIZ_QUERY_BUDGETS))
+
+    def test_views_stay_within_their_budgets(self):
+        for name, request in self.requests().items():
+            with self.subTest(name):
+                response = request()
+                self.assertLess(response.status_code, 400)
+                self.assertEqual(response.resolver_match.url_name, name)
+                self.assertWithinQueryBudget(response)
+
+    def test_lecture_list_counts_questions_in_one_query(self):
+        response = self.get('lecture_list')
+        self.assertWithinQueryBudget(response)
+        self.assertEqual({lecture.num_questions for lecture in response.context['lectures']}, {4})
+
+    def test_strict_mode_raises_over_budget(self):
+        with override_settings(QUIZ_QUERY_BUDGETS={'home': 0}), self.assertRaises(QueryBudgetExceeded):
+            self.get('home')
@@ -0,0 +1,44 @@
+import json
+
+from django.urls import reverse
+
+from quiz.models import AggregateStats, Question
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+class QuizApiTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=1, lectures=2, questions=3)
+        self.lecture = self.questions[0].lecture
+        self.client.get(reverse('quiz_start_lecture', args=[self.lecture.id]))
+        self.run_questions = self.client.get(reverse('api_quiz_questions')).json()['questions']
+
+    def answer(self, answers):
+        return self.client.post(reverse('api_quiz_answers'), json.dumps({'answers': answers}), content_type='application/json')
+
+    def test_answers_are_graded_and_counted(self):
+        first = self.run_questions[0]
+        correct = Question.objects.get(pk=first['id']).options.get(is_correct=True).id
+        response = self.answer([{'index': 0, 'question_id': first['id'], 'option_id': correct}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['is_correct'], True)
+        self.assertEqual(response.json()['index'], 1)
+        self.assertEqual(Question.objects.get(pk=first['id']).times_correct, 1)
+        totals = AggregateStats.objects.get(scope=AggregateStats.SCOPE_LECTURE, scope_id=self.lecture.id)
+        self.assertEqual((totals.answered, totals.correct), (1, 1))
+
+    def test_questions_outside_the_run_are_rejected(self):
+        other = next(q for q in self.questions if q.lecture_id != self.lecture.id)
+        option = other.options.first().id
+        for answers in (
+            [{'index': 0, 'question_id': other.id, 'option_id': option}],
+            [{'index': 99, 'question_id': other.id, 'option_id': option}],
+            [{'question_id': other.id, 'option_id': option}],
+            [{'index': 0, 'question_id': self.run_questions[0]['id'], 'option_id': option}] * 2,
+        ):
+            with self.subTest(answers=answers):
+                response = self.answer(answers)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('results', response.json())
+        self.assertEqual(Question.objects.get(pk=other.id).times_answered, 0)
@@ -0,0 +1,75 @@
+import sqlite3
+import tempfile
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.test import SimpleTestCase, override_settings
+
+from quiz import replica
+from quiz.replica import refresh_replica
+
+ROWS = 2000
+
+
+@override_settings(QUIZ_REPLICA_BACKUP_PAGES=1, QUIZ_REPLICA_BACKUP_SLEEP=0)
+class RefreshReplicaTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.primary = self.directory / 'primary.sqlite3'
+        self.target = self.directory / 'replica.sqlite3'
+        with sqlite3.connect(self.primary) as db:
+            db.execute("CREATE TABLE item (id INTEGER PRIMARY KEY, text TEXT)")
+            db.executemany("INSERT INTO item (text) VALUES (?)", [(f"riga {i} " * 10,) for i in range(ROWS)])
+        db.close()
+        # Only refresh_replica() reads these; the test database connection is already open
+        patcher = mock.patch.dict(settings.DATABASES[DEFAULT_DB_ALIAS], {'NAME': str(self.primary)})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        overrider = override_settings(QUIZ_REPLICA_PATH=self.target)
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+    def rows(self):
+        db = sqlite3.connect(self.target)
+        try:
+            return db.execute("SELECT count(*) FROM item").fetchone()[0]
+        finally:
+            db.close()
+
+    def leftovers(self):
+        return sorted(p.name for p in self.directory.iterdir() if p.suffix == '.tmp')
+
+    def test_copies_the_primary_one_step_at_a_time(self):
+        self.assertEqual(refresh_replica(), self.target)
+        self.assertEqual(self.rows(), ROWS)
+        self.assertEqual(self.leftovers(), [])
+
+    def test_skips_while_another_process_refreshes(self):
+        if replica.fcntl is None:
+            self.skipTest("no file locking on this platform")
+        with open(f"{self.target}.lock", 'a') as lock:
+            replica.fcntl.flock(lock, replica.fcntl.LOCK_EX)
+            self.assertIsNone(refresh_replica())
+        self.assertFalse(self.target.exists())
+        self.assertEqual(refresh_replica(), self.target)
+
+    def test_skips_a_replica_refreshed_recently(self):
+        refresh_replica()
+        with sqlite3.connect(self.primary) as db:
+            db.execute("DELETE FROM item")
+        db.close()
+        self.assertIsNone(refresh_replica(min_age=60))
+        self.assertEqual(self.rows(), ROWS)
+        self.assertEqual(refresh_replica(), self.target)
+        self.assertEqual(self.rows(), 0)
+
+    def test_a_failed_refresh_keeps_the_old_replica(self):
+        refresh_replica()
+        with mock.patch('quiz.replica.os.replace', side_effect=OSError), self.assertRaises(OSError):
+            refresh_replica()
+        self.assertEqual(self.rows(), ROWS)
+        self.assertEqual(self.leftovers(), [])
@@ -0,0 +1,53 @@
+from django.contrib.sessions.models import Session
+from django.test import override_settings
+
+from quiz.session_store import SessionStore, persist_session
+from quiz.tests.base import QuizTestCase
+
+
+@override_settings(SESSION_CACHE_ALIAS='sessions')
+class SessionStoreTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        session = SessionStore()
+        session['user_pref'] = 'dark'
+        session['quiz_run'] = {'index': 0}
+        session.save()
+        self.key = session.session_key
+
+    def db_data(self):
+        return SessionStore().decode(Session.objects.get(pk=self.key).session_data)
+
+    def test_hot_keys_stay_in_the_cache(self):
+        session = SessionStore(self.key)
+        session['quiz_run'] = {'index': 5}
+        session['quiz_stats'] = {'correct': 3}
+        session.save()
+        self.assertEqual(self.db_data()['quiz_run'], {'index': 0})
+        self.assertNotIn('quiz_stats', self.db_data())
+        self.assertEqual(SessionStore(self.key)['quiz_run'], {'index': 5})
+
+    def test_other_keys_are_written_through(self):
+        session = SessionStore(self.key)
+        session['quiz_run'] = {'index': 5}
+        session['user_pref'] = 'light'
+        session.save()
+        self.assertEqual(self.db_data(), {'user_pref': 'light', 'quiz_run': {'index': 5}})
+
+    def test_persist_session(self):
+        session = SessionStore(self.key)
+        session['quiz_run'] = {'index': 9}
+        persist_session(session)
+        session.save()
+        self.assertEqual(self.db_data()['quiz_run'], {'index': 9})
+        # Back to cache-only saves afterwards
+        session['quiz_run'] = {'index': 10}
+        session.save()
+        self.assertEqual(self.db_data()['quiz_run'], {'index': 9})
+
+    def test_lost_cache_entry_falls_back_to_the_database(self):
+        session = SessionStore(self.key)
+        session['quiz_run'] = {'index': 5}
+        session.save()
+        session._cache.delete(session.cache_key)
+        self.assertEqual(SessionStore(self.key)['quiz_run'], {'index': 0})
@@ -0,0 +1,70 @@
+from quiz import page_cache
+from quiz.models import LecturePage, Question
+from quiz.snapshots import SNAPSHOT_DEPENDENCIES, SnapshotCache, snapshot_cache
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+class SnapshotCacheTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=1, lectures=2, questions=3)
+        LecturePage.objects.create(lecture=self.questions[0].lecture, page_number=1, text="  Prima slide\n\ntesto", source_hash='x')
+        self.cache = SnapshotCache(maxsize=4, check_interval=0)
+
+    def test_misses_are_loaded_together(self):
+        ids = [q.pk for q in self.questions[:3]]
+        with self.assertNumQueries(3):  # questions, options, slides
+            snapshots = self.cache.get_many(ids)
+        self.assertEqual(sorted(snapshots), ids)
+        first = snapshots[ids[0]]
+        self.assertEqual(first.slide, "Prima slide\ntesto")
+        self.assertEqual(first.correct_option_id, self.questions[0].options.get(is_correct=True).pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get_many(ids), snapshots)
+        self.assertEqual(self.cache.info()['hits'], 3)
+
+    def test_lru_bound(self):
+        self.cache.get_many([q.pk for q in self.questions])
+        self.assertEqual(self.cache.info()['size'], 4)
+
+    def test_changes_from_other_processes(self):
+        question = self.questions[0]
+        self.cache.get(question.pk)
+        # Another worker edits the question: no signal here, only the shared generation moves
+        Question.objects.filter(pk=question.pk).update(text="Modificata?")
+        with self.captureOnCommitCallbacks(execute=True):
+            page_cache.bump(page_cache.QUESTIONS)
+        self.assertEqual(self.cache.get(question.pk).text, "Modificata?")
+
+    def test_stale_loads_are_dropped(self):
+        question = self.questions[0]
+        self.cache.get(self.questions[1].pk)
+        stale = self.cache.get(question.pk)
+        self.cache.invalidate(question.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            page_cache.bump(page_cache.OPTIONS)
+        old = page_cache.generations(SNAPSHOT_DEPENDENCIES)
+        self.cache.get(self.questions[1].pk)
+        self.cache.put(stale, [g - 1 for g in old])
+        self.assertEqual(self.cache.info()['size'], 1)
+        self.assertEqual(self.cache.warm([stale], [g - 1 for g in old]), 0)
+        self.assertEqual(self.cache.warm([stale], old), 1)
+
+    def test_signals_invalidate_in_process(self):
+        question = self.questions[0]
+        snapshot_cache.get(question.pk)
+        option = question.options.get(is_correct=True)
+        option.text = "Nuova"
+        option.save()
+        self.assertIn("Nuova", [o.text for o in snapshot_cache.get(question.pk).options])
+        question.text = "Salvata?"
+        question.save()
+        self.assertEqual(snapshot_cache.get(question.pk).text, "Salvata?")
+
+    def test_clear_forgets_the_generations(self):
+        self.cache.get(self.questions[0].pk)
+        self.cache.clear()
+        self.assertEqual(self.cache.info(), {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': 4})
+        self.assertIsNone(self.cache._generations)
+        self.assertEqual(self.cache.warm([], [1, 2, 3, 4]), 0)
+        self.assertEqual(self.cache._generations, [1, 2, 3, 4])
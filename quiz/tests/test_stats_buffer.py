@@ -0,0 +1,56 @@
+from unittest import mock
+
+from django.urls import reverse
+from django.utils import timezone
+
+from quiz.models import AnswerEvent, DailyAnswerStats, Question, RollupState
+from quiz.rollups import ROLLUP_NAME, daily_trend
+from quiz.stats_buffer import StatsBuffer, stats_buffer
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+class SynchronousStatsTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=1, lectures=1, questions=3)
+        self.question = self.questions[0]
+
+    def test_answers_move_the_daily_trends(self):
+        stats_buffer.record(self.question.id, True, self.question.lecture_id, self.question.lecture.subject_id)
+        stats_buffer.record(self.question.id, False, self.question.lecture_id, self.question.lecture.subject_id)
+        today = timezone.localdate()
+        for scope, scope_id in (
+            (DailyAnswerStats.SCOPE_GLOBAL, 0),
+            (DailyAnswerStats.SCOPE_LECTURE, self.question.lecture_id),
+            (DailyAnswerStats.SCOPE_SUBJECT, self.question.lecture.subject_id),
+        ):
+            with self.subTest(scope=scope):
+                self.assertEqual(daily_trend(scope, scope_id), [{'day': today, 'answered': 2, 'accuracy': 50.0}])
+        self.assertEqual(RollupState.objects.get(name=ROLLUP_NAME).last_event_id, AnswerEvent.objects.latest('id').id)
+
+    def test_answered_question_shows_on_the_stats_page(self):
+        self.client.get(reverse('quiz_start_lecture', args=[self.question.lecture_id]))
+        question = self.client.get(reverse('quiz_question')).context['question']
+        self.client.post(reverse('quiz_question'), {'action': 'answer', 'option': question.correct_option_id})
+        self.assertEqual(Question.objects.get(pk=question.id).times_correct, 1)
+        trend = self.client.get(reverse('stats_global')).context['trend']
+        self.assertEqual([(row['answered'], row['accuracy']) for row in trend], [(1, 100.0)])
+
+    def test_a_failed_rollup_does_not_lose_the_answer(self):
+        with mock.patch('quiz.stats_buffer.rollup_answer_events', side_effect=RuntimeError), self.assertLogs('quiz.stats_buffer'):
+            stats_buffer.record(self.question.id, True, self.question.lecture_id, self.question.lecture.subject_id)
+        self.assertEqual(Question.objects.get(pk=self.question.id).times_answered, 1)
+        self.assertFalse(DailyAnswerStats.objects.exists())
+
+
+class WriteBehindTests(QuizTestCase):
+    def test_answers_wait_for_the_flush(self):
+        question = make_bank(subjects=1, lectures=1, questions=1)[0]
+        buffer = StatsBuffer(write_behind=True)
+        with mock.patch.object(buffer, '_ensure_worker'):
+            buffer.record(question.id, True, question.lecture_id, question.lecture.subject_id)
+        self.assertEqual(buffer.pending(), {question.id: (1, 1, 0)})
+        self.assertEqual(Question.objects.get(pk=question.id).times_answered, 0)
+        self.assertEqual(buffer.flush(), 1)
+        self.assertEqual(Question.objects.get(pk=question.id).times_answered, 1)
+        self.assertEqual(buffer.pending(), {})
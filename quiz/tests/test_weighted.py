@@ -0,0 +1,96 @@
+import random
+from array import array
+from collections import Counter
+
+from quiz.cursor import new_cursor, question_id_at, question_ids_at
+from quiz.models import Question
+from quiz.weighted import HEADROOM, AliasTable, WeakSpotSampler
+from quiz.tests.base import QuizTestCase, make_bank
+
+
+def alias_table(weights):
+    return AliasTable(array('q', range(1, len(weights) + 1)), array('d', weights))
+
+
+class AliasTableTests(QuizTestCase):
+    def test_draws_follow_the_weights(self):
+        weights = [0.05, 0.1, 0.2, 0.25, 0.4]
+        table = alias_table(weights)
+        rng = random.Random(1)
+        draws = 50000
+        counts = Counter(table.draw(rng) for _ in range(draws))
+        total = sum(weights)
+        for question_id, weight in zip(table.ids, weights):
+            with self.subTest(question_id=question_id):
+                self.assertAlmostEqual(counts[question_id] / draws, weight / total, delta=0.01)
+
+    def test_zero_weights_are_never_drawn(self):
+        table = alias_table([0.0, 0.5, 0.0, 0.5])
+        rng = random.Random(2)
+        self.assertEqual({table.draw(rng) for _ in range(2000)}, {2, 4})
+
+    def test_position(self):
+        table = AliasTable(array('q', [3, 8, 20]), array('d', [0.5] * 3))
+        self.assertEqual(table.position(8), 1)
+        self.assertIsNone(table.position(9))
+        self.assertIsNone(table.position(21))
+
+    def test_update_in_place_until_a_weight_outgrows_its_bound(self):
+        table = alias_table([0.1, 0.1])
+        self.assertTrue(table.update(0, 0.1 * HEADROOM))
+        self.assertEqual(table.weights[0], 0.1 * HEADROOM)
+        self.assertFalse(table.update(1, 0.1 * HEADROOM + 0.01))
+        # Lowered weights apply at once
+        self.assertTrue(table.update(0, 0.0))
+        rng = random.Random(3)
+        self.assertEqual({table.draw(rng) for _ in range(500)}, {2})
+
+
+class WeakSpotSamplerTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.questions = make_bank(subjects=1, lectures=2, questions=10)
+        self.sampler = WeakSpotSampler()
+
+    def test_sample_is_distinct_and_seeded(self):
+        ids = self.sampler.sample('all', None, 5, 12)
+        self.assertEqual(len(ids), 12)
+        self.assertEqual(len(set(ids)), 12)
+        self.assertEqual(ids, self.sampler.sample('all', None, 5, 12))
+
+    def test_small_scope_is_returned_whole(self):
+        lecture_id = self.questions[0].lecture_id
+        ids = self.sampler.sample('lecture', lecture_id, 5, 20)
+        self.assertCountEqual(ids, Question.objects.filter(lecture_id=lecture_id).values_list('id', flat=True))
+
+    def test_changed_stats_update_the_table_in_place(self):
+        Question.objects.update(difficulty=0.2)
+        table = self.sampler.table('all', None)
+        hard = self.questions[0]
+        Question.objects.filter(pk=hard.pk).update(difficulty=0.3)
+        self.sampler.mark_stats_changed([hard.pk])
+        self.assertIs(self.sampler.table('all', None), table)
+        self.assertEqual(table.weights[table.position(hard.pk)], 0.3)
+
+        Question.objects.filter(pk=hard.pk).update(difficulty=0.9)
+        self.sampler.mark_stats_changed([hard.pk])
+        rebuilt = self.sampler.table('all', None)
+        self.assertIsNot(rebuilt, table)
+        self.assertEqual(rebuilt.weights[rebuilt.position(hard.pk)], 0.9)
+
+
+class WeightedRunTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        make_bank(subjects=2, lectures=2, questions=5)
+
+    def test_weighted_run_keeps_its_distinct_drawn_ids(self):
+        with self.settings(QUIZ_WEAK_SPOTS_LENGTH=8):
+            cursor = new_cursor('all', weighted=True)
+        self.assertEqual(cursor['total'], 8)
+        self.assertEqual(len(set(cursor['ids'])), 8)
+        # New questions rebuild the tables, the run keeps its questions
+        make_bank(subjects=1, lectures=1, questions=10)
+        ids = [question_id_at(cursor, i) for i in range(cursor['total'])]
+        self.assertEqual(ids, cursor['ids'])
+        self.assertEqual(question_ids_at(cursor, range(8)), dict(enumerate(cursor['ids'])))
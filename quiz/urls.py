@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
+if getattr(settings, 'QUIZ_ASYNC_VIEWS', False):
+    from . import async_views as quiz_views
+else:
+    quiz_views = views
+
 urlpatterns = [
     path('', views.home, name='home'),
     path('subject/<int:subject_id>/', views.subject_detail, name='subject_detail'),
     path('subject/add/', views.subject_create, name='subject_create'),
     path('subject/<int:subject_id>/edit/', views.subject_update, name='subject_update'),
     path('subject/<int:subject_id>/delete/', views.subject_delete, name='subject_delete'),
+    path('subject/<int:subject_id>/export/', views.subject_export_json, name='subject_export_json'),
+    path('export/', views.export_all_json, name='export_all_json'),
     
     # Lectures CRUD
     path('lectures/', views.lecture_list, name='lecture_list'),
@@ -17,7 +25,7 @@ urlpatterns = [
     path('lectures/<int:lecture_id>/edit/', views.lecture_update, name='lecture_update'),
     path('lectures/<int:lecture_id>/delete/', views.lecture_delete, name='lecture_delete'),
     path('lectures/<int:lecture_id>/export/', views.lecture_export_json, name='lecture_export_json'),
-    path('api/lectures/', views.api_lectures, name='api_lectures'),
+    path('api/lectures/', quiz_views.api_lectures, name='api_lectures'),
     
     # Questions CRUD
     path('questions/import/', views.question_import, name='question_import'),
@@ -27,12 +35,35 @@ urlpatterns = [
     path('questions/<int:question_id>/delete/', views.question_delete, name='question_delete'),
     
     # Quiz
-    path('quiz/all/', views.quiz_start_total, name='quiz_start_total'),
-    path('quiz/subject/<int:subject_id>/', views.quiz_start_subject, name='quiz_start_subject'),
-    path('quiz/lecture/<int:lecture_id>/', views.quiz_start_lecture, name='quiz_start_lecture'),
-    path('quiz/run/', views.quiz_question, name='quiz_question'),
-    path('quiz/summary/', views.quiz_summary, name='quiz_summary'),
+    path('quiz/all/', quiz_views.quiz_start_total, name='quiz_start_total'),
+    path('quiz/subject/<int:subject_id>/', quiz_views.quiz_start_subject, name='quiz_start_subject'),
+    path('quiz/lecture/<int:lecture_id>/', quiz_views.quiz_start_lecture, name='quiz_start_lecture'),
+    path('quiz/weak/', quiz_views.quiz_start_weak, name='quiz_start_weak'),
+    path('quiz/weak/subject/<int:subject_id>/', quiz_views.quiz_start_weak, name='quiz_start_weak_subject'),
+    path('quiz/weak/lecture/<int:lecture_id>/', quiz_views.quiz_start_weak, name='quiz_start_weak_lecture'),
+    path('quiz/run/', quiz_views.quiz_question, name='quiz_question'),
+    path('quiz/summary/', quiz_views.quiz_summary, name='quiz_summary'),
+    path('api/quiz/questions/', views.api_quiz_questions, name='api_quiz_questions'),
+    path('api/quiz/answers/', views.api_quiz_answers, name='api_quiz_answers'),
     
+    # Offline subject packs
+    path('packs/sw.js', views.pack_service_worker, name='pack_service_worker'),
+    path('packs/subject/<int:subject_id>/', views.pack_manifest, name='pack_manifest'),
+    path('packs/subject/<int:subject_id>/v/<slug:version>.json', views.pack_download, name='pack_download'),
+    path('packs/subject/<int:subject_id>/play/', views.pack_play, name='pack_play'),
+    path('api/packs/answers/', views.api_pack_answers, name='api_pack_answers'),
+
+    # Search
+    path('search/', views.search_view, name='search'),
+    path('api/search/', views.api_search, name='api_search'),
+
     # Stats
     path('stats/', views.stats_global, name='stats_global'),
+
+    # Monitoring
+    path('metrics', views.metrics_view, name='metrics'),
+
+    # Profiling (staff only)
+    path('profiles/', views.profile_list, name='profile_list'),
+    path('profiles/<str:profile_id>/', views.profile_detail, name='profile_detail'),
 ]
@@ -1,19 +1,46 @@
 from django.shortcuts import render, get_object_or_404, redirect
 import django.http
-from django.db.models import F, Sum, ExpressionWrapper, FloatField
-from django.contrib import messages
-from .models import Lecture, Question, AnswerOption, Subject
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import quote_etag
+from django.views.decorators.csrf import ensure_csrf_cookie
+from .models import Lecture, PackSyncBatch, Question, Subject, DailyAnswerStats, AggregateStats, slide_snippet
 from .forms import LectureForm, QuestionForm, QuestionImportForm, SubjectForm
-import random
+from .cursor import RunChanged, new_cursor, question_id_at, question_ids_at, shuffle_options
+from .snapshots import snapshot_cache
+from .stats_buffer import stats_buffer
+from .rollups import daily_trend
+from .exports import export_stream
+from .imports import ImportFormatError, import_items, iter_json_items
+from .qbank import MAGIC as QBANK_MAGIC, BankFormatError, BankReader, write_bank
+from .search import SEARCH_MAX_PAGE, search
+from .page_cache import ANSWERS, LECTURES, PAGES, QUESTIONS, SUBJECTS, cached_page
+from .pagination import estimate_count, keyset_page, page_size, parse_cursor
+from .lecture_api import LectureQueryError, lecture_payload, lecture_query
+from .session_store import persist_session
+from .packs import cached_pack_body, cached_pack_question_ids, subject_pack
+from . import metrics
+from .replica import read_alias, read_from_replica
+from .profiling import SORT_KEYS, list_profiles, load_profile, profile_file, top_functions
+from datetime import datetime, timezone
+import io
 import json
+import tempfile
 
+@cached_page(SUBJECTS, LECTURES)
 def home(request):
-    subjects = Subject.objects.all()
+    subjects = Subject.objects.annotate(num_lectures=Count('lectures'))
     return render(request, 'quiz/subject_list.html', {'subjects': subjects})
 
+@cached_page(SUBJECTS, LECTURES, QUESTIONS)
 def subject_detail(request, subject_id):
     subject = get_object_or_404(Subject, pk=subject_id)
-    lectures = subject.lectures.all()
+    lectures = subject.lectures.annotate(num_questions=Count('questions'))
     return render(request, 'quiz/lecture_list.html', {'lectures': lectures, 'subject': subject})
 
 def subject_create(request):
@@ -46,40 +73,54 @@ def subject_delete(request, subject_id):
 
 # --- CRUD Views ---
 
+LECTURE_LIST_PAGE_SIZE = 24
+LECTURE_QUESTIONS_PAGE_SIZE = 50
+
+def _page_args(request, default):
+    return {
+        'after': parse_cursor(request.GET.get('after')),
+        'before': parse_cursor(request.GET.get('before')),
+        'size': page_size(request.GET.get('size'), default, 200),
+    }
+
+@cached_page(SUBJECTS, LECTURES, QUESTIONS)
 def lecture_list(request):
     lectures = Lecture.objects.all()
-    return render(request, 'quiz/lecture_list.html', {'lectures': lectures})
+    page = keyset_page(lectures.annotate(num_questions=Count('questions')), **_page_args(request, LECTURE_LIST_PAGE_SIZE))
+    page.estimated_total = estimate_count(lectures)
+    return render(request, 'quiz/lecture_list.html', {'lectures': page, 'page': page})
 
+@cached_page(SUBJECTS, LECTURES, QUESTIONS, PAGES, ANSWERS)
 def lecture_detail(request, lecture_id):
     lecture = get_object_or_404(Lecture, pk=lecture_id)
-    questions = lecture.questions.all()
-    
-    # Calculate stats for this lecture
-    stats = questions.aggregate(
-        answered=Sum('times_answered'),
-        correct=Sum('times_correct'),
-        wrong=Sum('times_wrong')
-    )
-    
-    answered = stats['answered'] or 0
-    correct = stats['correct'] or 0
-    wrong = stats['wrong'] or 0
+    questions = keyset_page(lecture.questions.all(), **_page_args(request, LECTURE_QUESTIONS_PAGE_SIZE))
+
+    # One query for every slide cited by the lecture's questions
+    cited = {q.page_number for q in questions if q.page_number is not None}
+    slides = dict(lecture.pages.filter(page_number__in=cited).values_list('page_number', 'text')) if cited else {}
+    for question in questions:
+        text = slides.get(question.page_number)
+        question.slide = slide_snippet(text) if text is not None else None
     
-    accuracy = 0
-    if answered > 0:
-        accuracy = (correct / answered) * 100
-        
+    # Stats for this lecture come from the materialized aggregates
+    totals = AggregateStats.objects.filter(scope=AggregateStats.SCOPE_LECTURE, scope_id=lecture.id).first() or AggregateStats()
     lecture_stats = {
-        'answered': answered,
-        'correct': correct,
-        'wrong': wrong,
-        'accuracy': round(accuracy, 1)
+        'questions': totals.questions,
+        'answered': totals.answered,
+        'correct': totals.correct,
+        'wrong': totals.wrong,
+        'accuracy': totals.accuracy
     }
     
+    # The page count comes from the materialized question total, not a COUNT
+    questions.estimated_total = totals.questions
+
     return render(request, 'quiz/lecture_detail.html', {
         'lecture': lecture, 
         'questions': questions,
-        'stats': lecture_stats
+        'page': questions,
+        'stats': lecture_stats,
+        'trend': daily_trend(DailyAnswerStats.SCOPE_LECTURE, lecture.id)
     })
 
 def lecture_create(request):
@@ -117,14 +158,43 @@ def lecture_delete(request, lecture_id):
         return redirect('lecture_list')
     return render(request, 'quiz/lecture_confirm_delete.html', {'lecture': lecture})
 
+@cached_page(LECTURES, QUESTIONS)
 def api_lectures(request):
-    subject_id = request.GET.get('subject')
-    lectures = Lecture.objects.all()
-    if subject_id:
-        lectures = lectures.filter(subject_id=subject_id)
-    
-    data = [{'id': l.id, 'title': l.title} for l in lectures]
-    return django.http.JsonResponse({'lectures': data})
+    # ?subject=&nature= filter, ?fields=id,title,... picks the keys, ?after=/?before= page
+    try:
+        lectures, values, page_kwargs = lecture_query(request.GET)
+    except LectureQueryError as e:
+        return django.http.JsonResponse({'error': str(e)}, status=400)
+    page = keyset_page(values, **page_kwargs)
+    page.estimated_total = estimate_count(lectures)
+    return django.http.JsonResponse(lecture_payload(page))
+
+def _search_params(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), SEARCH_MAX_PAGE)
+    except ValueError:
+        page = 1
+    kind = request.GET.get('kind')
+    if kind not in ('question', 'page'):
+        kind = None
+    return query, page, kind
+
+def search_view(request):
+    query, page, kind = _search_params(request)
+    results, has_next = search(query, page=page, kind=kind) if query else ([], False)
+    return render(request, 'quiz/search.html', {
+        'query': query,
+        'kind': kind or '',
+        'results': results,
+        'page': page,
+        'has_next': has_next,
+    })
+
+def api_search(request):
+    query, page, kind = _search_params(request)
+    results, has_next = search(query, page=page, kind=kind) if query else ([], False)
+    return django.http.JsonResponse({'query': query, 'page': page, 'has_next': has_next, 'results': results})
 
 def question_create(request, lecture_id=None):
     initial = {}
@@ -163,72 +233,66 @@ def question_delete(request, question_id):
 
 # --- Quiz Logic ---
 
-def quiz_start_total(request):
-    questions = list(Question.objects.values_list('id', flat=True))
-    random.shuffle(questions)
-    request.session['quiz_question_ids'] = questions
-    request.session['quiz_index'] = 0
+def _start_quiz(request, scope, scope_id, mode, weighted=False):
+    request.session['quiz_run'] = new_cursor(scope, scope_id, weighted=weighted)
     request.session['quiz_stats'] = {'correct': 0, 'wrong': 0, 'total': 0}
-    request.session['quiz_mode'] = 'Totale'
+    request.session['quiz_mode'] = mode
+    # Drop keys left over from runs started before the cursor existed
+    for key in ('quiz_question_ids', 'quiz_index', 'quiz_current_question_id', 'quiz_option_order'):
+        request.session.pop(key, None)
+    # Run progress stays in the session cache until the summary (see session_store)
+    persist_session(request.session)
+    metrics.quiz_started(scope, weighted)
     return redirect('quiz_question')
 
+def quiz_start_total(request):
+    return _start_quiz(request, 'all', None, 'Totale')
+
 def quiz_start_subject(request, subject_id):
     subject = get_object_or_404(Subject, pk=subject_id)
-    questions = list(Question.objects.filter(lecture__subject=subject).values_list('id', flat=True))
-    random.shuffle(questions)
-    request.session['quiz_question_ids'] = questions
-    request.session['quiz_index'] = 0
-    request.session['quiz_stats'] = {'correct': 0, 'wrong': 0, 'total': 0}
-    request.session['quiz_mode'] = f"Materia: {subject.name}"
-    return redirect('quiz_question')
+    return _start_quiz(request, 'subject', subject.id, f"Materia: {subject.name}")
 
 def quiz_start_lecture(request, lecture_id):
-    questions = list(Question.objects.filter(lecture_id=lecture_id).values_list('id', flat=True))
-    random.shuffle(questions)
-    request.session['quiz_question_ids'] = questions
-    request.session['quiz_index'] = 0
-    request.session['quiz_stats'] = {'correct': 0, 'wrong': 0, 'total': 0}
     lecture = get_object_or_404(Lecture, pk=lecture_id)
-    request.session['quiz_mode'] = f"Lezione: {lecture.title}"
-    return redirect('quiz_question')
+    return _start_quiz(request, 'lecture', lecture.id, f"Lezione: {lecture.title}")
+
+def quiz_start_weak(request, subject_id=None, lecture_id=None):
+    # Draws questions weighted by their error rate, so the weak spots come up more often
+    if lecture_id:
+        lecture = get_object_or_404(Lecture, pk=lecture_id)
+        return _start_quiz(request, 'lecture', lecture.id, f"Punti Deboli: {lecture.title}", weighted=True)
+    if subject_id:
+        subject = get_object_or_404(Subject, pk=subject_id)
+        return _start_quiz(request, 'subject', subject.id, f"Punti Deboli: {subject.name}", weighted=True)
+    return _start_quiz(request, 'all', None, 'Punti Deboli', weighted=True)
 
 def quiz_question(request):
-    question_ids = request.session.get('quiz_question_ids', [])
-    index = request.session.get('quiz_index', 0)
-    
-    if not question_ids or index >= len(question_ids):
+    cursor = request.session.get('quiz_run')
+    if not cursor:
         return redirect('quiz_summary')
-        
-    question_id = question_ids[index]
-    question = get_object_or_404(Question, pk=question_id)
-    
-    # Handle option shuffling persistence
-    current_q_id_in_session = request.session.get('quiz_current_question_id')
-    saved_order = request.session.get('quiz_option_order')
-    
-    options = list(question.options.all())
-    
-    if current_q_id_in_session != question.id or not saved_order:
-        # New question or no order saved: shuffle and save
-        random.shuffle(options)
-        request.session['quiz_current_question_id'] = question.id
-        request.session['quiz_option_order'] = [opt.id for opt in options]
-    else:
-        # Same question: restore order
-        # Create a map for O(1) lookup or just sort based on index in saved_order
-        # Filter out any options that might have been deleted (though unlikely in this flow)
-        options_map = {opt.id: opt for opt in options}
-        ordered_options = []
-        for opt_id in saved_order:
-            if opt_id in options_map:
-                ordered_options.append(options_map[opt_id])
-        options = ordered_options
+
+    index = cursor['index']
+    try:
+        question_id = question_id_at(cursor)
+    except RunChanged:
+        # Questions were added or removed: end the run where it stands
+        request.session.pop('quiz_run', None)
+        return redirect('quiz_summary')
+    if question_id is None:
+        return redirect('quiz_summary')
+
+    question = snapshot_cache.get(question_id)
+    if question is None:
+        raise django.http.Http404("Domanda non trovata.")
+
+    # Option order is derived from the run seed, so it is stable across reloads
+    options = shuffle_options(cursor['seed'], question.id, question.options)
     
     context = {
         'question': question,
         'options': options,
         'index': index + 1,
-        'total': len(question_ids),
+        'total': cursor['total'],
         'mode': request.session.get('quiz_mode', 'Quiz'),
         'feedback': False
     }
@@ -238,16 +302,13 @@ def quiz_question(request):
         
         if action == 'answer':
             selected_option_id = request.POST.get('option')
-            if selected_option_id:
-                selected_option = AnswerOption.objects.get(pk=selected_option_id)
-                is_correct = selected_option.is_correct
+            option_ids = {str(opt.id) for opt in question.options}
+            if selected_option_id in option_ids:
+                is_correct = int(selected_option_id) == question.correct_option_id
                 
-                # Update DB stats
-                Question.objects.filter(pk=question.id).update(times_answered=F('times_answered') + 1)
-                if is_correct:
-                    Question.objects.filter(pk=question.id).update(times_correct=F('times_correct') + 1)
-                else:
-                    Question.objects.filter(pk=question.id).update(times_wrong=F('times_wrong') + 1)
+                # Update DB stats (buffered, written in batches)
+                stats_buffer.record(question.id, is_correct, question.lecture_id, question.subject_id)
+                snapshot_cache.record_answer(question.id, is_correct)
                 
                 # Update Session stats
                 stats = request.session.get('quiz_stats', {'correct': 0, 'wrong': 0, 'total': 0})
@@ -262,18 +323,19 @@ def quiz_question(request):
                 context['selected_option_id'] = int(selected_option_id)
                 context['is_correct'] = is_correct
                 # We need to pass the correct option id to highlight it
-                correct_option = question.options.filter(is_correct=True).first()
-                context['correct_option_id'] = correct_option.id if correct_option else None
+                context['correct_option_id'] = question.correct_option_id
                 
                 return render(request, 'quiz/quiz_question.html', context)
                 
         elif action == 'next':
-            request.session['quiz_index'] = index + 1
+            cursor['index'] = index + 1
+            request.session['quiz_run'] = cursor
             return redirect('quiz_question')
             
         elif action == 'prev':
             if index > 0:
-                request.session['quiz_index'] = index - 1
+                cursor['index'] = index - 1
+                request.session['quiz_run'] = cursor
             return redirect('quiz_question')
             
         elif action == 'finish':
@@ -281,175 +343,363 @@ def quiz_question(request):
 
     return render(request, 'quiz/quiz_question.html', context)
 
+# --- Quiz JSON API ---
+# Lets a client prefetch the next questions of the current run and submit
+# several answers at once instead of one POST + redirect per question.
+
+API_MAX_QUESTIONS = 50
+API_MAX_ANSWERS = 200
+RUN_CHANGED_ERROR = 'Le domande del quiz sono cambiate: ricomincia il quiz.'
+
+def _snapshot_json(snapshot, seed, index):
+    return {
+        'index': index,
+        'id': snapshot.id,
+        'text': snapshot.text,
+        'nature': snapshot.nature,
+        'page_number': snapshot.page_number,
+        'options': [{'id': opt.id, 'text': opt.text} for opt in shuffle_options(seed, snapshot.id, snapshot.options)],
+    }
+
+def api_quiz_questions(request):
+    cursor = request.session.get('quiz_run')
+    if not cursor:
+        return django.http.JsonResponse({'error': 'Nessun quiz in corso.'}, status=404)
+
+    try:
+        start = int(request.GET.get('start', cursor['index']))
+        count = min(int(request.GET.get('count', 10)), API_MAX_QUESTIONS)
+    except ValueError:
+        return django.http.JsonResponse({'error': 'Parametri non validi.'}, status=400)
+
+    indexes = range(max(start, 0), min(start + count, cursor['total']))
+    try:
+        question_ids = question_ids_at(cursor, indexes)
+    except RunChanged:
+        return django.http.JsonResponse({'error': RUN_CHANGED_ERROR}, status=409)
+    snapshots = snapshot_cache.get_many(list(question_ids.values()))
+
+    questions = []
+    for index in indexes:
+        snapshot = snapshots.get(question_ids.get(index))
+        if snapshot is not None:
+            questions.append(_snapshot_json(snapshot, cursor['seed'], index))
+
+    return django.http.JsonResponse({
+        'mode': request.session.get('quiz_mode', 'Quiz'),
+        'total': cursor['total'],
+        'index': cursor['index'],
+        'questions': questions,
+    })
+
+def _grade_answers(answers):
+    """Grade ``{'question_id', 'option_id'}`` dicts against the snapshots and record the valid ones.
+
+    Returns one result per valid answer, in order, and the positions of the invalid ones.
+    """
+    question_ids = [a.get('question_id') if isinstance(a.get('question_id'), int) else None for a in answers]
+    snapshots = snapshot_cache.get_many([qid for qid in question_ids if qid is not None])
+    results, rejected, recorded = [], [], []
+    for position, (answer, question_id) in enumerate(zip(answers, question_ids)):
+        snapshot = snapshots.get(question_id)
+        option_id = answer.get('option_id')
+        if snapshot is None or option_id not in [opt.id for opt in snapshot.options]:
+            rejected.append(position)
+            continue
+
+        is_correct = option_id == snapshot.correct_option_id
+        recorded.append((snapshot.id, is_correct, snapshot.lecture_id, snapshot.subject_id))
+        results.append({
+            'question_id': snapshot.id,
+            'option_id': option_id,
+            'is_correct': is_correct,
+            'correct_option_id': snapshot.correct_option_id,
+            'page_number': snapshot.page_number,
+            'slide': snapshot.slide,
+        })
+
+    # One batch for the whole submission: a single transaction in synchronous mode
+    stats_buffer.record_many(recorded)
+    for question_id, is_correct, _, _ in recorded:
+        snapshot_cache.record_answer(question_id, is_correct)
+    return results, rejected
+
+def api_quiz_answers(request):
+    if request.method != 'POST':
+        return django.http.JsonResponse({'error': 'Metodo non consentito.'}, status=405)
+    cursor = request.session.get('quiz_run')
+    if not cursor:
+        return django.http.JsonResponse({'error': 'Nessun quiz in corso.'}, status=404)
+
+    try:
+        answers = json.loads(request.body).get('answers')
+    except (json.JSONDecodeError, AttributeError):
+        return django.http.JsonResponse({'error': 'JSON non valido.'}, status=400)
+    if not isinstance(answers, list) or len(answers) > API_MAX_ANSWERS:
+        return django.http.JsonResponse({'error': f"'answers' deve essere una lista di al massimo {API_MAX_ANSWERS} elementi."}, status=400)
+
+    answers = [a if isinstance(a, dict) else {} for a in answers]
+    # Only the questions of the current run can be answered, each position once per batch
+    indexes = [a.get('index') for a in answers]
+    if any(type(i) is not int for i in indexes) or len(set(indexes)) != len(indexes):
+        return django.http.JsonResponse({'error': "Ogni risposta deve indicare una posizione ('index') diversa del quiz."}, status=400)
+    try:
+        run_ids = question_ids_at(cursor, indexes)
+    except RunChanged:
+        return django.http.JsonResponse({'error': RUN_CHANGED_ERROR}, status=409)
+    if any(run_ids.get(a['index']) != a.get('question_id') for a in answers):
+        return django.http.JsonResponse({'error': 'Domande non appartenenti al quiz in corso.'}, status=400)
+
+    results, rejected = _grade_answers(answers)
+    indexes = [a['index'] for position, a in enumerate(answers) if position not in rejected]
+    last_index = max(indexes) if indexes else None
+
+    stats = request.session.get('quiz_stats', {'correct': 0, 'wrong': 0, 'total': 0})
+    correct = sum(1 for r in results if r['is_correct'])
+    stats['total'] += len(results)
+    stats['correct'] += correct
+    stats['wrong'] += len(results) - correct
+    request.session['quiz_stats'] = stats
+
+    if last_index is not None:
+        cursor['index'] = min(max(cursor['index'], last_index + 1), cursor['total'])
+        request.session['quiz_run'] = cursor
+
+    return django.http.JsonResponse({'results': results, 'rejected': rejected, 'stats': stats, 'index': cursor['index']})
+
+# --- Offline subject packs ---
+# quiz/pack_play.html runs quizzes in the browser from a subject pack (see
+# quiz/packs.py) and sends the answers back in batches to api_pack_answers.
+
+PACK_SYNC_BATCH_SIZE = 25
+
+def pack_manifest(request, subject_id):
+    subject = get_object_or_404(Subject, pk=subject_id)
+    pack = subject_pack(subject)
+    return django.http.JsonResponse({
+        'subject': subject.id,
+        'version': pack.version,
+        'questions': pack.questions,
+        'bytes': len(pack.body),
+        'url': reverse('pack_download', args=[subject.id, pack.version]),
+    })
+
+def pack_download(request, subject_id, version):
+    body = cached_pack_body(subject_id, version)
+    if body is None:
+        pack = subject_pack(get_object_or_404(Subject, pk=subject_id))
+        if pack.version != version:
+            raise django.http.Http404("Versione del pacchetto non più disponibile.")
+        body = pack.body
+    response = django.http.HttpResponse(body, content_type='application/json')
+    # A version never changes, so browsers and the service worker can keep it
+    response['ETag'] = quote_etag(version)
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@ensure_csrf_cookie
+def pack_play(request, subject_id):
+    subject = get_object_or_404(Subject, pk=subject_id)
+    return render(request, 'quiz/pack_play.html', {'subject': subject, 'sync_batch_size': PACK_SYNC_BATCH_SIZE})
+
+def pack_service_worker(request):
+    response = render(request, 'quiz/pack_sw.js', content_type='application/javascript')
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def api_pack_answers(request):
+    if request.method != 'POST':
+        return django.http.JsonResponse({'error': 'Metodo non consentito.'}, status=405)
+    try:
+        payload = json.loads(request.body)
+        answers, batch_id = payload.get('answers'), payload.get('batch_id')
+        subject_id, version = payload.get('subject'), payload.get('version')
+    except (json.JSONDecodeError, AttributeError):
+        return django.http.JsonResponse({'error': 'JSON non valido.'}, status=400)
+    if not isinstance(answers, list) or len(answers) > API_MAX_ANSWERS:
+        return django.http.JsonResponse({'error': f"'answers' deve essere una lista di al massimo {API_MAX_ANSWERS} elementi."}, status=400)
+    if not isinstance(batch_id, str) or not 0 < len(batch_id) <= 64:
+        return django.http.JsonResponse({'error': "'batch_id' mancante o non valido."}, status=400)
+    if type(subject_id) is not int or not isinstance(version, str) or not 0 < len(version) <= 64:
+        return django.http.JsonResponse({'error': "'subject' e 'version' del pacchetto mancanti o non validi."}, status=400)
+
+    # A batch resent after a lost response is acknowledged without counting it twice
+    try:
+        with transaction.atomic():
+            PackSyncBatch.objects.create(batch_id=batch_id)
+    except IntegrityError:
+        return django.http.JsonResponse({'batch_id': batch_id, 'recorded': 0, 'rejected': [], 'duplicate': True})
+
+    # Only the questions of the pack the answers were given from count
+    answers = [a if isinstance(a, dict) and type(a.get('question_id')) is int else {} for a in answers]
+    pack_ids = cached_pack_question_ids(subject_id, version)
+    if pack_ids is None:
+        # Version built by another worker or no longer cached: hold the answers to the subject
+        pack_ids = set(
+            Question.objects.filter(lecture__subject_id=subject_id, pk__in={a['question_id'] for a in answers if a})
+            .values_list('id', flat=True)
+        )
+    results, rejected = _grade_answers([a if a.get('question_id') in pack_ids else {} for a in answers])
+    return django.http.JsonResponse({'batch_id': batch_id, 'recorded': len(results), 'rejected': rejected, 'duplicate': False})
+
 def question_import(request):
+    report = None
     if request.method == 'POST':
-        form = QuestionImportForm(request.POST)
+        form = QuestionImportForm(request.POST, request.FILES)
         if form.is_valid():
-            json_text = form.cleaned_data['json_data']
+            upload = form.cleaned_data['json_file']
+            source = upload if upload else io.StringIO(form.cleaned_data['json_data'])
+            bank = None
             try:
-                data = json.loads(json_text)
-                questions_list = data.get('questions', [])
-                
-                if not isinstance(questions_list, list):
-                    raise ValueError("Il campo 'questions' deve essere una lista.")
-                
-                count = 0
-                for item in questions_list:
-                    lecture_title = item.get('lecture_title')
-                    subject_name = item.get('subject') # Optional subject name
-                    question_text = item.get('question_text')
-                    options = item.get('options')
-                    correct_index = item.get('correct_index')
-                    nature = item.get('nature', 'Teorica') # Default to Teorica if not provided
-                    
-                    if not all([lecture_title, question_text, options]) or correct_index is None:
-                        continue # Skip invalid items or raise error
-                        
-                    if len(options) != 4:
-                        continue
-                        
-                    # Handle Subject
-                    subject = None
-                    if subject_name:
-                        subject, _ = Subject.objects.get_or_create(name=subject_name)
-
-                    # Create/Get Lecture
-                    # If subject is provided, we try to find/create lecture with that subject
-                    if subject:
-                        lecture, _ = Lecture.objects.get_or_create(title=lecture_title, defaults={'subject': subject})
-                        if lecture.subject != subject:
-                           # If lecture existed but had different subject, should we update? 
-                           # For now, let's just ensure if it was None we set it.
-                           if not lecture.subject:
-                               lecture.subject = subject
-                               lecture.save()
-                    else:
-                        lecture, _ = Lecture.objects.get_or_create(title=lecture_title)
-                    
-                    # Create Question
-                    question = Question.objects.create(
-                        lecture=lecture, 
-                        text=question_text,
-                        nature=nature
-                    )
-                    
-                    # Create Options
-                    for i, opt_text in enumerate(options):
-                        AnswerOption.objects.create(
-                            question=question,
-                            text=opt_text,
-                            is_correct=(i == correct_index)
-                        )
-                    count += 1
-                
-                messages.success(request, f"Importate con successo {count} domande!")
-                return redirect('question_import')
-                
-            except json.JSONDecodeError:
-                messages.error(request, "Errore: JSON non valido.")
+                if upload and upload.read(len(QBANK_MAGIC)) == QBANK_MAGIC:
+                    # Binary bank: mapped from the temporary file when Django spooled one to disk
+                    upload.seek(0)
+                    bank = BankReader(upload.temporary_file_path() if hasattr(upload, 'temporary_file_path') else upload.read())
+                    bank.verify()
+                    items = bank.items()
+                else:
+                    if upload:
+                        upload.seek(0)
+                    items = iter_json_items(source)
+                report = import_items(items)
+            except (ImportFormatError, BankFormatError) as e:
+                messages.error(request, f"Errore: {e} Nessuna domanda importata.")
             except Exception as e:
                 messages.error(request, f"Errore durante l'importazione: {str(e)}")
+            else:
+                messages.success(request, f"Importate con successo {report.created} domande!")
+                if report.duplicates:
+                    messages.info(request, f"{report.duplicates} domande già presenti ignorate.")
+                if report.rejected:
+                    messages.warning(request, f"{len(report.rejected)} elementi scartati.")
+                else:
+                    return redirect('question_import')
+            finally:
+                if bank is not None:
+                    bank.close()
     else:
         form = QuestionImportForm()
-    
-    return render(request, 'quiz/import_form.html', {'form': form, 'title': 'Importa Domande da JSON'})
+
+    return render(request, 'quiz/import_form.html', {
+        'form': form,
+        'title': 'Importa Domande da JSON',
+        'report': report,
+    })
 
 def quiz_summary(request):
     stats = request.session.get('quiz_stats', {'correct': 0, 'wrong': 0, 'total': 0})
+    persist_session(request.session)
     percent = 0
     if stats['total'] > 0:
         percent = (stats['correct'] / stats['total']) * 100
     
     return render(request, 'quiz/quiz_summary.html', {'stats': stats, 'percent': percent})
 
+
+QBANK_SPOOL_SIZE = 8 * 1024 * 1024
+
+
+def _export_response(request, questions, filename):
+    if request.GET.get('format') == 'qbank':
+        # The binary format needs its section sizes up front, so it is built
+        # in a spooled temporary file rather than streamed
+        spool = tempfile.SpooledTemporaryFile(max_size=QBANK_SPOOL_SIZE)
+        write_bank(spool, questions.using(read_alias()))
+        spool.seek(0)
+        return django.http.FileResponse(spool, as_attachment=True, filename=f"{filename}.qbank", content_type='application/octet-stream')
+
+    fmt = 'ndjson' if request.GET.get('format') == 'ndjson' else 'json'
+    gzip = request.GET.get('gzip') in ('1', 'true')
+    filename = f"{filename}.{fmt}" + (".gz" if gzip else "")
+    content_type = 'application/gzip' if gzip else ('application/x-ndjson' if fmt == 'ndjson' else 'application/json')
+    # The rows are streamed after the view returns, so pin the alias on the queryset
+    questions = questions.using(read_alias())
+
+    response = django.http.StreamingHttpResponse(export_stream(questions, fmt, gzip), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
 def lecture_export_json(request, lecture_id):
     lecture = get_object_or_404(Lecture, pk=lecture_id)
-    questions = lecture.questions.all()
-    
-    questions_data = []
-    for q in questions:
-        options = [opt.text for opt in q.options.all()]
-        try:
-            correct_option = q.options.get(is_correct=True)
-            # Find index of correct option in the list of options
-            # Note: The order must match. Since we just created the list from .all(), 
-            # we need to be careful. Let's do it more robustly.
-            options_objs = list(q.options.all())
-            options_text = [opt.text for opt in options_objs]
-            correct_index = -1
-            for i, opt in enumerate(options_objs):
-                if opt.is_correct:
-                    correct_index = i
-                    break
-        except AnswerOption.DoesNotExist:
-            correct_index = -1 # Should not happen ideally
-            
-        questions_data.append({
-            'lecture_title': lecture.title,
-            'question_text': q.text,
-            'options': options_text,
-            'correct_index': correct_index,
-            'nature': q.nature
-        })
-        
-    export_data = {'questions': questions_data}
-    
-    response = django.http.JsonResponse(export_data, json_dumps_params={'indent': 4})
-    response['Content-Disposition'] = f'attachment; filename="lecture_{lecture.id}_questions.json"'
-    return response
+    return _export_response(request, lecture.questions.all(), f"lecture_{lecture.id}_questions")
+
+def subject_export_json(request, subject_id):
+    subject = get_object_or_404(Subject, pk=subject_id)
+    questions = Question.objects.filter(lecture__subject=subject)
+    return _export_response(request, questions, f"subject_{subject.id}_questions")
+
+def export_all_json(request):
+    return _export_response(request, Question.objects.all(), "all_questions")
 
+@read_from_replica
 def stats_global(request):
-    # Global Stats
-    total_questions = Question.objects.count()
-    agg_stats = Question.objects.aggregate(
-        total_answered=Sum('times_answered'),
-        total_correct=Sum('times_correct'),
-        total_wrong=Sum('times_wrong')
-    )
-    
-    # Handle None values if no questions answered yet
-    total_answered = agg_stats['total_answered'] or 0
-    total_correct = agg_stats['total_correct'] or 0
-    total_wrong = agg_stats['total_wrong'] or 0
-    
-    global_accuracy = 0
-    if total_answered > 0:
-        global_accuracy = (total_correct / total_answered) * 100
+    # Global Stats (materialized, see quiz/aggregates.py)
+    totals = AggregateStats.objects.filter(scope=AggregateStats.SCOPE_GLOBAL, scope_id=0).first() or AggregateStats()
 
     # Per-Lecture Stats
-    lectures = Lecture.objects.annotate(
-        l_answered=Sum('questions__times_answered'),
-        l_correct=Sum('questions__times_correct')
-    ).order_by('title')
-    
+    lecture_totals = {
+        row.scope_id: row
+        for row in AggregateStats.objects.filter(scope=AggregateStats.SCOPE_LECTURE)
+    }
     lecture_stats = []
-    for lec in lectures:
-        l_ans = lec.l_answered or 0
-        l_corr = lec.l_correct or 0
-        accuracy = 0
-        if l_ans > 0:
-            accuracy = (l_corr / l_ans) * 100
+    for lec in Lecture.objects.order_by('title').values('id', 'title'):
+        row = lecture_totals.get(lec['id']) or AggregateStats()
         lecture_stats.append({
-            'title': lec.title,
-            'accuracy': round(accuracy, 1),
-            'answered': l_ans
+            'title': lec['title'],
+            'accuracy': row.accuracy,
+            'answered': row.answered
         })
 
-    # Hardest Questions (min 3 attempts to be significant)
-    hardest_questions = Question.objects.filter(times_answered__gte=3).annotate(
-        accuracy=ExpressionWrapper(
-            F('times_correct') * 100.0 / F('times_answered'),
-            output_field=FloatField()
-        )
-    ).order_by('accuracy')[:5]
+    # Hardest Questions (accuracy is only stored from ACCURACY_MIN_ANSWERS attempts)
+    hardest_questions = Question.objects.hardest(5)
 
     context = {
-        'total_questions': total_questions,
-        'total_answered': total_answered,
-        'total_correct': total_correct,
-        'total_wrong': total_wrong,
-        'global_accuracy': round(global_accuracy, 1),
+        'total_questions': totals.questions,
+        'total_answered': totals.answered,
+        'total_correct': totals.correct,
+        'total_wrong': totals.wrong,
+        'global_accuracy': totals.accuracy,
         'lecture_stats': lecture_stats,
-        'hardest_questions': hardest_questions
+        'hardest_questions': hardest_questions,
+        'trend': daily_trend(DailyAnswerStats.SCOPE_GLOBAL)
     }
     return render(request, 'quiz/stats.html', context)
+
+METRICS_LOCAL_ADDRS = ('127.0.0.1', '::1')
+
+def metrics_view(request):
+    token = getattr(settings, 'QUIZ_METRICS_TOKEN', None)
+    if token:
+        allowed = constant_time_compare(request.headers.get('Authorization', ''), f"Bearer {token}")
+    else:
+        # Without a token only scrapes from this host are answered (any in DEBUG)
+        allowed = settings.DEBUG or request.META.get('REMOTE_ADDR') in METRICS_LOCAL_ADDRS
+    if not allowed:
+        return django.http.HttpResponseForbidden()
+    return django.http.HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def _profile_meta(meta):
+    meta['created'] = datetime.fromtimestamp(meta['created'], tz=timezone.utc)
+    return meta
+
+@staff_member_required
+def profile_list(request):
+    profiles = [_profile_meta(meta) for meta in list_profiles()]
+    return render(request, 'quiz/profile_list.html', {
+        **admin.site.each_context(request), 'title': 'Profili', 'profiles': profiles,
+    })
+
+@staff_member_required
+def profile_detail(request, profile_id):
+    sort = request.GET.get('sort') if request.GET.get('sort') in SORT_KEYS else 'cumulative'
+    try:
+        profile = _profile_meta(load_profile(profile_id))
+        if request.GET.get('download') == '1':
+            return django.http.FileResponse(open(profile_file(profile_id), 'rb'), as_attachment=True, filename=f"{profile_id}.prof")
+        total_ms, functions = top_functions(profile_id, sort)
+    except (OSError, ValueError):
+        raise django.http.Http404("Profilo non trovato.")
+    return render(request, 'quiz/profile_detail.html', {
+        **admin.site.each_context(request), 'title': f'Profilo {profile_id}',
+        'profile': profile, 'functions': functions, 'total_ms': total_ms, 'sort': sort, 'sort_keys': SORT_KEYS,
+    })
@@ -0,0 +1,169 @@
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Question
+
+# Each weight may grow up to HEADROOM times its value at build time (capped
+# at 1.0, weights being error rates) before the table has to be rebuilt.
+HEADROOM = 2.0
+# Rejected draws are retried; past this many tries the candidate is kept
+MAX_TRIES = 64
+# A run draws at most this many times per question it needs before filling
+# up with uniform picks (only reached with extremely uneven weights)
+MAX_DRAWS_PER_QUESTION = 50
+REFRESH_BATCH_SIZE = 500
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) expected per draw.
+
+    The alias table is built over an upper bound of each weight and a draw
+    is accepted with probability weight / bound, so a weight can change in
+    place in O(1) as long as it stays under its bound. ``ids`` is sorted.
+    """
+
+    def __init__(self, ids, weights):
+        n = len(ids)
+        self.ids = ids
+        self.weights = weights
+        self.bounds = array('d', (min(1.0, w * HEADROOM) for w in weights))
+        self.prob = array('d', [0.0]) * n
+        self.alias = array('q', [0]) * n
+        total = sum(self.bounds)
+        if not n or total <= 0:
+            return
+        scaled = array('d', (b * n / total for b in self.bounds))
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] = scaled[l] + scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        for i in large + small:
+            self.prob[i] = 1.0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, question_id):
+        i = bisect_left(self.ids, question_id)
+        return i if i < len(self.ids) and self.ids[i] == question_id else None
+
+    def update(self, position, weight):
+        """Change a weight in place; False if it outgrew its bound and the table needs a rebuild."""
+        self.weights[position] = min(weight, self.bounds[position])
+        return weight <= self.bounds[position]
+
+    def draw(self, rng):
+        for _ in range(MAX_TRIES):
+            i = rng.randrange(len(self.ids))
+            if rng.random() >= self.prob[i]:
+                i = self.alias[i]
+            if rng.random() * self.bounds[i] < self.weights[i]:
+                break
+        return self.ids[i]
+
+
+class WeakSpotSampler:
+    """Per-scope alias tables weighted by each question's error rate.
+
+    Tables are built once per process and reused by every run. Answers
+    recorded by this process update the weights of their questions in
+    place, with one query for the changed rows; a table is rebuilt when a
+    weight outgrows its bound, when questions are added or removed, and
+    every ``rebuild_interval`` seconds so answers recorded by other
+    processes count too.
+    """
+
+    def __init__(self, rebuild_interval=300.0):
+        self.rebuild_interval = rebuild_interval
+        self._tables = {}
+        self._changed = set()
+        self._lock = threading.Lock()
+
+    def table(self, scope, scope_id):
+        self._refresh_changed()
+        key = (scope, scope_id)
+        with self._lock:
+            entry = self._tables.get(key)
+        if entry is not None:
+            table, built_at = entry
+            if time.monotonic() - built_at < self.rebuild_interval:
+                return table
+        table = self._build(scope, scope_id)
+        with self._lock:
+            self._tables[key] = (table, time.monotonic())
+        return table
+
+    def sample(self, scope, scope_id, seed, k):
+        """``k`` distinct question ids of the scope, drawn by weight.
+
+        A scope with at most ``k`` questions is returned whole, shuffled.
+        """
+        table = self.table(scope, scope_id)
+        rng = random.Random(seed)
+        if len(table) <= k:
+            ids = list(table.ids)
+            rng.shuffle(ids)
+            return ids
+        chosen = {}
+        for _ in range(k * MAX_DRAWS_PER_QUESTION):
+            if len(chosen) == k:
+                break
+            chosen.setdefault(table.draw(rng), None)
+        while len(chosen) < k:
+            chosen.setdefault(table.ids[rng.randrange(len(table))], None)
+        return list(chosen)
+
+    def mark_stats_changed(self, question_ids):
+        with self._lock:
+            if self._tables:
+                self._changed.update(question_ids)
+
+    def mark_questions_changed(self):
+        with self._lock:
+            self._tables.clear()
+            self._changed.clear()
+
+    def _refresh_changed(self):
+        with self._lock:
+            if not self._changed:
+                return
+            changed, self._changed = list(self._changed), set()
+            tables = list(self._tables.items())
+        weights = []
+        for i in range(0, len(changed), REFRESH_BATCH_SIZE):
+            weights += Question.objects.filter(pk__in=changed[i:i + REFRESH_BATCH_SIZE]).values_list('id', 'difficulty')
+        outgrown = []
+        for key, (table, _) in tables:
+            for question_id, difficulty in weights:
+                position = table.position(question_id)
+                if position is not None and not table.update(position, difficulty):
+                    outgrown.append(key)
+        with self._lock:
+            for key in outgrown:
+                self._tables.pop(key, None)
+
+    def _build(self, scope, scope_id):
+        questions = Question.objects.all()
+        if scope == 'subject':
+            questions = questions.filter(lecture__subject_id=scope_id)
+        elif scope == 'lecture':
+            questions = questions.filter(lecture_id=scope_id)
+        ids, weights = array('q'), array('d')
+        # Question.difficulty is the smoothed error rate, kept current with the counters
+        rows = questions.order_by('id').values_list('id', 'difficulty')
+        for question_id, difficulty in rows.iterator(chunk_size=2000):
+            ids.append(question_id)
+            weights.append(difficulty)
+        return AliasTable(ids, weights)
+
+
+weak_spot_sampler = WeakSpotSampler(getattr(settings, 'QUIZ_WEAK_SPOTS_REBUILD_INTERVAL', 300.0))